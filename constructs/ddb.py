@@ -13,6 +13,8 @@ class DynamoTable(dynamodb.TableV2):
     - On-demand billing (PAY_PER_REQUEST)
     - Configurable removal policy (default: DESTROY)
     - Partition and sort key types can be STRING, NUMBER, or BINARY
+    - Optional TTL attribute, items expire once its epoch-seconds value has passed
+    - Global secondary indexes declared with the same key arguments as the table
     - Can be used directly in stacks without extra configuration
     """
     def __init__(
@@ -26,6 +28,7 @@ class DynamoTable(dynamodb.TableV2):
         sort_key: str = None,
         sort_key_type: dynamodb.AttributeType = dynamodb.AttributeType.STRING,
         removal_policy: RemovalPolicy = RemovalPolicy.DESTROY,
+        ttl_attribute: str = None,
         **kwargs,
     ):
         partition_key_attr = dynamodb.Attribute(
@@ -48,5 +51,29 @@ class DynamoTable(dynamodb.TableV2):
             sort_key=sort_key_attr,
             billing=dynamodb.Billing.on_demand(),
             removal_policy=removal_policy,
+            time_to_live_attribute=ttl_attribute,
             **kwargs
         )
+
+    def add_index(
+        self,
+        index_name: str,
+        *,
+        partition_key: str,
+        partition_key_type: dynamodb.AttributeType = dynamodb.AttributeType.STRING,
+        sort_key: str = None,
+        sort_key_type: dynamodb.AttributeType = dynamodb.AttributeType.STRING,
+        projection_type: dynamodb.ProjectionType = dynamodb.ProjectionType.ALL,
+        non_key_attributes: list = None,
+    ) -> None:
+        """
+        Adds a global secondary index keyed on the given attribute names.
+        With an INCLUDE projection, non_key_attributes lists the attributes copied into the index.
+        """
+        self.add_global_secondary_index(
+            index_name=index_name,
+            partition_key=dynamodb.Attribute(name=partition_key, type=partition_key_type),
+            sort_key=dynamodb.Attribute(name=sort_key, type=sort_key_type) if sort_key else None,
+            projection_type=projection_type,
+            non_key_attributes=non_key_attributes
+        )
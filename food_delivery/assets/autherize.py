@@ -1,6 +1,10 @@
 import os
 import json
 import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
 import urllib.request
 from jose import jwk, jwt
 from jose.utils import base64url_decode
@@ -9,31 +13,142 @@ USER_POOL_ID = os.getenv("USER_POOL_ID")
 APP_CLIENT_ID = os.getenv("APPLICATION_CLIENT_ID")
 ADMIN_GROUP_NAME = os.getenv("ADMIN_GROUP_NAME")
 
-keys = {}
-is_cold_start = True
+#JWKS older than JWKS_TTL_SECONDS keep being served while a background thread refreshes them.
+#An unknown kid (Cognito rotated its keys) is refreshed inline, since no cached key can verify it.
+#Either refresh is tried at most every JWKS_MIN_REFRESH_SECONDS and a failed one keeps serving
+#the cached keys, so a JWKS outage costs one slow fetch per interval instead of one per request.
+JWKS_TTL_SECONDS = int(os.getenv("JWKS_TTL_SECONDS", "3600"))
+JWKS_MIN_REFRESH_SECONDS = int(os.getenv("JWKS_MIN_REFRESH_SECONDS", "60"))
+#the first fetch of a container has nothing to fall back on, so it is retried
+JWKS_BOOTSTRAP_ATTEMPTS = int(os.getenv("JWKS_BOOTSTRAP_ATTEMPTS", "3"))
+#verified tokens remembered per container, until their exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
 
+#the user pool's signing keys as published, one dict per key
 def get_cognito_keys(region):
-    global keys, is_cold_start
-    if is_cold_start:
-        url = f"https://cognito-idp.{region}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-        print("Fetching JWKS from:", url)
-        with urllib.request.urlopen(url) as f:
-            keys = json.loads(f.read().decode("utf-8"))["keys"]
-        is_cold_start = False
-    return keys
+    url = f"https://cognito-idp.{region}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
+    print("Fetching JWKS from:", url)
+    with urllib.request.urlopen(url, timeout=5) as f:
+        return json.loads(f.read().decode("utf-8"))["keys"]
+
+
+#runs a refresh on a daemon thread; Lambda freezes it with the container and it resumes on the next invoke
+def start_thread(refresh):
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+#Public keys by kid, constructed once per refresh instead of once per request.
+class KeyStore:
+    def __init__(self, fetch, ttl=JWKS_TTL_SECONDS, min_refresh_interval=JWKS_MIN_REFRESH_SECONDS,
+                 bootstrap_attempts=JWKS_BOOTSTRAP_ATTEMPTS, clock=time.monotonic, sleep=time.sleep,
+                 spawn=start_thread):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.bootstrap_attempts = bootstrap_attempts
+        self.clock = clock
+        self.sleep = sleep
+        self.spawn = spawn
+        self.keys = {}
+        self.fetched_at = None
+        self.attempted_at = None
+
+    def get(self, kid, region):
+        now = self.clock()
+        if self.fetched_at is None:
+            if self.may_refresh(now):
+                self.bootstrap(region, now)
+        elif now - self.fetched_at > self.ttl and self.may_refresh(now):
+            #claimed before the thread starts, so concurrent requests do not start another one
+            self.attempted_at = now
+            self.spawn(lambda: self.refresh(region))
+
+        key = self.keys.get(kid)
+        if key is None and self.may_refresh(now):
+            print(f"Unknown kid {kid}, refreshing JWKS")
+            self.attempted_at = now
+            self.refresh(region)
+            key = self.keys.get(kid)
+        return key
+
+    def may_refresh(self, now):
+        return self.attempted_at is None or now - self.attempted_at >= self.min_refresh_interval
+
+    def bootstrap(self, region, now):
+        self.attempted_at = now
+        for attempt in range(self.bootstrap_attempts):
+            if self.refresh(region):
+                return
+            if attempt < self.bootstrap_attempts - 1:
+                self.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+
+    #swaps in a whole new key map, so readers never see a partial one; a failed fetch keeps the old map
+    def refresh(self, region):
+        try:
+            keys = {key["kid"]: jwk.construct(key) for key in self.fetch(region)}
+        except Exception as e:
+            print(f"JWKS refresh failed, serving cached keys: {e}")
+            return False
+        self.keys = keys
+        self.fetched_at = self.clock()
+        return True
+
+
+key_store = KeyStore(lambda region: get_cognito_keys(region))
+
+
+#Claims of tokens that already passed validate_token, keyed by the token's SHA-256 so raw
+#tokens are never held. Least recently used tokens are evicted first, expired ones on lookup.
+class VerifiedTokenCache:
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, clock=time.time):
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()
+
+    def get(self, token_hash):
+        entry = self.entries.get(token_hash)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if self.clock() > expires_at:
+            del self.entries[token_hash]
+            return None
+        self.entries.move_to_end(token_hash)
+        return claims
+
+    def put(self, token_hash, claims):
+        self.entries[token_hash] = (claims, claims.get("exp", 0))
+        self.entries.move_to_end(token_hash)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+token_cache = VerifiedTokenCache()
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+#validate_token only on a cache miss, a repeated token skips the RSA verification
+def verified_claims(token, region):
+    cache_key = token_hash(token)
+    claims = token_cache.get(cache_key)
+    if claims is None:
+        claims = validate_token(token, region)
+        token_cache.put(cache_key, claims)
+    return claims
 
 
 def validate_token(token, region):
     print("Validating token:", token[:50] + "..." if len(token) > 50 else token)
-    keys = get_cognito_keys(region)
     headers = jwt.get_unverified_headers(token)
     kid = headers.get("kid")
-    key = next((k for k in keys if k["kid"] == kid), None)
-    if not key:
+    public_key = key_store.get(kid, region)
+    if not public_key:
         raise Exception("Invalid token: no matching key")
 
-    public_key = jwk.construct(key)
     message, encoded_sig = token.rsplit(".", 1)
     decoded_sig = base64url_decode(encoded_sig.encode("utf-8"))
     if not public_key.verify(message.encode("utf-8"), decoded_sig):
@@ -86,7 +201,7 @@ def lambda_handler(event, context):
     region = event["methodArn"].split(":")[3]
 
     try:
-        claims = validate_token(token, region)
+        claims = verified_claims(token, region)
     except Exception as e:
         print(f"Token validation failed: {e}")
         raise Exception("Unauthorized")
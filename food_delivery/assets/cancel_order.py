@@ -1,7 +1,7 @@
 import os
 import json
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
 import boto3
 from botocore.exceptions import ClientError
@@ -15,10 +15,19 @@ app = APIGatewayRestResolver()
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["TABLE_NAME"])
 
+CANCEL_WINDOW_SECONDS = 600
+
+
+#orderTime is "%Y-%m-%dT%H:%M:%SZ", orders written by older versions carry epoch seconds
+def earliest_cancellable_order_time(order_time):
+    if isinstance(order_time, Decimal):
+        return Decimal(str(time.time() - CANCEL_WINDOW_SECONDS))
+    return (datetime.utcnow() - timedelta(seconds=CANCEL_WINDOW_SECONDS)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
 
 @tracer.capture_method
-@app.delete("/orders/{orderId}")
-def cancel_order_handler():
+@app.delete("/orders/<orderId>")
+def cancel_order_handler(orderId):
     try:
         authorizer = getattr(app.current_event.request_context, 'authorizer', {})
         userId = None
@@ -37,19 +46,28 @@ def cancel_order_handler():
         if not userId:
             return {"statusCode": 401, "body": json.dumps({"error": "User not authenticated"})}
             
-        orderId = app.current_event.path_parameters["orderId"]
-        current_time = time.time()
+        #the status index key embeds orderTime, which an update expression cannot concatenate
+        order = table.get_item(
+            Key={"userId": userId, "orderId": orderId},
+            ProjectionExpression="orderTime",
+            ConsistentRead=True
+        ).get("Item")
+        if not order or "orderTime" not in order:
+            return {"statusCode": 404, "body": json.dumps({"error": f"Order {orderId} not found"})}
+        order_time = order["orderTime"]
 
         response = table.update_item(
             Key={"userId": userId, "orderId": orderId},
-            UpdateExpression="SET #status = :new_status, canceledAt = :canceled_time",
-            ConditionExpression="(#status = :current_status) AND (orderTime > :minOrderTime)",
+            UpdateExpression="SET #status = :new_status, canceledAt = :canceled_time, statusOrderTime = :status_order_time",
+            ConditionExpression="(#status = :current_status) AND (orderTime = :orderTime) AND (orderTime > :minOrderTime)",
             ExpressionAttributeNames={"#status": "status"},
             ExpressionAttributeValues={
                 ":current_status": "PLACED",
                 ":new_status": "CANCELED",
-                ":minOrderTime": Decimal(str(current_time - 600)), 
-                ":canceled_time": datetime.utcnow().isoformat()
+                ":orderTime": order_time,
+                ":minOrderTime": earliest_cancellable_order_time(order_time),
+                ":canceled_time": datetime.utcnow().isoformat(),
+                ":status_order_time": f"CANCELED#{order_time}"
             },
             ReturnValues="ALL_NEW"
         )
@@ -1,6 +1,7 @@
 import os
 import uuid
 import json
+import zlib
 from datetime import datetime
 from decimal import Decimal
 import boto3
@@ -14,6 +15,9 @@ app = APIGatewayRestResolver()
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["TABLE_NAME"])
 
+#a busy restaurant's orders of a day are spread over this many feed partitions
+RESTAURANT_FEED_SHARDS = int(os.environ.get("RESTAURANT_FEED_SHARDS", "4"))
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -21,6 +25,28 @@ class DecimalEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+#pickup coordinates used by rider dispatch
+def to_location(location):
+    return {
+        "lat": Decimal(str(location["lat"])),
+        "lng": Decimal(str(location["lng"]))
+    }
+
+
+#sort key of the per-status order index, kept in step with status on every status change
+def status_order_time(status, order_time):
+    return f"{status}#{order_time}"
+
+
+#keys of the restaurant feed index: "<restaurantId>#<day>#<shard>", sorted by "<orderTime>#<orderId>"
+def restaurant_feed_keys(restaurant_id, order_id, order_time):
+    shard = zlib.crc32(order_id.encode("utf-8")) % RESTAURANT_FEED_SHARDS
+    return {
+        "restaurantShardDay": f"{restaurant_id}#{order_time[:10]}#{shard}",
+        "feedKey": f"{order_time}#{order_id}"
+    }
+
+
 @tracer.capture_method
 @app.post("/orders")
 def create_order():
@@ -48,8 +74,12 @@ def create_order():
         "orderItems": data["orderItems"],
         "status": "PLACED",
         "timestamp": int(datetime.utcnow().timestamp()),
-        "orderTime": order_time
+        "orderTime": order_time,
+        "statusOrderTime": status_order_time("PLACED", order_time),
+        **restaurant_feed_keys(data["restaurantId"], order_id, order_time)
     }
+    if "restaurantLocation" in data:
+        item_to_store["restaurantLocation"] = to_location(data["restaurantLocation"])
 
     try:
         table.put_item(
@@ -139,8 +169,12 @@ def handle_create_order_direct(event, context):
             "orderItems": order_items,
             "status": "PLACED",
             "timestamp": int(datetime.utcnow().timestamp()),
-            "orderTime": order_time
+            "orderTime": order_time,
+            "statusOrderTime": status_order_time("PLACED", order_time),
+            **restaurant_feed_keys(data["restaurantId"], order_id, order_time)
         }
+        if "restaurantLocation" in data:
+            item_to_store["restaurantLocation"] = to_location(data["restaurantLocation"])
 
         table.put_item(
             Item=item_to_store,
@@ -1,10 +1,16 @@
 import os
+import time
+import hmac
 import json
+import base64
+import random
+import hashlib
 from decimal import Decimal
 import boto3
 from boto3.dynamodb.conditions import Key
 from aws_lambda_powertools import Logger, Tracer
-from aws_lambda_powertools.event_handler import APIGatewayRestResolver
+from aws_lambda_powertools.event_handler import APIGatewayRestResolver, Response, content_types
+from aws_lambda_powertools.utilities import parameters
 
 logger = Logger()
 tracer = Tracer()
@@ -13,6 +19,24 @@ app = APIGatewayRestResolver()
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["TABLE_NAME"])
 
+#orders of a user newest first, all of them or one status ("<status>#<orderTime>")
+ORDER_TIME_INDEX = "OrderTimeIndex"
+STATUS_ORDER_TIME_INDEX = "StatusOrderTimeIndex"
+
+#key that signs the pagination cursors, cached between invocations
+CURSOR_SECRET_ARN = os.environ.get("CURSOR_SECRET_ARN")
+CURSOR_SECRET_MAX_AGE_SECONDS = int(os.environ.get("CURSOR_SECRET_MAX_AGE_SECONDS", "300"))
+
+DEFAULT_PAGE_SIZE = 20
+#also the most keys one BatchGetItem takes, so include=items is a single call per page
+MAX_PAGE_SIZE = 100
+MAX_BATCH_GET_ATTEMPTS = 5
+
+#the summary view is what the indexes project; orderItems, the one attribute that grows
+#with the order, is only read from the table for the page when include=items asks for it
+SUMMARY_ATTRIBUTES = ["userId", "orderId", "restaurantId", "totalAmount", "status", "orderTime", "timestamp"]
+EXPANSIONS = {"items": ["orderItems"]}
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -21,6 +45,167 @@ class DecimalEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+#a plain dict returned from a route becomes the body of a 200, so status codes go through Response
+def respond(status_code, body):
+    return Response(
+        status_code=status_code,
+        content_type=content_types.APPLICATION_JSON,
+        body=json.dumps(body, cls=DecimalEncoder)
+    )
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def cursor_key():
+    return parameters.get_secret(CURSOR_SECRET_ARN, max_age=CURSOR_SECRET_MAX_AGE_SECONDS).encode("utf-8")
+
+
+def sign(payload):
+    return hmac.new(cursor_key(), payload, hashlib.sha256).digest()
+
+
+#opaque "<payload>.<signature>" token around LastEvaluatedKey, bound to the user
+#and the index it was issued for
+def encode_cursor(last_evaluated_key, userId, index_name):
+    payload = json.dumps(
+        {"u": userId, "i": index_name, "k": last_evaluated_key}, cls=DecimalEncoder, separators=(",", ":")
+    ).encode("utf-8")
+    return f"{b64encode(payload)}.{b64encode(sign(payload))}"
+
+
+def decode_cursor(cursor, userId, index_name):
+    try:
+        encoded_payload, encoded_signature = cursor.split(".")
+        payload = b64decode(encoded_payload)
+        signature = b64decode(encoded_signature)
+    except ValueError:
+        raise InvalidCursor("Malformed cursor")
+
+    if not hmac.compare_digest(signature, sign(payload)):
+        raise InvalidCursor("Cursor signature mismatch")
+    token = json.loads(payload)
+    if token.get("u") != userId:
+        raise InvalidCursor("Cursor was issued to another user")
+    if token.get("i") != index_name:
+        raise InvalidCursor("Cursor was issued for another listing")
+    return token["k"]
+
+
+def b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def b64decode(encoded):
+    return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError("limit must be a positive integer")
+    limit = int(value)
+    return min(limit, MAX_PAGE_SIZE)
+
+
+#"include=items" style comma-separated expansions of the summary view
+def parse_include(value):
+    include = [expansion for expansion in (value or "").split(",") if expansion]
+    unknown = [expansion for expansion in include if expansion not in EXPANSIONS]
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(unknown)}")
+    return include
+
+
+def parse_status(value):
+    if value is None:
+        return None
+    if not value.replace("_", "").isalpha():
+        raise ValueError("status must be an order status such as PLACED")
+    return value.upper()
+
+
+def order_index(status):
+    return STATUS_ORDER_TIME_INDEX if status else ORDER_TIME_INDEX
+
+
+def projection(attributes):
+    #status and timestamp are reserved words
+    names = {f"#a{i}": attribute for i, attribute in enumerate(attributes)}
+    return ", ".join(names), names
+
+
+#one page of the user's orders, newest first. The query reads the index backwards and
+#stops as soon as the page is full; one that stops at 1 MB continues from where it stopped.
+def query_orders(userId, limit, start_key=None, include=(), status=None):
+    key_condition = Key("userId").eq(userId)
+    if status:
+        key_condition = key_condition & Key("statusOrderTime").begins_with(f"{status}#")
+    projection_expression, attribute_names = projection(SUMMARY_ATTRIBUTES)
+    query_kwargs = {
+        "IndexName": order_index(status),
+        "KeyConditionExpression": key_condition,
+        "ProjectionExpression": projection_expression,
+        "ExpressionAttributeNames": attribute_names,
+        "ScanIndexForward": False
+    }
+    if start_key:
+        query_kwargs["ExclusiveStartKey"] = start_key
+
+    orders = []
+    while True:
+        query_kwargs["Limit"] = limit - len(orders)
+        response = table.query(**query_kwargs)
+        orders.extend(response.get("Items", []))
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key or len(orders) >= limit:
+            break
+        query_kwargs["ExclusiveStartKey"] = last_evaluated_key
+
+    for expansion in include:
+        expand_orders(orders, EXPANSIONS[expansion])
+    return orders, last_evaluated_key
+
+
+#read the attributes the indexes do not carry for just this page's orders
+def expand_orders(orders, attributes):
+    if not orders:
+        return
+    projection_expression, attribute_names = projection(["userId", "orderId"] + attributes)
+    request = {
+        table.name: {
+            "Keys": [{"userId": order["userId"], "orderId": order["orderId"]} for order in orders],
+            "ProjectionExpression": projection_expression,
+            "ExpressionAttributeNames": attribute_names
+        }
+    }
+    expanded = {}
+    for item in batch_get_items(request):
+        expanded[item["orderId"]] = item
+
+    for order in orders:
+        item = expanded.get(order["orderId"], {})
+        order.update({attribute: item[attribute] for attribute in attributes if attribute in item})
+
+
+#one BatchGetItem, then only the unprocessed keys again with jittered backoff;
+#keys still unprocessed after the last attempt fail the request
+def batch_get_items(request):
+    items = []
+    for attempt in range(MAX_BATCH_GET_ATTEMPTS):
+        response = dynamodb.batch_get_item(RequestItems=request)
+        items.extend(response["Responses"].get(table.name, []))
+        request = response.get("UnprocessedKeys")
+        if not request:
+            return items
+        logger.warning(f"{len(request[table.name]['Keys'])} orders unprocessed, retrying (attempt {attempt + 1})")
+        if attempt < MAX_BATCH_GET_ATTEMPTS - 1:
+            time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+    raise RuntimeError(f"{len(request[table.name]['Keys'])} orders still unprocessed after {MAX_BATCH_GET_ATTEMPTS} attempts")
+
+
 @tracer.capture_method
 @app.get("/orders")
 def list_orders_handler():
@@ -28,21 +213,31 @@ def list_orders_handler():
         authorizer = getattr(app.current_event.request_context, 'authorizer', None)
         claims = getattr(authorizer, 'claims', {}) if authorizer else {}
         userId = claims.get("sub")
-        
+
         if not userId:
-            return {"statusCode": 401, "body": json.dumps({"error": "Unauthorized"})}
-
-        response = table.query(KeyConditionExpression=Key("userId").eq(userId))
-        orders = response.get("Items", [])
-        
-        return {
-            "statusCode": 200,
-            "body": json.dumps({"orders": orders}, cls=DecimalEncoder)
-        }
+            return respond(401, {"error": "Unauthorized"})
+
+        query_params = app.current_event.query_string_parameters or {}
+        try:
+            limit = parse_limit(query_params.get("limit"))
+            include = parse_include(query_params.get("include"))
+            status = parse_status(query_params.get("status"))
+            cursor = query_params.get("cursor")
+            start_key = decode_cursor(cursor, userId, order_index(status)) if cursor else None
+        except (ValueError, InvalidCursor) as e:
+            logger.warning(f"Rejected list request: {e}")
+            return respond(400, {"error": str(e)})
+
+        orders, last_evaluated_key = query_orders(userId, limit, start_key, include, status)
+
+        return respond(200, {
+            "orders": orders,
+            "nextCursor": encode_cursor(last_evaluated_key, userId, order_index(status)) if last_evaluated_key else None
+        })
 
     except Exception as e:
         logger.exception(f"Error listing orders: {e}")
-        return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error"})}
+        return respond(500, {"error": "Internal Server Error"})
 
 
 def lambda_handler(event, context):
@@ -50,4 +245,4 @@ def lambda_handler(event, context):
         return app.resolve(event, context)
     except Exception as e:
         logger.error(f"Error in lambda_handler: {str(e)}")
-        return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error"})}
\ No newline at end of file
+        return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error"})}
@@ -0,0 +1,210 @@
+import os
+import json
+import base64
+from datetime import datetime, timedelta
+from decimal import Decimal
+import boto3
+from boto3.dynamodb.conditions import Key
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.event_handler import APIGatewayRestResolver, Response, content_types
+
+logger = Logger()
+tracer = Tracer()
+app = APIGatewayRestResolver()
+
+dynamodb = boto3.resource("dynamodb")
+table = dynamodb.Table(os.environ["TABLE_NAME"])
+
+#"<restaurantId>#<day>#<shard>" partitions sorted by "<orderTime>#<orderId>", written by create_order.
+#Must match create_order's RESTAURANT_FEED_SHARDS, every shard of a day is read.
+FEED_INDEX = "RestaurantDayIndex"
+RESTAURANT_FEED_SHARDS = int(os.environ.get("RESTAURANT_FEED_SHARDS", "4"))
+#a tablet that was off longer than this resumes from the start of yesterday
+FEED_LOOKBACK_DAYS = 1
+#Orders do not reach the index in feedKey order: a later order of the same second can have
+#a smaller orderId, concurrent writes land in any order and the index replicates with a lag.
+#Every poll re-reads this far behind the watermark and drops the orders already handed out.
+FEED_OVERLAP_SECONDS = 30
+FEED_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+DEFAULT_FEED_SIZE = 50
+MAX_FEED_SIZE = 100
+FEED_ATTRIBUTES = ["userId", "orderId", "restaurantId", "status", "totalAmount", "orderItems", "orderTime", "feedKey"]
+#members of "restaurant-<restaurantId>" read that restaurant's feed, admins read every feed
+RESTAURANT_GROUP_PREFIX = "restaurant-"
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def respond(status_code, body=None, headers=None):
+    return Response(
+        status_code=status_code,
+        content_type=content_types.APPLICATION_JSON,
+        body=json.dumps(body, cls=DecimalEncoder) if body is not None else "",
+        headers=headers
+    )
+
+
+def restaurant_shard_day(restaurant_id, day, shard):
+    return f"{restaurant_id}#{day}#{shard}"
+
+
+def feed_key_time(feed_key):
+    return datetime.strptime(feed_key[:20], FEED_TIME_FORMAT)
+
+
+#first feedKey a poll reads, FEED_OVERLAP_SECONDS behind the watermark
+def overlap_start(high_key):
+    return (feed_key_time(high_key) - timedelta(seconds=FEED_OVERLAP_SECONDS)).strftime(FEED_TIME_FORMAT)
+
+
+#The watermark, opaque to the tablet, is the newest feedKey handed out and the feedKeys
+#handed out within the overlap behind it, so re-read orders are not handed out twice.
+def encode_watermark(high_key, seen_keys):
+    payload = json.dumps({"k": high_key, "s": sorted(seen_keys)}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_watermark(watermark):
+    try:
+        token = json.loads(base64.urlsafe_b64decode(watermark + "=" * (-len(watermark) % 4)))
+        high_key, seen_keys = token["k"], token["s"]
+        if not isinstance(high_key, str) or not all(isinstance(key, str) for key in seen_keys):
+            raise ValueError
+        feed_key_time(high_key)
+        return high_key, set(seen_keys)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Malformed watermark")
+
+
+#moves to the newest order handed out, remembering those still inside its overlap
+def advance_watermark(high_key, seen_keys, orders, now):
+    handed_out = seen_keys | {order["feedKey"] for order in orders}
+    high_key = max(handed_out | {high_key or now.strftime("%Y-%m-%dT00:00:00Z")})
+    start_key = overlap_start(high_key)
+    return encode_watermark(high_key, {key for key in handed_out if key > start_key})
+
+
+#ETags are quoted, weak ones prefixed with W/
+def watermark_from_etag(etag):
+    return etag.strip().removeprefix("W/").strip('"') if etag else None
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_FEED_SIZE
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(int(value), MAX_FEED_SIZE)
+
+
+def can_read_feed(authorizer, restaurant_id):
+    if authorizer.get("isAdmin") == "true":
+        return True
+    groups = json.loads(authorizer.get("groups") or "[]")
+    return f"{RESTAURANT_GROUP_PREFIX}{restaurant_id}" in groups
+
+
+#days to read, oldest first: from the day of start_key, at most FEED_LOOKBACK_DAYS back, up to today
+def feed_days(start_key, now):
+    today = now.date()
+    start = today
+    if start_key:
+        start_day = datetime.strptime(start_key[:10], "%Y-%m-%d").date()
+        start = max(min(start_day, today), today - timedelta(days=FEED_LOOKBACK_DAYS))
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((today - start).days + 1)]
+
+
+#the oldest `limit` orders of one shard after start_key
+def query_shard(partition, start_key, limit):
+    key_condition = Key("restaurantShardDay").eq(partition)
+    if start_key:
+        key_condition = key_condition & Key("feedKey").gt(start_key)
+    query_kwargs = {
+        "IndexName": FEED_INDEX,
+        "KeyConditionExpression": key_condition,
+        "ProjectionExpression": ", ".join(f"#a{i}" for i in range(len(FEED_ATTRIBUTES))),
+        "ExpressionAttributeNames": {f"#a{i}": attribute for i, attribute in enumerate(FEED_ATTRIBUTES)},
+        "ScanIndexForward": True
+    }
+    orders = []
+    while True:
+        query_kwargs["Limit"] = limit - len(orders)
+        response = table.query(**query_kwargs)
+        orders.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response or len(orders) >= limit:
+            return orders
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+#Orders not handed out yet, oldest first, from the overlap behind the watermark on. Every shard
+#of a day is read past the handed-out orders up to `limit` new ones before merging. An order
+#that reaches the index more than FEED_OVERLAP_SECONDS late behind the watermark is missed.
+def orders_after(restaurant_id, high_key, seen_keys, limit, now):
+    start_key = overlap_start(high_key) if high_key else None
+    orders = []
+    for day in feed_days(start_key, now):
+        day_orders = []
+        for shard in range(RESTAURANT_FEED_SHARDS):
+            partition = restaurant_shard_day(restaurant_id, day, shard)
+            shard_orders = query_shard(partition, start_key, limit - len(orders) + len(seen_keys))
+            day_orders.extend(order for order in shard_orders if order["feedKey"] not in seen_keys)
+        orders.extend(sorted(day_orders, key=lambda order: order["feedKey"])[:limit - len(orders)])
+        if len(orders) >= limit:
+            break
+    return orders
+
+
+@tracer.capture_method
+@app.get("/restaurants/<restaurantId>/orders")
+def restaurant_feed_handler(restaurantId):
+    try:
+        authorizer = app.current_event.raw_event.get("requestContext", {}).get("authorizer") or {}
+        if not authorizer.get("userId") and not authorizer.get("claims"):
+            return respond(401, {"error": "Unauthorized"})
+        if not can_read_feed(authorizer, restaurantId):
+            return respond(403, {"error": f"Not allowed to read the feed of {restaurantId}"})
+
+        query_params = app.current_event.query_string_parameters or {}
+        #a polling tablet sends its watermark back as If-None-Match, or as ?since=
+        watermark = query_params.get("since") or watermark_from_etag(app.current_event.headers.get("If-None-Match"))
+        try:
+            limit = parse_limit(query_params.get("limit"))
+            high_key, seen_keys = decode_watermark(watermark) if watermark else (None, set())
+            now = datetime.utcnow()
+            orders = orders_after(restaurantId, high_key, seen_keys, limit, now)
+        except ValueError as e:
+            logger.warning(f"Rejected feed request: {e}")
+            return respond(400, {"error": str(e)})
+
+        #A 304 still ran a query per shard of each day read, over the orders in the overlap. The
+        #index entries are read in full, the ProjectionExpression trims the response, not the RCUs.
+        if not orders and watermark:
+            return respond(304, headers={"ETag": f'"{watermark}"', "Cache-Control": "no-cache"})
+
+        #with nothing to hand out yet, the start of today is where the next poll continues
+        next_watermark = advance_watermark(high_key, seen_keys, orders, now)
+        for order in orders:
+            order.pop("feedKey")
+        return respond(
+            200,
+            {"orders": orders, "watermark": next_watermark},
+            headers={"ETag": f'"{next_watermark}"', "Cache-Control": "no-cache"}
+        )
+
+    except Exception as e:
+        logger.exception(f"Error reading restaurant feed: {e}")
+        return respond(500, {"error": "Internal Server Error"})
+
+
+def lambda_handler(event, context):
+    try:
+        return app.resolve(event, context)
+    except Exception as e:
+        logger.error(f"Error in lambda_handler: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error"})}
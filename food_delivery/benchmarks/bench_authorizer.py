@@ -0,0 +1,99 @@
+"""
+Microbenchmark of the Lambda authorizer's token check.
+
+Signs RS256 tokens with a throwaway key published as the only JWKS key, then
+times validate_token (header parse, RSA verify, claim checks) against a
+verified-token cache hit, and the whole lambda_handler with a cold and a
+warm cache. The authorizer's own prints are silenced while timing.
+
+    python food_delivery/benchmarks/bench_authorizer.py --tokens 2000
+"""
+
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "assets"))
+os.environ.setdefault("USER_POOL_ID", "eu-west-1_bench")
+os.environ.setdefault("APPLICATION_CLIENT_ID", "bench-client")
+os.environ.setdefault("ADMIN_GROUP_NAME", "admin")
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+import autherize
+
+KID = "bench-key"
+METHOD_ARN = "arn:aws:execute-api:eu-west-1:123456789012:abc123/dev/GET/orders"
+
+
+#a 2048-bit key like Cognito's, its public half as the JWKS the key store fetches
+def make_signing_key() -> tuple:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = dict(jwk.construct(public_pem, "RS256").to_dict(), kid=KID, alg="RS256", use="sig")
+    return private_pem, public_jwk
+
+
+def make_tokens(private_pem: bytes, count: int) -> list:
+    expires = int(time.time()) + 3600
+    return [
+        jwt.encode(
+            {"sub": f"user-{i}", "aud": autherize.APP_CLIENT_ID, "exp": expires, "cognito:groups": ["customers"]},
+            private_pem, algorithm="RS256", headers={"kid": KID}
+        )
+        for i in range(count)
+    ]
+
+
+def per_call_us(function, items: list) -> float:
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - start
+    return elapsed / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RSA token verification against the verified-token cache")
+    parser.add_argument("--tokens", type=int, default=2000)
+    args = parser.parse_args()
+
+    private_pem, public_jwk = make_signing_key()
+    autherize.key_store = autherize.KeyStore(lambda region: [public_jwk])
+    tokens = make_tokens(private_pem, args.tokens)
+    events = [{"authorizationToken": f"Bearer {token}", "methodArn": METHOD_ARN} for token in tokens]
+
+    #warm the key store so its one-off fetch and construct stay out of the timings
+    per_call_us(lambda token: autherize.validate_token(token, "eu-west-1"), tokens[:1])
+
+    verify_us = per_call_us(lambda token: autherize.validate_token(token, "eu-west-1"), tokens)
+    autherize.token_cache = autherize.VerifiedTokenCache(max_size=len(tokens))
+    per_call_us(lambda token: autherize.verified_claims(token, "eu-west-1"), tokens)
+    hit_us = per_call_us(lambda token: autherize.verified_claims(token, "eu-west-1"), tokens)
+
+    autherize.token_cache = autherize.VerifiedTokenCache(max_size=len(tokens))
+    cold_us = per_call_us(lambda event: autherize.lambda_handler(event, None), events)
+    warm_us = per_call_us(lambda event: autherize.lambda_handler(event, None), events)
+
+    print(f"{args.tokens} RS256 tokens, 2048-bit key")
+    print(f"{'':<28}{'us/call':>10}")
+    print(f"{'validate_token (RSA)':<28}{verify_us:>10.1f}")
+    print(f"{'verified_claims cache hit':<28}{hit_us:>10.1f}")
+    print(f"{'lambda_handler cold cache':<28}{cold_us:>10.1f}")
+    print(f"{'lambda_handler warm cache':<28}{warm_us:>10.1f}")
+    print(f"cache hit is {verify_us / hit_us:.0f}x cheaper than verification")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Microbenchmark of the rider ping codecs.
+
+Encodes fleet pings as the producer does (envelope included) with JSON and
+with ping_codec, then decodes them the way the consumer does, from the
+base64 string in the Lambda event. Reports bytes per ping, pings per
+shard-MB, and encode/decode time per ping, for single and aggregated records.
+
+    python food_delivery/benchmarks/bench_codec.py --pings 20000
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data_stream_assets"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+
+import kinesis_producer
+import ping_codec
+from fleet import FleetSimulator
+
+AGGREGATE_SIZE = 100
+
+
+def json_encode(record: dict) -> bytes:
+    return json.dumps(record).encode("utf-8")
+
+
+#the consumer's JSON path before the codec: base64, utf-8, json.loads
+def json_decode(data: str) -> list:
+    payload = json.loads(base64.b64decode(data).decode("utf-8"))
+    return payload["records"] if payload.get("aggregated") else [payload]
+
+
+def binary_decode(data: str) -> list:
+    return ping_codec.decode_payload(base64.b64decode(data))
+
+
+def json_aggregate(encoded: list) -> bytes:
+    return b'{"aggregated": true, "records": [' + b",".join(encoded) + b"]}"
+
+
+def timed(function, items: list) -> tuple:
+    start = time.perf_counter()
+    results = [function(item) for item in items]
+    return results, time.perf_counter() - start
+
+
+def run_case(name: str, records: list, encode, aggregate, decode):
+    encoded, encode_seconds = timed(encode, records)
+    if aggregate:
+        payloads = [aggregate(encoded[i:i + AGGREGATE_SIZE]) for i in range(0, len(encoded), AGGREGATE_SIZE)]
+    else:
+        payloads = encoded
+    event_data = [base64.b64encode(payload).decode("utf-8") for payload in payloads]
+
+    decoded, decode_seconds = timed(decode, event_data)
+    assert sum(len(batch) for batch in decoded) == len(records)
+
+    payload_bytes = sum(len(payload) for payload in payloads)
+    #Kinesis bills and throttles on the record bytes, the base64 form only exists in the Lambda event
+    print(f"{name:<22} {payload_bytes / len(records):>9.1f} {1024 * 1024 * len(records) / payload_bytes:>14.0f} "
+          f"{encode_seconds / len(records) * 1e6:>11.2f} {decode_seconds / len(records) * 1e6:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pings", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = FleetSimulator(args.pings, seed=args.seed)
+    fleet.step(5.0)
+    records = [kinesis_producer.build_kinesis_record(ping, True) for ping in fleet.pings(now=time.time())]
+
+    print(f"{'codec':<22} {'bytes/ping':>9} {'pings/shard-MB':>14} {'encode us':>11} {'decode us':>11}")
+    run_case("json", records, json_encode, None, json_decode)
+    run_case("binary", records, ping_codec.encode_record, None, binary_decode)
+    run_case(f"json aggregate x{AGGREGATE_SIZE}", records, json_encode, json_aggregate, json_decode)
+    run_case(f"binary aggregate x{AGGREGATE_SIZE}", records, ping_codec.encode_record,
+             ping_codec.encode_aggregate, binary_decode)
+
+
+if __name__ == "__main__":
+    main()
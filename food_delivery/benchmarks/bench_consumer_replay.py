@@ -0,0 +1,173 @@
+"""
+Replay benchmark for kinesis_consumer.lambda_handler.
+
+`record` writes Kinesis event records, base64 payloads included, one JSON
+object per line. They come from the simulated fleet (plus optional
+deliveries) or from the shards of a real stream.
+`replay` feeds a recording through the handler against a moto-backed
+RidersPositionTable at each batch size. Every batch size runs in a fresh
+process, so the movement filter starts cold and peak RSS is per run.
+
+    python food_delivery/benchmarks/bench_consumer_replay.py record events.jsonl --pings 20000 --riders 2000
+    python food_delivery/benchmarks/bench_consumer_replay.py record events.jsonl --stream FoodDeliveryLocationStream
+    python food_delivery/benchmarks/bench_consumer_replay.py replay events.jsonl --batch-sizes 10,100,500
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import resource
+import multiprocessing
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+from load_generator import LambdaContext, create_riders_table, to_event_record
+
+import boto3
+from moto import mock_aws
+
+import kinesis_consumer
+import kinesis_producer
+from fleet import FleetSimulator
+
+
+#synthetic recording: the fleet pings every `interval` seconds, with deliveries mixed in
+def record_synthetic(pings: int, riders: int, interval: float, delivery_ratio: float, seed: int) -> list:
+    random.seed(seed)
+    fleet = FleetSimulator(riders, seed=seed)
+    clock = time.time()
+    events = []
+    while len(events) < pings:
+        fleet.step(interval)
+        clock += interval
+        for ping in fleet.pings(now=clock)[:pings - len(events)]:
+            data = kinesis_producer.generate_sample_location_data() if random.random() < delivery_ratio else ping
+            payload = kinesis_producer.build_kinesis_record(data, True)
+            partition_key = kinesis_producer.get_partition_key(data)
+            events.append(to_event_record(
+                str(len(events) + 1), json.dumps(payload).encode("utf-8"), partition_key, clock
+            ))
+    return events
+
+
+#read up to `limit` records from every shard of a real stream, oldest first
+def record_stream(stream_name: str, limit: int) -> list:
+    kinesis = boto3.client("kinesis")
+    events = []
+    for shard in kinesis.list_shards(StreamName=stream_name)["Shards"]:
+        iterator = kinesis.get_shard_iterator(
+            StreamName=stream_name, ShardId=shard["ShardId"], ShardIteratorType="TRIM_HORIZON"
+        )["ShardIterator"]
+        shard_events = []
+        while iterator and len(shard_events) < limit:
+            response = kinesis.get_records(ShardIterator=iterator, Limit=min(10000, limit - len(shard_events)))
+            shard_events.extend(
+                to_event_record(r["SequenceNumber"], r["Data"], r["PartitionKey"],
+                                r["ApproximateArrivalTimestamp"].timestamp())
+                for r in response["Records"]
+            )
+            if not response["Records"] and response.get("MillisBehindLatest", 0) == 0:
+                break
+            iterator = response.get("NextShardIterator")
+        events.extend(shard_events)
+    return events
+
+
+def load_events(path: str) -> list:
+    with open(path) as recording:
+        return [json.loads(line) for line in recording if line.strip()]
+
+
+#runs in its own process, puts one result dict on the queue
+def replay_once(path: str, batch_size: int, queue) -> None:
+    events = load_events(path)
+    with mock_aws():
+        create_riders_table()
+        calls = []
+        for client in (kinesis_consumer.dynamodb.meta.client, kinesis_consumer.dynamodb_client):
+            client.meta.events.register("before-call.dynamodb", lambda model, **kwargs: calls.append(model.name))
+
+        context = LambdaContext()
+        latencies = []
+        failed_batches = 0
+        started = time.perf_counter()
+        for start in range(0, len(events), batch_size):
+            batch_start = time.perf_counter()
+            response = kinesis_consumer.lambda_handler({"Records": events[start:start + batch_size]}, context)
+            latencies.append(time.perf_counter() - batch_start)
+            failed_batches += bool(response["batchItemFailures"])
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies) * 1000
+    queue.put({
+        "batch_size": batch_size,
+        "records_per_second": len(events) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "dynamodb_calls_per_record": len(calls) / len(events),
+        "failed_batches": failed_batches,
+        #ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def replay(path: str, batch_sizes: list) -> list:
+    spawn = multiprocessing.get_context("spawn")
+    queue = spawn.Queue()
+    results = []
+    for batch_size in batch_sizes:
+        process = spawn.Process(target=replay_once, args=(path, batch_size, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="write a recording of Kinesis event records")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--stream", help="record from this Kinesis stream instead of the simulator")
+    record_parser.add_argument("--pings", type=int, default=20000, help="records to write (per shard with --stream)")
+    record_parser.add_argument("--riders", type=int, default=2000)
+    record_parser.add_argument("--interval", type=float, default=5.0, help="seconds between fleet pings")
+    record_parser.add_argument("--delivery-ratio", type=float, default=0.1)
+    record_parser.add_argument("--seed", type=int, default=42)
+
+    replay_parser = commands.add_parser("replay", help="replay a recording through the consumer")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--batch-sizes", default="10,100,500")
+    replay_parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        if args.stream:
+            events = record_stream(args.stream, args.pings)
+        else:
+            events = record_synthetic(args.pings, args.riders, args.interval, args.delivery_ratio, args.seed)
+        with open(args.path, "w") as recording:
+            for event in events:
+                recording.write(json.dumps(event) + "\n")
+        print(f"Recorded {len(events)} Kinesis records to {args.path}")
+        return
+
+    results = replay(args.path, [int(size) for size in args.batch_sizes.split(",")])
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'batch':>6} {'records/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'ddb calls/rec':>14} {'failed':>7} {'peak RSS MB':>12}")
+    for result in results:
+        print(f"{result['batch_size']:>6} {result['records_per_second']:>10.0f} {result['p50_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f} {result['dynamodb_calls_per_record']:>14.3f} "
+              f"{result['failed_batches']:>7} {result['peak_rss_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
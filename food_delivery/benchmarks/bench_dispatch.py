@@ -0,0 +1,70 @@
+"""
+Benchmark for the nearest-available-rider dispatch solver.
+
+Places riders and pending orders uniformly over a city-sized area and times
+rider_dispatch.assign_riders, which only runs in-memory (no DynamoDB calls).
+
+    python food_delivery/benchmarks/bench_dispatch.py --riders 1000 --orders 1000
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data_stream_assets"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+
+import rider_dispatch
+
+#Amsterdam, roughly 20 km x 20 km around the centre
+CITY_CENTER = (52.3676, 4.9041)
+CITY_SPREAD_DEG = (0.09, 0.15)
+
+
+def random_points(rng, count: int) -> tuple:
+    lats = CITY_CENTER[0] + rng.uniform(-CITY_SPREAD_DEG[0], CITY_SPREAD_DEG[0], count)
+    lngs = CITY_CENTER[1] + rng.uniform(-CITY_SPREAD_DEG[1], CITY_SPREAD_DEG[1], count)
+    return lats, lngs
+
+
+def run_benchmark(rider_count: int, order_count: int, radius_km: float, repeats: int, seed: int):
+    rng = np.random.default_rng(seed)
+    rider_lats, rider_lngs = random_points(rng, rider_count)
+    order_lats, order_lngs = random_points(rng, order_count)
+
+    riders = [
+        {"rider_id": f"RIDER-{i:05d}", "lat": float(lat), "lng": float(lng)}
+        for i, (lat, lng) in enumerate(zip(rider_lats, rider_lngs))
+    ]
+    orders = [
+        {"orderId": f"ORD-{i:05d}", "userId": "bench", "lat": float(lat), "lng": float(lng)}
+        for i, (lat, lng) in enumerate(zip(order_lats, order_lngs))
+    ]
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        assignments, unassigned = rider_dispatch.assign_riders(orders, riders, radius_km)
+        timings.append(time.perf_counter() - start)
+
+    distances = np.array([assignment["distance_km"] for assignment in assignments])
+
+    print(f"Riders: {rider_count}, Orders: {order_count}, Radius: {radius_km} km")
+    print(f"Assigned: {len(assignments)}, Unassigned: {len(unassigned)}")
+    if distances.size:
+        print(f"Pickup distance km: mean {distances.mean():.2f}, p95 {np.percentile(distances, 95):.2f}")
+    print(f"Solve time: best {min(timings) * 1000:.1f} ms, median {np.median(timings) * 1000:.1f} ms over {repeats} runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rider dispatch")
+    parser.add_argument("--riders", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--radius", type=float, default=rider_dispatch.MAX_PICKUP_RADIUS_KM)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    run_benchmark(args.riders, args.orders, args.radius, args.repeats, args.seed)
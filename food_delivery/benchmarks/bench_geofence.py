@@ -0,0 +1,73 @@
+"""
+Microbenchmark of the delivery zone lookup.
+
+Looks up the zone of simulated fleet positions with the grid-accelerated
+ZoneIndex, one ping at a time as the consumer does for rider pings and as
+one array as the batch analytics do, against testing every polygon
+directly. Reports the cost per ping and the share of grid cells that need
+an exact polygon test.
+
+    python food_delivery/benchmarks/bench_geofence.py --pings 100000 --cell-degrees 0.005
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data_stream_assets"))
+
+import geofence
+from fleet import FleetSimulator
+
+ZONES_FILE = os.path.join(os.path.dirname(__file__), "..", "data_stream_assets", "zones.geojson")
+
+
+#every polygon tested for every point, what a lookup costs without the grid
+def brute_force(index: geofence.ZoneIndex, lats: list, lngs: list) -> list:
+    zones = []
+    for lat, lng in zip(lats, lngs):
+        zone = None
+        for name, rings in zip(index.names, index.ring_points):
+            if sum(geofence.ring_contains(ring, lng, lat) for ring in rings) % 2:
+                zone = name
+                break
+        zones.append(zone)
+    return zones
+
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pings", type=int, default=100000)
+    parser.add_argument("--cell-degrees", type=float, default=geofence.GRID_CELL_DEGREES)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    index, build_seconds = timed(geofence.load_zone_index, ZONES_FILE, args.cell_degrees)
+    fleet = FleetSimulator(args.pings, seed=args.seed)
+    fleet.step(5.0)
+    pings = fleet.pings()
+    lats = [ping["lat"] for ping in pings]
+    lngs = [ping["lng"] for ping in pings]
+
+    per_ping, per_ping_seconds = timed(lambda: [index.zone_at(lat, lng) for lat, lng in zip(lats, lngs)])
+    batch, batch_seconds = timed(index.zones_at, np.array(lats), np.array(lngs))
+    exact, exact_seconds = timed(brute_force, index, lats, lngs)
+    assert per_ping == batch.tolist() == exact
+
+    print(f"grid {index.rows}x{index.cols} built in {build_seconds * 1000:.1f} ms, "
+          f"{(index.cells == geofence.BOUNDARY).mean():.1%} boundary cells")
+    print(f"{'lookup':<12} {'us/ping':>9}")
+    for name, seconds in (("per ping", per_ping_seconds), ("batch", batch_seconds), ("brute force", exact_seconds)):
+        print(f"{name:<12} {seconds / len(pings) * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Load generator for the rider location pipeline.
+
+Moves a simulated fleet (fleet.FleetSimulator) and emits its pings at a target
+rate, either straight into the consumer handler or through an in-memory
+Kinesis stand-in that goes through the producer's PutRecords path, routes by
+partition key hash the way Kinesis does, and polls each shard in batches.
+DynamoDB is mocked with moto, so absolute numbers reflect this machine and not
+the service; use them to compare shard counts and batch sizes.
+
+    python food_delivery/benchmarks/load_generator.py --riders 10000 --rate 2000 --duration 10
+    python food_delivery/benchmarks/load_generator.py --target kinesis --shards 4 --aggregate
+"""
+
+import os
+import sys
+import math
+import json
+import time
+import base64
+import hashlib
+import argparse
+from collections import deque
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data_stream_assets"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("TABLE_NAME", "RidersPositionTable")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+
+import boto3
+from moto import mock_aws
+
+import kinesis_consumer
+import kinesis_producer
+from fleet import FleetSimulator
+
+#per-shard write limits of a provisioned Kinesis stream
+SHARD_RECORDS_PER_SECOND = 1000
+SHARD_BYTES_PER_SECOND = 1024 * 1024
+TICK_SECONDS = 0.1
+
+
+class LambdaContext:
+    function_name = "UpdateRiderLocation"
+    memory_limit_in_mb = 256
+    invoked_function_arn = "arn:aws:lambda:eu-west-1:123456789012:function:UpdateRiderLocation"
+    aws_request_id = "load-generator"
+
+
+#in-memory stream: MD5 of the partition key picks the shard, like Kinesis hash key ranges
+class LocalKinesisStream:
+
+    def __init__(self, shard_count: int):
+        self.shards = [deque() for _ in range(shard_count)]
+        self.shard_records = np.zeros(shard_count, dtype=np.int64)
+        self.shard_bytes = np.zeros(shard_count, dtype=np.int64)
+        self.sequence = 0
+
+    def shard_for(self, partition_key: str) -> int:
+        hash_key = int(hashlib.md5(partition_key.encode("utf-8")).hexdigest(), 16)
+        return hash_key * len(self.shards) >> 128
+
+    #same request and response shape as kinesis_client.put_records
+    def put_records(self, StreamName: str, Records: list) -> dict:
+        emitted_at = time.time()
+        results = []
+        for entry in Records:
+            shard = self.shard_for(entry["PartitionKey"])
+            self.sequence += 1
+            self.shards[shard].append((str(self.sequence), entry["Data"], entry["PartitionKey"], emitted_at))
+            self.shard_records[shard] += 1
+            self.shard_bytes[shard] += len(entry["Data"]) + len(entry["PartitionKey"])
+            results.append({"SequenceNumber": str(self.sequence), "ShardId": f"shardId-{shard:012d}"})
+        return {"FailedRecordCount": 0, "Records": results}
+
+    def get_batch(self, shard: int, batch_size: int) -> list:
+        queue = self.shards[shard]
+        return [queue.popleft() for _ in range(min(batch_size, len(queue)))]
+
+
+def create_riders_table():
+    dynamodb = boto3.resource("dynamodb")
+    dynamodb.create_table(
+        TableName=os.environ["TABLE_NAME"],
+        KeySchema=[{"AttributeName": "rider_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "rider_id", "AttributeType": "S"},
+            {"AttributeName": "geo_cell", "AttributeType": "S"},
+            {"AttributeName": "city_status", "AttributeType": "S"},
+            {"AttributeName": "last_updated_timestamp", "AttributeType": "N"},
+        ],
+        GlobalSecondaryIndexes=[{
+            "IndexName": "RiderCellIndex",
+            "KeySchema": [
+                {"AttributeName": "geo_cell", "KeyType": "HASH"},
+                {"AttributeName": "rider_id", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }, {
+            "IndexName": "RiderCityStatusIndex",
+            "KeySchema": [
+                {"AttributeName": "city_status", "KeyType": "HASH"},
+                {"AttributeName": "last_updated_timestamp", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def to_event_record(sequence: str, data: bytes, partition_key: str, emitted_at: float) -> dict:
+    return {
+        "kinesis": {
+            "sequenceNumber": sequence,
+            "partitionKey": partition_key,
+            "data": base64.b64encode(data).decode("utf-8"),
+            "approximateArrivalTimestamp": emitted_at,
+        },
+        "eventSourceARN": "arn:aws:kinesis:eu-west-1:123456789012:stream/LoadTest",
+    }
+
+
+class LoadRun:
+
+    def __init__(self, args):
+        self.args = args
+        self.fleet = FleetSimulator(args.riders, seed=args.seed)
+        self.stream = LocalKinesisStream(args.shards)
+        self.context = LambdaContext()
+        self.next_rider = 0
+        self.sequence = 0
+        self.emitted = 0
+        self.sent = 0
+        self.delivered = 0
+        self.latencies = []
+        self.handler_seconds = []
+
+    #round-robin over the fleet, so each rider pings every riders/rate seconds
+    def next_pings(self, count: int, now: float) -> list:
+        riders = (self.next_rider + np.arange(count)) % self.fleet.size
+        self.next_rider = int((self.next_rider + count) % self.fleet.size)
+        return self.fleet.pings(riders, now)
+
+    def invoke_consumer(self, event_records: list) -> None:
+        start = time.perf_counter()
+        kinesis_consumer.lambda_handler({"Records": event_records}, self.context)
+        self.handler_seconds.append(time.perf_counter() - start)
+
+        done = time.time()
+        self.latencies.extend(done - record["kinesis"]["approximateArrivalTimestamp"] for record in event_records)
+        self.delivered += len(event_records)
+
+    def emit(self, pings: list, now: float) -> None:
+        self.emitted += len(pings)
+        if self.args.target == "handler":
+            for start in range(0, len(pings), self.args.batch_size):
+                event_records = []
+                for ping in pings[start:start + self.args.batch_size]:
+                    self.sequence += 1
+                    payload = kinesis_producer.build_kinesis_record(ping, True)
+                    event_records.append(to_event_record(
+                        str(self.sequence), json.dumps(payload).encode("utf-8"), ping["rider_id"], now
+                    ))
+                self.invoke_consumer(event_records)
+            self.sent += len(pings)
+        else:
+            response = kinesis_producer.send_location_batch(
+                {"location_batch": pings, "aggregate": self.args.aggregate}, is_simulator=False
+            )
+            self.sent += json.loads(response["body"])["ping_count"]
+
+    #one poll per shard, as the event source mapping does with one concurrent batch per shard
+    def poll_shards(self) -> None:
+        for shard in range(len(self.stream.shards)):
+            batch = self.stream.get_batch(shard, self.args.batch_size)
+            if batch:
+                self.invoke_consumer([to_event_record(*entry) for entry in batch])
+
+    def run(self) -> float:
+        kinesis_producer.kinesis_client = self.stream
+        started = time.time()
+        last_tick = started
+        while True:
+            now = time.time()
+            elapsed = now - started
+            if elapsed >= self.args.duration:
+                break
+
+            self.fleet.step(now - last_tick)
+            last_tick = now
+            due = int(self.args.rate * elapsed) - self.emitted
+            if due > 0:
+                self.emit(self.next_pings(due, now), now)
+            if self.args.target == "kinesis":
+                self.poll_shards()
+
+            sleep_for = TICK_SECONDS - (time.time() - now)
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+
+        while self.args.target == "kinesis" and any(self.stream.shards):
+            self.poll_shards()
+        return time.time() - started
+
+    def report(self, wall_seconds: float) -> None:
+        args = self.args
+        latencies = np.array(self.latencies) * 1000
+        handler_ms = np.array(self.handler_seconds) * 1000
+
+        print(f"Target: {args.target}, Riders: {args.riders}, Requested rate: {args.rate}/s, Duration: {args.duration}s")
+        print(f"Emitted pings: {self.emitted}, sent after suppression: {self.sent}, Kinesis records consumed: {self.delivered}")
+        print(f"Achieved: {self.emitted / wall_seconds:.0f} pings/s emitted, {self.delivered / wall_seconds:.0f} records/s consumed")
+        if latencies.size:
+            print(f"End-to-end latency ms: p50 {np.percentile(latencies, 50):.1f}, "
+                  f"p95 {np.percentile(latencies, 95):.1f}, p99 {np.percentile(latencies, 99):.1f}")
+        if handler_ms.size:
+            records_per_invoke = self.delivered / handler_ms.size
+            per_instance = records_per_invoke / (handler_ms.mean() / 1000)
+            print(f"Consumer: {handler_ms.size} invocations, mean {handler_ms.mean():.1f} ms for "
+                  f"{records_per_invoke:.0f} records, ~{per_instance:.0f} records/s per concurrent batch")
+            records_rate = args.rate * self.delivered / max(self.emitted, 1)
+            print(f"Concurrent batches needed at {args.rate:.0f} pings/s: {math.ceil(records_rate / per_instance)}")
+
+        if args.target == "kinesis":
+            records_per_second = self.stream.shard_records / wall_seconds
+            bytes_per_second = self.stream.shard_bytes / wall_seconds
+            print(f"Per shard: peak {records_per_second.max():.0f} records/s, "
+                  f"{bytes_per_second.max() / 1024:.0f} KiB/s")
+            total_records = records_per_second.sum()
+            total_bytes = bytes_per_second.sum()
+        else:
+            #rider pings are roughly 300 bytes of JSON each
+            total_records = args.rate
+            total_bytes = args.rate * 300
+        shards = max(math.ceil(total_records / SHARD_RECORDS_PER_SECOND),
+                     math.ceil(total_bytes / SHARD_BYTES_PER_SECOND), 1)
+        print(f"Shards needed for write limits: {shards}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--riders", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=2000, help="target pings per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--target", choices=("handler", "kinesis"), default="handler")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--aggregate", action="store_true", help="aggregate pings in the producer")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with mock_aws():
+        create_riders_table()
+        run = LoadRun(args)
+        run.report(run.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import random
+import boto3
+from aws_lambda_powertools import Logger
+from lru import LRUCache
+
+
+logger = Logger(service="alert_publisher")
+
+
+events_client = boto3.client('events')
+EVENT_BUS_NAME = os.environ.get('EVENT_BUS_NAME')
+ALERT_SOURCE = 'food_delivery.location_stream'
+
+#PutEvents accepts at most 10 entries per call
+PUT_EVENTS_LIMIT = 10
+MAX_PUT_EVENTS_ATTEMPTS = int(os.environ.get('MAX_PUT_EVENTS_ATTEMPTS', '3'))
+#the same alert for the same delivery is raised at most once per cooldown
+ALERT_COOLDOWN_SECONDS = float(os.environ.get('ALERT_COOLDOWN_SECONDS', '300'))
+MAX_TRACKED_ALERTS = int(os.environ.get('MAX_TRACKED_ALERTS', '50000'))
+
+#(delivery_id, alert type) -> time it was last published
+published_alerts = LRUCache(MAX_TRACKED_ALERTS)
+
+
+#publish the alerts of a batch of processed deliveries, skipping those still cooling down.
+#Returns how many alerts could not be published.
+def publish_alerts(processed_records: list, now: float = None) -> int:
+    now = time.time() if now is None else now
+    pending = []
+    for record in processed_records:
+        for alert in record['alerts']:
+            key = (record['delivery_id'], alert['type'])
+            last_published = published_alerts.get(key)
+            if last_published is not None and now - last_published < ALERT_COOLDOWN_SECONDS:
+                continue
+            #one alert per key even if the batch holds several pings of the delivery
+            published_alerts.put(key, now)
+            pending.append((key, build_alert_entry(record, alert)))
+
+    failed = []
+    for start in range(0, len(pending), PUT_EVENTS_LIMIT):
+        failed.extend(put_alert_entries(pending[start:start + PUT_EVENTS_LIMIT]))
+
+    #let the next ping raise them again instead of waiting out the cooldown
+    for key, _ in failed:
+        published_alerts.pop(key)
+
+    logger.info(f"Published {len(pending) - len(failed)} alerts, {len(failed)} failed")
+    return len(failed)
+
+
+def build_alert_entry(record: dict, alert: dict) -> dict:
+    return {
+        'Source': ALERT_SOURCE,
+        'DetailType': alert['type'],
+        'Detail': json.dumps({
+            'delivery_id': record['delivery_id'],
+            'order_id': record['order_id'],
+            'status': record['status'],
+            'delivery_zone': record['analytics']['delivery_zone'],
+            'priority_level': record['analytics']['priority_level'],
+            'estimated_delay': record['analytics']['estimated_delay'],
+            'message': alert['message'],
+            'event_id': record['event_id'],
+            'timestamp': record['timestamp']
+        }),
+        'EventBusName': EVENT_BUS_NAME
+    }
+
+
+#rider zone exits and entries, without a cooldown since the zone tracker raises each crossing once.
+#Returns how many events could not be published.
+def publish_zone_transitions(transitions: list) -> int:
+    pending = [(None, build_zone_transition_entry(transition)) for transition in transitions]
+    failed = []
+    for start in range(0, len(pending), PUT_EVENTS_LIMIT):
+        failed.extend(put_alert_entries(pending[start:start + PUT_EVENTS_LIMIT]))
+
+    logger.info(f"Published {len(pending) - len(failed)} zone transitions, {len(failed)} failed")
+    return len(failed)
+
+
+def build_zone_transition_entry(transition: dict) -> dict:
+    return {
+        'Source': ALERT_SOURCE,
+        'DetailType': transition['type'],
+        'Detail': json.dumps(transition),
+        'EventBusName': EVENT_BUS_NAME
+    }
+
+
+#one PutEvents call, then only the rejected entries again with jittered backoff.
+#Returns the (key, entry) pairs still failing after the last attempt.
+def put_alert_entries(pending: list) -> list:
+    for attempt in range(MAX_PUT_EVENTS_ATTEMPTS):
+        try:
+            response = events_client.put_events(Entries=[entry for _, entry in pending])
+            results = response['Entries']
+        except Exception as e:
+            logger.warning(f"PutEvents failed for {len(pending)} alerts: {str(e)}")
+            results = [{'ErrorCode': 'RequestFailed'}] * len(pending)
+
+        pending = [item for item, result in zip(pending, results) if 'ErrorCode' in result]
+        if not pending or attempt == MAX_PUT_EVENTS_ATTEMPTS - 1:
+            break
+        time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+
+    if pending:
+        logger.error(f"Dropping {len(pending)} alerts after {MAX_PUT_EVENTS_ATTEMPTS} attempts")
+    return pending
@@ -0,0 +1,71 @@
+import argparse
+import pyarrow as pa
+import pyarrow.dataset as ds
+from location_archive import SCHEMAS
+
+
+#Read back the stream archive written by stream_archiver, from a local copy
+#(aws s3 sync s3://<bucket> ./archive) or straight from an s3:// URI.
+#Date and zone come from the Hive-style partition directories; only the
+#matching partitions and requested columns are read.
+def read_archive(root: str, dataset: str, start_date: str = None, end_date: str = None,
+                 zones: list = None, columns: list = None, dedupe: bool = True):
+    archive = ds.dataset(
+        f"{root.rstrip('/')}/{dataset}",
+        format='parquet',
+        partitioning='hive',
+        schema=archive_schema(dataset)
+    )
+
+    conditions = []
+    if start_date:
+        conditions.append(ds.field('date') >= start_date)
+    if end_date:
+        conditions.append(ds.field('date') <= end_date)
+    if zones:
+        conditions.append(ds.field('zone').isin(zones))
+    row_filter = None
+    for condition in conditions:
+        row_filter = condition if row_filter is None else row_filter & condition
+
+    #dedupe needs event_id even when the caller did not ask for it
+    read_columns = None if columns is None else list(dict.fromkeys(columns + (['event_id'] if dedupe else [])))
+    frame = archive.to_table(columns=read_columns, filter=row_filter).to_pandas()
+
+    #a retried or bisected batch can archive the same record twice
+    if dedupe:
+        frame = frame.drop_duplicates('event_id', ignore_index=True)
+    return frame[columns] if columns is not None else frame
+
+
+#file columns plus the two partition columns
+def archive_schema(dataset: str) -> pa.Schema:
+    return SCHEMAS[dataset].append(pa.field('date', pa.string())).append(pa.field('zone', pa.string()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the location stream archive")
+    parser.add_argument("root", help="local archive directory or s3://bucket")
+    parser.add_argument("dataset", choices=sorted(SCHEMAS))
+    parser.add_argument("--start", help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", help="last date, YYYY-MM-DD")
+    parser.add_argument("--zone", action="append", help="repeat for several zones")
+    parser.add_argument("--columns", help="comma-separated columns to read")
+    parser.add_argument("--output", help="write the rows to this .parquet or .csv file instead of printing")
+    args = parser.parse_args()
+
+    frame = read_archive(
+        args.root, args.dataset, args.start, args.end, args.zone,
+        args.columns.split(",") if args.columns else None
+    )
+    if not args.output:
+        print(frame)
+        print(f"{len(frame)} rows")
+    elif args.output.endswith(".csv"):
+        frame.to_csv(args.output, index=False)
+    else:
+        frame.to_parquet(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+from geo import bearing_degrees, haversine_km
+from lru import LRUCache
+
+
+#points kept per rider or delivery, and how old a point may be to still count
+TRACK_POINTS = int(os.environ.get('TRACK_POINTS', '8'))
+TRACK_MAX_AGE_SECONDS = float(os.environ.get('TRACK_MAX_AGE_SECONDS', '300'))
+#a track shorter than this in time says little about speed
+MIN_TRACK_SECONDS = 20.0
+MAX_TRACKS = int(os.environ.get('MAX_TRACKS', '20000'))
+
+#streets are longer than the great circle
+ROAD_FACTOR = 1.3
+#speed assumed with no usable track, and the range a track's speed is clipped to, km/h
+DEFAULT_SPEED_KMH = 18.0
+MIN_SPEED_KMH = 5.0
+MAX_SPEED_KMH = 60.0
+#a rider heading away from the destination still makes some progress
+MIN_HEADING_PROGRESS = 0.5
+
+#columns of a track point; speed and heading are NaN where the source did not report them
+TIME, LAT, LNG, SPEED, HEADING = range(5)
+
+
+#Recent points per rider and per delivery, oldest first, kept across warm invocations.
+#Rider pings report speed and heading, delivery records only their position.
+class RecentTracks:
+
+    def __init__(self, max_tracks: int = MAX_TRACKS, points: int = TRACK_POINTS):
+        self.points = points
+        self.tracks = LRUCache(max_tracks)
+
+    #out-of-order points are dropped, the track only moves forward in time
+    def add(self, key: str, timestamp: float, lat: float, lng: float,
+            speed: float = np.nan, heading: float = np.nan) -> None:
+        track = self.tracks.get(key, ())
+        if track and timestamp <= track[-1][TIME]:
+            return
+        self.tracks.put(key, track[-(self.points - 1):] + ((timestamp, lat, lng, speed, heading),))
+
+    def add_rider_ping(self, rider_data: dict, timestamp: float) -> None:
+        self.add(
+            rider_data['rider_id'], timestamp, float(rider_data['lat']), float(rider_data['lng']),
+            float(rider_data.get('speed', np.nan)), float(rider_data.get('heading', np.nan))
+        )
+
+    def add_delivery(self, data: dict, timestamp: float) -> None:
+        location = data['location']
+        if 'latitude' in location and 'longitude' in location:
+            self.add(data['delivery_id'], timestamp, float(location['latitude']), float(location['longitude']))
+
+    #the assigned rider's track when we have one, otherwise the delivery's own
+    def track_for(self, data: dict) -> tuple:
+        rider_id = data.get('rider_id') or data.get('driver_id')
+        rider_track = self.tracks.get(rider_id) if rider_id else None
+        return rider_track or self.tracks.get(data.get('delivery_id'), ())
+
+    def clear(self) -> None:
+        self.tracks.clear()
+
+
+#tracks as (deliveries, TRACK_POINTS, 5) array, newest point last, NaN padded and
+#with points older than TRACK_MAX_AGE_SECONDS blanked
+def track_array(tracks: list, now: float, points: int = TRACK_POINTS) -> np.ndarray:
+    array = np.full((len(tracks), points, 5), np.nan)
+    for i, track in enumerate(tracks):
+        if track:
+            recent = track[-points:]
+            array[i, points - len(recent):] = recent
+    array[array[:, :, TIME] < now - TRACK_MAX_AGE_SECONDS] = np.nan
+    return array
+
+
+#(speed km/h, heading degrees) per delivery: the track's average ground speed when it spans
+#long enough, else the last reported speed, else the default; heading as reported or as last moved
+def track_motion(tracks: np.ndarray) -> tuple:
+    lat, lng, times = tracks[:, :, LAT], tracks[:, :, LNG], tracks[:, :, TIME]
+    segment_km = haversine_km(lat[:, :-1], lng[:, :-1], lat[:, 1:], lng[:, 1:])
+    path_km = np.nansum(segment_km, axis=1)
+
+    valid = ~np.isnan(times)
+    span = np.where(
+        valid.any(axis=1),
+        np.max(np.where(valid, times, -np.inf), axis=1) - np.min(np.where(valid, times, np.inf), axis=1),
+        0.0
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ground_speed = np.where(span >= MIN_TRACK_SECONDS, path_km / span * 3600, np.nan)
+
+    reported_speed = tracks[:, -1, SPEED]
+    speed = np.where(np.isnan(ground_speed), np.where(reported_speed > 0, reported_speed, np.nan), ground_speed)
+    speed = np.clip(np.where(np.isnan(speed), DEFAULT_SPEED_KMH, speed), MIN_SPEED_KMH, MAX_SPEED_KMH)
+
+    #a delivery track has no heading, the direction of its last move stands in if it moved at all
+    moved = segment_km[:, -1] > 0.01
+    heading = np.where(
+        np.isnan(tracks[:, -1, HEADING]) & moved,
+        bearing_degrees(lat[:, -2], lng[:, -2], lat[:, -1], lng[:, -1]),
+        tracks[:, -1, HEADING]
+    )
+    return speed, heading
+
+
+#arrival time per delivery from its position, destination and recent motion.
+#Without a destination or position nothing is left to predict, so arrival is now.
+def estimate_arrivals(lat, lng, dest_lat, dest_lng, status, tracks: list, now: float) -> np.ndarray:
+    speed, heading = track_motion(track_array(tracks, now))
+
+    remaining_km = np.nan_to_num(haversine_km(lat, lng, dest_lat, dest_lng), nan=0.0) * ROAD_FACTOR
+    remaining_km = np.where(status == 'delivered', 0.0, remaining_km)
+
+    turn = np.radians(bearing_degrees(lat, lng, dest_lat, dest_lng) - heading)
+    progress = np.where(np.isnan(turn), 1.0, np.clip(np.cos(turn), MIN_HEADING_PROGRESS, 1.0))
+
+    return now + remaining_km / (speed * progress) * 3600
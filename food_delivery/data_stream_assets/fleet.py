@@ -0,0 +1,115 @@
+import math
+import numpy as np
+from geo import EARTH_RADIUS_KM, haversine_km
+
+
+#the cities the consumer knows delivery zones for
+CITY_CENTERS = {
+    'Amsterdam': (52.3676, 4.9041),
+    'Rotterdam': (51.9244, 4.4777),
+    'The Hague': (52.0705, 4.3007),
+    'Utrecht': (52.0907, 5.1214),
+    'Eindhoven': (51.4416, 5.4697),
+}
+CITY_RADIUS_KM = 6.0
+
+VEHICLE_TYPES = ('bike', 'scooter', 'car')
+#cruise speed range per vehicle type, km/h
+VEHICLE_SPEEDS_KMH = np.array([(12.0, 22.0), (20.0, 35.0), (25.0, 50.0)])
+
+STATUSES = ('available', 'busy', 'offline')
+STATUS_WEIGHTS = (0.5, 0.4, 0.1)
+#a rider keeps its status this long on average
+MEAN_STATUS_SECONDS = 600.0
+#longest single step when catching up with the wall clock
+MAX_STEP_SECONDS = 900.0
+
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+#a fleet of riders riding between random waypoints in their city, stepped as arrays
+class FleetSimulator:
+
+    def __init__(self, size: int, seed: int = None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.cities = np.array(list(CITY_CENTERS), dtype=object)
+        centers = np.array(list(CITY_CENTERS.values()))
+
+        self.city_index = self.rng.integers(len(self.cities), size=size)
+        self.center_lat = centers[self.city_index, 0]
+        self.center_lng = centers[self.city_index, 1]
+        self.rider_ids = np.array([f"RIDER-{i:05d}" for i in range(size)], dtype=object)
+
+        self.vehicle = self.rng.integers(len(VEHICLE_TYPES), size=size)
+        low, high = VEHICLE_SPEEDS_KMH[self.vehicle, 0], VEHICLE_SPEEDS_KMH[self.vehicle, 1]
+        self.cruise_kmh = self.rng.uniform(low, high)
+        self.status = self.rng.choice(len(STATUSES), size=size, p=STATUS_WEIGHTS)
+
+        everyone = np.arange(size)
+        self.lat, self.lng = self.random_points(everyone)
+        self.target_lat, self.target_lng = self.random_points(everyone)
+        self.speed_kmh = np.zeros(size)
+        self.heading = np.zeros(size)
+        self.clock = None
+
+    #uniform points in a disc around each rider's city centre
+    def random_points(self, riders: np.ndarray) -> tuple:
+        radius_km = CITY_RADIUS_KM * np.sqrt(self.rng.uniform(size=riders.size))
+        angle = self.rng.uniform(0, 2 * np.pi, size=riders.size)
+        lat = self.center_lat[riders] + radius_km * np.cos(angle) / KM_PER_DEG_LAT
+        lng = self.center_lng[riders] + radius_km * np.sin(angle) / (
+            KM_PER_DEG_LAT * np.cos(np.radians(self.center_lat[riders]))
+        )
+        return lat, lng
+
+    #advance every rider by `seconds` towards its waypoint, picking a new one on arrival
+    def step(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+
+        changes = self.rng.uniform(size=self.size) < 1 - math.exp(-seconds / MEAN_STATUS_SECONDS)
+        self.status[changes] = self.rng.choice(len(STATUSES), size=int(changes.sum()), p=STATUS_WEIGHTS)
+
+        moving = self.status != STATUSES.index('offline')
+        jitter = self.rng.uniform(0.8, 1.1, size=self.size)
+        self.speed_kmh = np.where(moving, self.cruise_kmh * jitter, 0.0)
+
+        remaining_km = haversine_km(self.lat, self.lng, self.target_lat, self.target_lng)
+        travel_km = np.minimum(self.speed_kmh * seconds / 3600, remaining_km)
+
+        north_km = (self.target_lat - self.lat) * KM_PER_DEG_LAT
+        east_km = (self.target_lng - self.lng) * KM_PER_DEG_LAT * np.cos(np.radians(self.lat))
+        bearing = np.arctan2(east_km, north_km)
+        self.heading = np.where(moving, np.degrees(bearing) % 360, self.heading)
+
+        self.lat = self.lat + travel_km * np.cos(bearing) / KM_PER_DEG_LAT
+        self.lng = self.lng + travel_km * np.sin(bearing) / (KM_PER_DEG_LAT * np.cos(np.radians(self.lat)))
+
+        arrived = np.flatnonzero(remaining_km - travel_km < 0.01)
+        if arrived.size:
+            self.target_lat[arrived], self.target_lng[arrived] = self.random_points(arrived)
+
+    #catch up with wall-clock time `now`, e.g. between warm Lambda invocations
+    def advance_to(self, now: float) -> None:
+        if self.clock is not None:
+            self.step(min(now - self.clock, MAX_STEP_SECONDS))
+        self.clock = now
+
+    #pings in the producer's rider schema, for all riders or the given indices
+    def pings(self, riders=None, now: float = 0.0) -> list:
+        riders = np.arange(self.size) if riders is None else np.asarray(riders)
+        return [
+            {
+                'rider_id': self.rider_ids[i],
+                'lat': round(float(self.lat[i]), 6),
+                'lng': round(float(self.lng[i]), 6),
+                'city': self.cities[self.city_index[i]],
+                'speed': round(float(self.speed_kmh[i]), 1),
+                'heading': int(self.heading[i]),
+                'status': STATUSES[self.status[i]],
+                'vehicle_type': VEHICLE_TYPES[self.vehicle[i]],
+                'last_updated': now
+            }
+            for i in riders.tolist()
+        ]
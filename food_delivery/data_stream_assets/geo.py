@@ -0,0 +1,187 @@
+import os
+import math
+import time
+import numpy as np
+from boto3.dynamodb.conditions import Key, Attr
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+#geohash precision of the rider cell index, roughly 4.9 km x 4.9 km at the equator
+CELL_PRECISION = 5
+CELL_INDEX_NAME = 'RiderCellIndex'
+#"<city>#<status>" partition, sorted by when the consumer last heard from the rider
+CITY_STATUS_INDEX_NAME = 'RiderCityStatusIndex'
+#riders not heard from for longer are left out of query results
+RIDER_FRESHNESS_SECONDS = int(os.environ.get('RIDER_FRESHNESS_SECONDS', '300'))
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+#great-circle distance in km, broadcasting over scalars or arrays of points
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+#initial great-circle bearing from the first point to the second, degrees clockwise from north
+def bearing_degrees(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    y = np.sin(lng2 - lng1) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lng2 - lng1)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+#cell size in degrees for a given precision
+def cell_size_degrees(precision: int = CELL_PRECISION) -> tuple:
+    lat_bits, lng_bits = _grid_bits(precision)
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def _grid_bits(precision: int) -> tuple:
+    total_bits = precision * 5
+    return total_bits // 2, (total_bits + 1) // 2
+
+
+#(row, col) of the geohash cell holding each point, vectorized over arrays
+def grid_cells(lats, lngs, precision: int = CELL_PRECISION) -> tuple:
+    lat_bits, lng_bits = _grid_bits(precision)
+    cell_lat_deg, cell_lng_deg = cell_size_degrees(precision)
+    rows = np.floor((np.asarray(lats, dtype=np.float64) + 90.0) / cell_lat_deg).astype(np.int64)
+    cols = np.floor((np.asarray(lngs, dtype=np.float64) + 180.0) / cell_lng_deg).astype(np.int64)
+    return np.clip(rows, 0, 2 ** lat_bits - 1), cols % 2 ** lng_bits
+
+
+#interleave the column (longitude) and row (latitude) bits into a base32 geohash
+def grid_to_geohash(row: int, col: int, precision: int = CELL_PRECISION) -> str:
+    lat_bits, lng_bits = _grid_bits(precision)
+    value = 0
+    for k in range(precision * 5):
+        if k % 2 == 0:
+            bit = (col >> (lng_bits - 1 - k // 2)) & 1
+        else:
+            bit = (row >> (lat_bits - 1 - k // 2)) & 1
+        value = (value << 1) | bit
+
+    return ''.join(
+        _BASE32[(value >> shift) & 31]
+        for shift in range(precision * 5 - 5, -1, -5)
+    )
+
+
+def geohash_encode(lat: float, lng: float, precision: int = CELL_PRECISION) -> str:
+    rows, cols = grid_cells(lat, lng, precision)
+    return grid_to_geohash(int(rows), int(cols), precision)
+
+
+#how many cells either side of a point at this latitude can lie within radius_km
+def grid_steps(lat: float, radius_km: float, precision: int = CELL_PRECISION) -> tuple:
+    cell_lat_deg, cell_lng_deg = cell_size_degrees(precision)
+    km_per_deg_lat = math.pi * EARTH_RADIUS_KM / 180
+    km_per_deg_lng = km_per_deg_lat * max(math.cos(math.radians(abs(lat) + radius_km / km_per_deg_lat)), 1e-6)
+    return (
+        math.ceil(radius_km / (cell_lat_deg * km_per_deg_lat)),
+        math.ceil(radius_km / (cell_lng_deg * km_per_deg_lng))
+    )
+
+
+#(row, col) of every cell that can contain a point within radius_km of (lat, lng)
+def grid_neighbourhood(lat: float, lng: float, radius_km: float, precision: int = CELL_PRECISION) -> list:
+    lat_bits, lng_bits = _grid_bits(precision)
+    rows, cols = grid_cells(lat, lng, precision)
+    row, col = int(rows), int(cols)
+    lat_steps, lng_steps = grid_steps(lat, radius_km, precision)
+
+    return [
+        (r, (col + j) % 2 ** lng_bits)
+        for r in range(max(row - lat_steps, 0), min(row + lat_steps, 2 ** lat_bits - 1) + 1)
+        for j in range(-lng_steps, lng_steps + 1)
+    ]
+
+
+#every geohash cell that can contain a point within radius_km of (lat, lng)
+def cells_within(lat: float, lng: float, radius_km: float, precision: int = CELL_PRECISION) -> set:
+    return {
+        grid_to_geohash(row, col, precision)
+        for row, col in grid_neighbourhood(lat, lng, radius_km, precision)
+    }
+
+
+#all riders indexed under the given cells, optionally filtered by status and freshness
+def query_cells(table, cells, status: str = None, max_age_seconds: int = None) -> list:
+    conditions = []
+    if status:
+        conditions.append(Attr('status').eq(status))
+    if max_age_seconds is not None:
+        conditions.append(Attr('last_updated_timestamp').gte(int(time.time()) - max_age_seconds))
+
+    riders = []
+    for cell in cells:
+        query_kwargs = {
+            'IndexName': CELL_INDEX_NAME,
+            'KeyConditionExpression': Key('geo_cell').eq(cell)
+        }
+        if conditions:
+            filter_expression = conditions[0]
+            for condition in conditions[1:]:
+                filter_expression = filter_expression & condition
+            query_kwargs['FilterExpression'] = filter_expression
+        while True:
+            response = table.query(**query_kwargs)
+            riders.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return riders
+
+
+#riders within radius_km heard from within max_age_seconds, read from the cell index instead of scanning the table
+def riders_within(table, lat: float, lng: float, radius_km: float, status: str = None,
+                  max_age_seconds: int = RIDER_FRESHNESS_SECONDS) -> list:
+    riders = query_cells(table, cells_within(lat, lng, radius_km), status, max_age_seconds)
+    if not riders:
+        return []
+
+    distances = haversine_km(
+        lat, lng,
+        [float(rider['lat']) for rider in riders],
+        [float(rider['lng']) for rider in riders]
+    )
+    nearby = [
+        dict(rider, distance_km=round(float(distance), 3))
+        for rider, distance in zip(riders, distances)
+        if distance <= radius_km
+    ]
+    return sorted(nearby, key=lambda rider: rider['distance_km'])
+
+
+def city_status_key(city: str, status: str) -> str:
+    return f"{city}#{status}"
+
+
+#riders of one city and status heard from within max_age_seconds, most recent first.
+#Freshness is a sort key range, so stale and TTL-pending items are never read.
+def riders_by_city_status(table, city: str, status: str, max_age_seconds: int = RIDER_FRESHNESS_SECONDS,
+                          limit: int = None) -> list:
+    query_kwargs = {
+        'IndexName': CITY_STATUS_INDEX_NAME,
+        'KeyConditionExpression': (
+            Key('city_status').eq(city_status_key(city, status))
+            & Key('last_updated_timestamp').gte(int(time.time()) - max_age_seconds)
+        ),
+        'ScanIndexForward': False
+    }
+    riders = []
+    while limit is None or len(riders) < limit:
+        if limit is not None:
+            query_kwargs['Limit'] = limit - len(riders)
+        response = table.query(**query_kwargs)
+        riders.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return riders
@@ -0,0 +1,191 @@
+import json
+import math
+import numpy as np
+from lru import LRUCache
+
+
+#grid cells are this many degrees on a side, about 550 m north-south
+GRID_CELL_DEGREES = 0.005
+
+#cell values besides a zone index
+OUTSIDE = -1
+#a zone boundary passes through the cell, points in it need an exact polygon test
+BOUNDARY = -2
+
+
+#Delivery zones as polygons, with a grid precomputed over their bounding box.
+#A cell no boundary edge passes through lies wholly inside one zone or outside all of them,
+#so most points resolve with one grid read and only boundary cells test polygons.
+#Overlapping zones resolve to the first one in file order.
+class ZoneIndex:
+
+    def __init__(self, names: list, rings: list, cell_degrees: float = GRID_CELL_DEGREES):
+        #rings[i] holds every ring of zone i as (lng, lat) arrays, holes included;
+        #the even-odd rule over all of them handles holes and multipolygons alike
+        self.names = list(names)
+        self.rings = [[np.asarray(ring, dtype=np.float64) for ring in zone_rings] for zone_rings in rings]
+        self.ring_points = [[[tuple(point) for point in ring] for ring in zone_rings] for zone_rings in self.rings]
+        self.cell_degrees = cell_degrees
+
+        all_points = np.concatenate([ring for zone_rings in self.rings for ring in zone_rings])
+        self.min_lng, self.min_lat = all_points.min(axis=0)
+        max_lng, max_lat = all_points.max(axis=0)
+        self.rows = int(math.floor((max_lat - self.min_lat) / cell_degrees)) + 1
+        self.cols = int(math.floor((max_lng - self.min_lng) / cell_degrees)) + 1
+        self.bounds = np.array([
+            np.concatenate(zone_rings).min(axis=0).tolist() + np.concatenate(zone_rings).max(axis=0).tolist()
+            for zone_rings in self.rings
+        ])
+        self.bound_list = self.bounds.tolist()
+
+        self.cells = self._build_grid()
+        #nested lists read faster than NumPy scalars on the per-ping path
+        self.cell_rows = self.cells.tolist()
+
+    def _build_grid(self) -> np.ndarray:
+        cells = np.full((self.rows, self.cols), OUTSIDE, dtype=np.int16)
+
+        #every cell under an edge's bounding box may be crossed by it, which over-marks a little but never misses
+        for zone_rings in self.rings:
+            for ring in zone_rings:
+                start_rows, start_cols = self._cell_of(ring[:-1, 1], ring[:-1, 0])
+                end_rows, end_cols = self._cell_of(ring[1:, 1], ring[1:, 0])
+                for r1, c1, r2, c2 in zip(start_rows, start_cols, end_rows, end_cols):
+                    cells[min(r1, r2):max(r1, r2) + 1, min(c1, c2):max(c1, c2) + 1] = BOUNDARY
+
+        #the rest is uniform, so the cell centre decides the whole cell
+        rows, cols = np.nonzero(cells == OUTSIDE)
+        centre_lats = self.min_lat + (rows + 0.5) * self.cell_degrees
+        centre_lngs = self.min_lng + (cols + 0.5) * self.cell_degrees
+        cells[rows, cols] = self._locate_exact(centre_lats, centre_lngs)
+        return cells
+
+    def _cell_of(self, lats, lngs) -> tuple:
+        rows = np.floor((np.asarray(lats, dtype=np.float64) - self.min_lat) / self.cell_degrees).astype(np.int64)
+        cols = np.floor((np.asarray(lngs, dtype=np.float64) - self.min_lng) / self.cell_degrees).astype(np.int64)
+        return np.clip(rows, 0, self.rows - 1), np.clip(cols, 0, self.cols - 1)
+
+    #zone index per point by testing the polygons directly, OUTSIDE where none contains it
+    def _locate_exact(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        located = np.full(len(lats), OUTSIDE, dtype=np.int16)
+        for index in range(len(self.names)):
+            min_lng, min_lat, max_lng, max_lat = self.bounds[index]
+            pending = np.flatnonzero(
+                (located == OUTSIDE) & (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+            )
+            if pending.size:
+                inside = rings_contain(self.rings[index], lngs[pending], lats[pending])
+                located[pending[inside]] = index
+        return located
+
+    #zone name of one point, or default outside every zone
+    def zone_at(self, lat: float, lng: float, default: str = None) -> str:
+        row = (lat - self.min_lat) / self.cell_degrees
+        col = (lng - self.min_lng) / self.cell_degrees
+        #also false for NaN coordinates
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return default
+
+        cell = self.cell_rows[int(row)][int(col)]
+        if cell == BOUNDARY:
+            cell = self._locate_point(lat, lng)
+        return self.names[cell] if cell != OUTSIDE else default
+
+    def _locate_point(self, lat: float, lng: float) -> int:
+        for index, (min_lng, min_lat, max_lng, max_lat) in enumerate(self.bound_list):
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                if sum(ring_contains(ring, lng, lat) for ring in self.ring_points[index]) % 2:
+                    return index
+        return OUTSIDE
+
+    #zone names for arrays of points, default outside every zone
+    def zones_at(self, lats, lngs, default: str = None) -> np.ndarray:
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        rows = np.floor((lats - self.min_lat) / self.cell_degrees)
+        cols = np.floor((lngs - self.min_lng) / self.cell_degrees)
+        in_grid = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+
+        located = np.full(len(lats), OUTSIDE, dtype=np.int16)
+        located[in_grid] = self.cells[rows[in_grid].astype(np.int64), cols[in_grid].astype(np.int64)]
+        boundary = np.flatnonzero(located == BOUNDARY)
+        if boundary.size:
+            located[boundary] = self._locate_exact(lats[boundary], lngs[boundary])
+
+        names = np.array(self.names + [default], dtype=object)
+        return names[np.where(located == OUTSIDE, len(self.names), located)]
+
+
+#even-odd ray casting for many points against a set of rings
+def rings_contain(rings: list, lngs: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    inside = np.zeros(len(lngs), dtype=bool)
+    lngs, lats = lngs[:, None], lats[:, None]
+    for ring in rings:
+        x1, y1, x2, y2 = ring[:-1, 0], ring[:-1, 1], ring[1:, 0], ring[1:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crosses = ((y1 > lats) != (y2 > lats)) & (lngs < (x2 - x1) * (lats - y1) / (y2 - y1) + x1)
+        inside ^= np.logical_xor.reduce(crosses, axis=1)
+    return inside
+
+
+#even-odd ray casting for one point, in plain Python since it runs per ping
+def ring_contains(ring: list, lng: float, lat: float) -> bool:
+    inside = False
+    x1, y1 = ring[0]
+    for x2, y2 in ring[1:]:
+        if (y1 > lat) != (y2 > lat) and lng < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+#GeoJSON FeatureCollection of Polygon/MultiPolygon features, each with a 'zone' property
+def load_zone_index(path: str, cell_degrees: float = GRID_CELL_DEGREES) -> ZoneIndex:
+    with open(path) as zones_file:
+        collection = json.load(zones_file)
+
+    names, rings = [], []
+    for feature in collection['features']:
+        geometry = feature['geometry']
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            raise ValueError(f"Unsupported zone geometry {geometry['type']}")
+
+        names.append(feature['properties']['zone'])
+        rings.append([close_ring(ring) for polygon in polygons for ring in polygon])
+
+    return ZoneIndex(names, rings, cell_degrees)
+
+
+def close_ring(ring: list) -> list:
+    return ring if ring[0] == ring[-1] else ring + [ring[0]]
+
+
+#last known zone per rider, turning consecutive pings into zone exit and entry events.
+#A rider's first ping in this container only sets the baseline.
+class ZoneTracker:
+
+    def __init__(self, max_riders: int):
+        self.last_seen = LRUCache(max_riders)
+
+    #pings no newer than the last one seen are ignored, so replayed batches raise nothing twice
+    def update(self, rider_id: str, zone: str, timestamp: float) -> list:
+        previous = self.last_seen.get(rider_id)
+        if previous is not None and timestamp <= previous[0]:
+            return []
+        self.last_seen.put(rider_id, (timestamp, zone))
+        if previous is None or previous[1] == zone:
+            return []
+
+        events = []
+        if previous[1] is not None:
+            events.append({'type': 'ZONE_EXIT', 'rider_id': rider_id, 'zone': previous[1], 'timestamp': timestamp})
+        if zone is not None:
+            events.append({'type': 'ZONE_ENTER', 'rider_id': rider_id, 'zone': zone, 'timestamp': timestamp})
+        return events
+
+    def clear(self) -> None:
+        self.last_seen.clear()
@@ -1,88 +1,234 @@
 import os
-import json
 import base64
 import boto3
-import random
+import time
+import numpy as np
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from aws_lambda_powertools import Logger, Tracer
+from boto3.dynamodb.types import TypeSerializer
+from aws_lambda_powertools import Logger, Metrics, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from location_analytics import ZONE_MAPPING, analyze_delivery_batch, zone_index
+from geo import city_status_key, geohash_encode, haversine_km
+from movement_filter import MovementFilter, SUPPRESS_STATIONARY_PINGS, MAX_TRACKED_RIDERS
+from lru import LRUCache
+from trail_store import append_trail_points
+from ping_codec import decode_payload
+from alert_publisher import EVENT_BUS_NAME, publish_alerts, publish_zone_transitions
+from geofence import ZoneTracker
+from eta import RecentTracks, estimate_arrivals
+from stream_metrics import (
+    ANALYTICS, DECODE, DELIVERY, DYNAMODB_WRITE, METRICS_NAMESPACE, PUBLISH, PUBLISH_FAILURES, RIDER_PING, BatchMetrics
+)
+from zone_windows import flush_window, summarize_window, update_window_state
 
 
 logger = Logger(service="kinesis_consumer")
 tracer = Tracer(service="kinesis_consumer")
+metrics = Metrics(namespace=METRICS_NAMESPACE)
 
 
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_NAME')
 table = dynamodb.Table(table_name)
+#the low-level client is thread-safe, the resource is not
+dynamodb_client = boto3.client('dynamodb')
+serializer = TypeSerializer()
+#route history per rider and hour, only kept when a trail table is configured
+TRAIL_TABLE_NAME = os.environ.get('TRAIL_TABLE_NAME')
+#per-zone delivery aggregates of each tumbling window
+ZONE_WINDOWS_TABLE_NAME = os.environ.get('ZONE_WINDOWS_TABLE_NAME')
 
-#lambda to consume message
+#only a ping newer than the stored one may replace it; rows written before last_updated existed take any ping
+NEWER_POSITION_CONDITION = (
+    'attribute_not_exists(rider_id) OR attribute_not_exists(last_updated) OR last_updated < :last_updated'
+)
+#Rider dispatch claims a rider by setting it busy with assigned_order_id and assigned_at, which
+#position updates never overwrite. A ping only reports the rider free again, releasing the claim,
+#once it was produced this long after the claim, by when the rider's app knows about it.
+ASSIGNMENT_HOLD_SECONDS = int(os.environ.get('ASSIGNMENT_HOLD_SECONDS', '120'))
+RELEASE_CONDITION = 'attribute_not_exists(assigned_at) OR assigned_at < :hold_cutoff'
+#conditional puts cannot be batched, so they are issued concurrently
+WRITE_CONCURRENCY = int(os.environ.get('WRITE_CONCURRENCY', '16'))
+write_executor = ThreadPoolExecutor(max_workers=WRITE_CONCURRENCY)
+
+REQUIRED_DELIVERY_FIELDS = ('order_id', 'status', 'location')
+#positions of offline riders are removed by TTL this long after we last heard from them
+OFFLINE_POSITION_TTL_SECONDS = int(os.environ.get('OFFLINE_POSITION_TTL_SECONDS', '3600'))
+
+#last written position per rider; a shard's riders always reach the same consumer
+movement_filter = MovementFilter()
+#newest producer timestamp known to be stored per rider, to skip writes that would lose the condition
+newest_positions = LRUCache(MAX_TRACKED_RIDERS)
+#zone each rider was last seen in, to raise zone entry and exit events
+zone_tracker = ZoneTracker(MAX_TRACKED_RIDERS)
+#recent points of every rider and delivery, the motion behind the arrival estimates
+recent_tracks = RecentTracks()
+
+#lambda to consume message, reporting the first failed record so Lambda resumes from it
 @logger.inject_lambda_context
 @tracer.capture_lambda_handler
 def lambda_handler(event: dict, context: LambdaContext) -> dict:
+    records = event['Records']
+    logger.info(f"Received Kinesis event with {len(records)} records")
+    window_state = event.get('state') or {}
+    batch_metrics = BatchMetrics(shard_id(event))
+
+    deliveries = []
+    rider_updates = {}
+    rider_trails = {}
+    zone_transitions = []
+    rider_positions = []
+    failed_sequence = None
+
     try:
-        logger.info(f"Received Kinesis event with {len(event['Records'])} records")
-        
-        processed_records = []
-        failed_records = []
-        
-        for record in event['Records']:
+        for record in records:
+            kinesis_data = record['kinesis']
             try:
-                kinesis_data = record['kinesis']
-                
-                
-                encoded_data = kinesis_data['data']
-                decoded_data = base64.b64decode(encoded_data).decode('utf-8')
-                record_data = json.loads(decoded_data)
-                
-                logger.info(f"Processing record: {record_data['event_id']}")
-                
-                #Process the delivery location data
-                processed_record = process_delivery_location(record_data)
-                processed_records.append(processed_record)
-                
-              
-                if 'rider_id' in record_data['data']:
-                    update_rider_position(record_data['data'])
-                
-                # Add Kinesis metadata
-                processed_record['kinesis_metadata'] = {
-                    'sequence_number': kinesis_data['sequenceNumber'],
-                    'partition_key': kinesis_data['partitionKey'],
-                    'shard_id': record['eventSourceARN'].split('/')[-1],
-                    'approximate_arrival_timestamp': kinesis_data['approximateArrivalTimestamp']
-                }
-                
-                logger.info(f"Successfully processed record: {processed_record['summary']}")
-                
+                with batch_metrics.timed(DECODE):
+                    record_datas = decode_records(kinesis_data)
+
+                for sub_index, record_data in enumerate(record_datas):
+                    data = record_data['data']
+
+                    if 'delivery_id' in data:
+                        batch_metrics.record(DELIVERY, float(kinesis_data['approximateArrivalTimestamp']))
+                        deliveries.append(record_data)
+                        recent_tracks.add_delivery(data, float(kinesis_data['approximateArrivalTimestamp']))
+                    if 'rider_id' in data:
+                        batch_metrics.record(RIDER_PING, float(kinesis_data['approximateArrivalTimestamp']))
+                        stage_rider_position(rider_updates, data, kinesis_data['sequenceNumber'], sub_index)
+                        stage_trail_point(rider_trails, data, kinesis_data['sequenceNumber'])
+                        stage_zone_transitions(zone_transitions, data)
+                        recent_tracks.add_rider_ping(data, float(data.get('last_updated', kinesis_data['approximateArrivalTimestamp'])))
+                    if 'delivery_id' not in data and 'rider_id' not in data:
+                        logger.warning(f"Skipping unknown record: {record_data['event_id']}")
+
             except Exception as e:
-                logger.error(f"Failed to process record: {str(e)}")
-                failed_records.append({
-                    'record': record,
-                    'error': str(e)
-                })
-        
-        
-        logger.info(f"Processing complete. Successful: {len(processed_records)}, Failed: {len(failed_records)}")
-        
-       
-        
-        return {
-            'statusCode': 200,
-            'processed_count': len(processed_records),
-            'failed_count': len(failed_records),
-            'processed_records': processed_records[:5],  
-            'batch_processing_time': datetime.utcnow().isoformat()
-        }
-        
+                #everything after this record is redelivered anyway, so stop here
+                logger.error(f"Failed to process record {kinesis_data['sequenceNumber']}: {str(e)}")
+                failed_sequence = kinesis_data['sequenceNumber']
+                break
+
+        #one vectorized pass over every delivery in the batch, against a single clock
+        with batch_metrics.timed(ANALYTICS, DELIVERY):
+            tracks = [recent_tracks.track_for(record_data['data']) for record_data in deliveries]
+            processed_records = analyze_delivery_batch(deliveries, time.time(), tracks)
+        for processed_record in processed_records:
+            logger.info(f"Processed record: {processed_record['summary']}", extra={'alerts': processed_record['alerts']})
+        if 'window' in event:
+            update_window_state(window_state, processed_records)
+
+        #one write per rider, however many pings it sent in this batch, and none if it barely moved
+        rider_positions = [
+            data for _, data in rider_updates.values()
+            if not is_stale(data) and (not SUPPRESS_STATIONARY_PINGS or movement_filter.accept(data))
+        ]
+
+        #alerts are best effort, a failed publish does not hold the shard back.
+        #The timers wrap the publish calls themselves, they run alongside the writes.
+        publishes = []
+        if EVENT_BUS_NAME and processed_records:
+            publishes.append((DELIVERY, len(processed_records), write_executor.submit(
+                batch_metrics.timed(PUBLISH, DELIVERY)(publish_alerts), processed_records
+            )))
+        if EVENT_BUS_NAME and zone_transitions:
+            publishes.append((RIDER_PING, len(zone_transitions), write_executor.submit(
+                batch_metrics.timed(PUBLISH, RIDER_PING)(publish_zone_transitions), zone_transitions
+            )))
+
+        with batch_metrics.timed(DYNAMODB_WRITE, RIDER_PING):
+            rider_results = process_rider_groups(rider_positions, rider_trails)
+
+        for rider_id, position_outcome, trail_written in rider_results:
+            if position_outcome == 'failed':
+                movement_filter.forget(rider_id)
+                failed_sequence = earliest_sequence(failed_sequence, rider_updates[rider_id][0][1])
+            #every ping goes into the trail, replaying from the rider's first ping re-appends what failed
+            if trail_written is False:
+                failed_sequence = earliest_sequence(failed_sequence, rider_trails[rider_id][0][0])
+
+        for record_type, published_count, publish in publishes:
+            wait_for_publish(batch_metrics, record_type, published_count, publish)
+
     except Exception as e:
         logger.exception(f"Error processing Kinesis records: {str(e)}")
-        return {
-            'statusCode': 500,
-            'error': str(e)
-        }
+        failed_sequence = records[0]['kinesis']['sequenceNumber'] if records else None
+
+    logger.info(f"Processing complete. Deliveries: {len(deliveries)}, Riders: {len(rider_updates)}, Written: {len(rider_positions)}, Zone transitions: {len(zone_transitions)}, First failed sequence: {failed_sequence}")
+
+    response = build_batch_response(failed_sequence)
+    if 'window' in event:
+        with batch_metrics.timed(DYNAMODB_WRITE, DELIVERY):
+            response['state'] = close_window(event, window_state)
+    publish_batch_metrics(batch_metrics)
+    return response
+
+
+#a failed publish is logged and counted, it never fails the batch
+def wait_for_publish(batch_metrics: BatchMetrics, record_type: str, published_count: int, publish) -> None:
+    try:
+        failed = publish.result()
+    except Exception as e:
+        logger.error(f"Failed to publish {record_type} events: {str(e)}")
+        failed = published_count
+    if failed:
+        batch_metrics.count(PUBLISH_FAILURES, record_type, failed)
+
+
+#"shardId-..." from the tumbling window fields, or from the eventID of the first record
+def shard_id(event: dict) -> str:
+    if event.get('shardId'):
+        return event['shardId']
+    records = event.get('Records') or [{}]
+    return records[0].get('eventID', 'unknown').split(':')[0]
+
+
+#metrics only describe the batch, failing to emit them must not fail it
+def publish_batch_metrics(batch_metrics: BatchMetrics) -> None:
+    try:
+        batch_metrics.publish(metrics)
+    except Exception as e:
+        logger.warning(f"Failed to publish batch metrics: {str(e)}")
+
+
+#decode one Kinesis record into its pings, JSON or binary, unpacking producer-side aggregates.
+#Deliveries the batch analytics cannot handle are rejected here.
+def decode_records(kinesis_data: dict) -> list:
+    record_datas = decode_payload(base64.b64decode(kinesis_data['data']))
+
+    for record_data in record_datas:
+        data = record_data['data']
+        if 'delivery_id' in data:
+            missing = [field for field in REQUIRED_DELIVERY_FIELDS if field not in data]
+            if missing or 'city' not in data['location']:
+                raise ValueError(f"Delivery {data['delivery_id']} is missing fields: {missing or ['location.city']}")
+
+    return record_datas
+
+
+#carry the state to the next invocation, or write the aggregates out on the window's final invoke.
+#A failed flush raises, so Lambda retries the final invoke with the same state.
+def close_window(event: dict, window_state: dict) -> dict:
+    if not event.get('isFinalInvokeForWindow'):
+        return window_state
+
+    summaries = summarize_window(window_state)
+    if ZONE_WINDOWS_TABLE_NAME and summaries:
+        flush_window(dynamodb.Table(ZONE_WINDOWS_TABLE_NAME), event['window'], event.get('shardId', 'unknown'), summaries)
+    logger.info(f"Flushed window {event['window']['start']} with {len(summaries)} zones", extra={'zones': summaries})
+    return {}
 
-#process individual delivery location record
+
+#Lambda checkpoints the shard just before the reported item and retries from there
+def build_batch_response(failed_sequence: str = None) -> dict:
+    if failed_sequence is None:
+        return {'batchItemFailures': []}
+    return {'batchItemFailures': [{'itemIdentifier': failed_sequence}]}
+
+#process individual delivery location record.
+#Reference implementation of location_analytics.analyze_delivery_batch, kept for tests.
 def process_delivery_location(record_data: dict) -> dict:
     try:
         data = record_data['data']
@@ -105,11 +251,13 @@ def process_delivery_location(record_data: dict) -> dict:
         location = data['location']
         
         # Perform analytics
+        arrival = estimate_arrival(data, recent_tracks.track_for(data))
         analytics = {
-            'delivery_distance_estimate': calculate_delivery_distance(location),
+            'delivery_distance_estimate': calculate_delivery_distance(location, data.get('destination')),
             'delivery_zone': determine_delivery_zone(location),
-            'priority_level': calculate_priority(data),
-            'estimated_delay': calculate_estimated_delay(data)
+            'priority_level': calculate_priority(data, arrival),
+            'estimated_delay': calculate_estimated_delay(data, arrival),
+            'estimated_arrival': int(arrival)
         }
         
         # Generate alerts if needed
@@ -134,32 +282,41 @@ def process_delivery_location(record_data: dict) -> dict:
         logger.error(f"Error processing delivery location: {str(e)}")
         raise
 
-def calculate_delivery_distance(location: dict) -> float:
-    return round(random.uniform(0.5, 15.0), 2) 
+#remaining great-circle distance to the destination, 0 when the producer did not send one
+def calculate_delivery_distance(location: dict, destination: dict = None) -> float:
+    if not destination:
+        return 0.0
+    distance = haversine_km(
+        location['latitude'], location['longitude'],
+        destination['latitude'], destination['longitude']
+    )
+    return round(float(distance), 2)
 
 def determine_delivery_zone(location: dict) -> str:
+    if 'latitude' in location and 'longitude' in location:
+        return zone_index.zone_at(float(location['latitude']), float(location['longitude']), default='Zone-Other')
     city = location.get('city', 'Unknown')
-    
-    
-    zone_mapping = {
-    'Amsterdam': 'Zone-West',
-    'Rotterdam': 'Zone-Southwest',
-    'The Hague': 'Zone-West',
-    'Utrecht': 'Zone-Central',
-    'Eindhoven': 'Zone-Southeast'
-    }
-    
-    return zone_mapping.get(city, 'Zone-Other')
+    return ZONE_MAPPING.get(city, 'Zone-Other')
 
-def calculate_priority(data: dict) -> str:
+#arrival time from the rider's recent track, the single-delivery case of eta.estimate_arrivals
+def estimate_arrival(data: dict, track: tuple) -> float:
+    location = data['location']
+    destination = data.get('destination') or {}
+    arrivals = estimate_arrivals(
+        float(location.get('latitude', np.nan)), float(location.get('longitude', np.nan)),
+        float(destination.get('latitude', np.nan)), float(destination.get('longitude', np.nan)),
+        np.array([data['status']], dtype=object), [track], datetime.utcnow().timestamp()
+    )
+    return float(arrivals[0])
+
+def calculate_priority(data: dict, arrival: float) -> str:
     status = data['status']
     estimated_time = data.get('estimated_delivery_time', 0)
-    current_time = datetime.utcnow().timestamp()
     
-    # High priority if delayed or overdue
+    # High priority if delayed or expected to arrive late
     if status == 'delayed':
         return 'HIGH'
-    elif estimated_time < current_time:
+    elif estimated_time < arrival:
         return 'HIGH'
     elif status == 'in_transit':
         return 'MEDIUM'
@@ -167,13 +324,12 @@ def calculate_priority(data: dict) -> str:
         return 'LOW'
 
 
-#calculate delay in minutes
-def calculate_estimated_delay(data: dict) -> int:
+#calculate expected delay in minutes
+def calculate_estimated_delay(data: dict, arrival: float) -> int:
     estimated_time = data.get('estimated_delivery_time', 0)
-    current_time = datetime.utcnow().timestamp()
     
-    if estimated_time < current_time:
-        delay_seconds = current_time - estimated_time
+    if estimated_time < arrival:
+        delay_seconds = arrival - estimated_time
         return int(delay_seconds / 60) 
     
     return 0
@@ -204,28 +360,161 @@ def generate_alerts(data: dict, analytics: dict) -> list:
     
     return alerts
 
-#update rider position in dynamodb
-def update_rider_position(rider_data: dict):
+#keep only the newest position per rider, ordered by producer timestamp,
+#then sequence number, then position inside an aggregated record
+def stage_rider_position(rider_updates: dict, rider_data: dict, sequence_number: str, sub_index: int = 0):
+    rider_id = rider_data['rider_id']
+    order_key = (float(rider_data.get('last_updated', 0)), int(sequence_number), sub_index)
+
+    current = rider_updates.get(rider_id)
+    if current is None or order_key > current[0]:
+        rider_updates[rider_id] = (order_key, rider_data)
+
+
+#keep every timestamped ping of the batch, with the sequence number it arrived in
+def stage_trail_point(rider_trails: dict, rider_data: dict, sequence_number: str) -> None:
+    if TRAIL_TABLE_NAME and 'last_updated' in rider_data:
+        rider_trails.setdefault(rider_data['rider_id'], []).append((str(sequence_number), rider_data))
+
+
+#zone exits and entries between this ping and the rider's previous one, in stream order
+def stage_zone_transitions(zone_transitions: list, rider_data: dict) -> None:
+    zone = zone_index.zone_at(float(rider_data['lat']), float(rider_data['lng']))
+    timestamp = float(rider_data.get('last_updated', time.time()))
+    zone_transitions.extend(zone_tracker.update(rider_data['rider_id'], zone, timestamp))
+
+
+#one append per hour of the rider's pings in this batch
+def append_rider_trail(rider_id: str, trail: list) -> bool:
     try:
-        rider_id = rider_data['rider_id']
-        
-        item = {
-            'rider_id': rider_id,
-            'lat': rider_data['lat'],
-            'lng': rider_data['lng'],
-            'city': rider_data.get('city', 'Unknown'),
-            'speed': rider_data.get('speed', 0),
-            'heading': rider_data.get('heading', 0),
-            'status': rider_data.get('status', 'unknown'),
-            'vehicle_type': rider_data.get('vehicle_type', 'unknown'),
-            'last_updated_timestamp': int(datetime.utcnow().timestamp())
-        }
-        
-        #update DynamoDB
-        table.put_item(Item=item)
-        
-        logger.info(f"Updated rider position for {rider_id}: lat={item['lat']}, lng={item['lng']}")
-        
+        append_trail_points(dynamodb_client, TRAIL_TABLE_NAME, rider_id, [data for _, data in trail])
+        return True
+    except Exception as e:
+        logger.error(f"Failed to append trail of {rider_id}: {str(e)}")
+        return False
+
+
+#DynamoDB rejects floats, so numeric attributes are stored as Decimal
+def build_rider_item(rider_data: dict) -> dict:
+    city = rider_data.get('city', 'Unknown')
+    status = rider_data.get('status', 'unknown')
+    heard_at = int(datetime.utcnow().timestamp())
+    item = {
+        'rider_id': rider_data['rider_id'],
+        'lat': Decimal(str(rider_data['lat'])),
+        'lng': Decimal(str(rider_data['lng'])),
+        'city': city,
+        'speed': Decimal(str(rider_data.get('speed', 0))),
+        'heading': Decimal(str(rider_data.get('heading', 0))),
+        'status': status,
+        'vehicle_type': rider_data.get('vehicle_type', 'unknown'),
+        'geo_cell': geohash_encode(rider_data['lat'], rider_data['lng']),
+        'city_status': city_status_key(city, status),
+        #producer time orders the writes, consumer time says when we last heard from the rider
+        'last_updated': Decimal(str(rider_data.get('last_updated', time.time()))),
+        'last_updated_timestamp': heard_at
+    }
+    #a rider coming back online drops the expiry again, see position_update
+    if status == 'offline':
+        item['expires_at'] = heard_at + OFFLINE_POSITION_TTL_SECONDS
+    return item
+
+
+#a ping no newer than what is already stored would only fail its condition
+def is_stale(rider_data: dict) -> bool:
+    newest = newest_positions.get(rider_data['rider_id'])
+    return newest is not None and float(rider_data.get('last_updated', time.time())) <= newest
+
+
+#Records are grouped by rider, the partition key: each group runs on one pool thread,
+#position write first and trail append second, while different riders run side by side.
+#Returns (rider_id, position outcome or None, trail written or None) per rider.
+def process_rider_groups(rider_positions: list, rider_trails: dict) -> list:
+    items = {data['rider_id']: build_rider_item(data) for data in rider_positions}
+
+    def process(rider_id: str) -> tuple:
+        position_outcome = write_rider_position(items[rider_id]) if rider_id in items else None
+        trail_written = append_rider_trail(rider_id, rider_trails[rider_id]) if rider_id in rider_trails else None
+        return rider_id, position_outcome, trail_written
+
+    results = list(write_executor.map(process, dict.fromkeys([*items, *rider_trails])))
+
+    outcomes = [outcome for _, outcome, _ in results if outcome is not None]
+    logger.info(f"Updated {outcomes.count('written')} rider positions, {outcomes.count('stale')} stale, "
+                f"{outcomes.count('failed')} failed, {sum(written is False for _, _, written in results)} trail appends failed")
+    return results
+
+
+def earliest_sequence(current: str, candidate) -> str:
+    candidate = str(candidate)
+    if current is None or int(candidate) < int(current):
+        return candidate
+    return current
+
+
+#Conditional update, since BatchWriteItem cannot carry a condition. A rider still held by a
+#dispatch claim is moved but keeps its status. A position rejected as older than the stored
+#one is 'stale', not 'failed'.
+def write_rider_position(item: dict) -> str:
+    rider_id = item['rider_id']
+    try:
+        try:
+            update_rider_position(item, with_status=True)
+        except dynamodb_client.exceptions.ConditionalCheckFailedException as e:
+            stored = e.response.get('Item', {}).get('last_updated', {}).get('N')
+            if stored is None or float(stored) >= float(item['last_updated']):
+                raise
+            update_rider_position(item, with_status=False)
+        newest_positions.put(rider_id, float(item['last_updated']))
+        return 'written'
+    except dynamodb_client.exceptions.ConditionalCheckFailedException as e:
+        stored = e.response.get('Item', {}).get('last_updated', {}).get('N')
+        if stored is not None:
+            newest_positions.put(rider_id, float(stored))
+        return 'stale'
     except Exception as e:
-        logger.error(f"Failed to update rider position: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error(f"Failed to write position of {rider_id}: {str(e)}")
+        return 'failed'
+
+
+def update_rider_position(item: dict, with_status: bool) -> None:
+    condition = NEWER_POSITION_CONDITION
+    values = {':last_updated': item['last_updated']}
+    releases_claim = with_status and item['status'] != 'busy'
+    if releases_claim:
+        condition = f"({condition}) AND ({RELEASE_CONDITION})"
+        values[':hold_cutoff'] = item['last_updated'] - ASSIGNMENT_HOLD_SECONDS
+    dynamodb_client.update_item(
+        TableName=table.name,
+        Key=serialize({'rider_id': item['rider_id']}),
+        ConditionExpression=condition,
+        ReturnValuesOnConditionCheckFailure='ALL_OLD',
+        **position_update(item, with_status, releases_claim, values)
+    )
+
+
+#SET every attribute of the ping, leaving the dispatch claim alone unless the rider is free again
+def position_update(item: dict, with_status: bool, releases_claim: bool, values: dict) -> dict:
+    held = () if with_status else ('status', 'city_status', 'expires_at')
+    attributes = [key for key in item if key != 'rider_id' and key not in held]
+    names = {f'#a{i}': attribute for i, attribute in enumerate(attributes)}
+    values = dict(values, **{f':a{i}': item[attribute] for i, attribute in enumerate(attributes)})
+
+    removed = []
+    if with_status and 'expires_at' not in item:
+        removed.append('expires_at')
+    if releases_claim:
+        removed.extend(['assigned_order_id', 'assigned_at'])
+
+    expression = 'SET ' + ', '.join(f'{name} = :{name[1:]}' for name in names)
+    if removed:
+        expression += ' REMOVE ' + ', '.join(removed)
+    return {
+        'UpdateExpression': expression,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': serialize(values)
+    }
+
+
+def serialize(values: dict) -> dict:
+    return {key: serializer.serialize(value) for key, value in values.items()}
@@ -2,10 +2,15 @@ import os
 import json
 import boto3
 import uuid
+import time
+import zlib
 import random
 from datetime import datetime
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from movement_filter import MovementFilter, SUPPRESS_STATIONARY_PINGS
+from fleet import CITY_CENTERS, FleetSimulator
+from ping_codec import encode_aggregate, encode_record
 
 
 logger = Logger(service="kinesis_producer")
@@ -15,6 +20,27 @@ tracer = Tracer(service="kinesis_producer")
 kinesis_client = boto3.client('kinesis')
 STREAM_NAME = os.environ.get('KINESIS_STREAM_NAME', 'FoodDeliveryLocationStream')
 
+#PutRecords limits: 500 entries and 5 MB per call, 1 MB per record
+PUT_RECORDS_MAX_ENTRIES = 500
+PUT_RECORDS_MAX_BYTES = 5 * 1024 * 1024
+MAX_PUT_ATTEMPTS = int(os.environ.get('MAX_PUT_ATTEMPTS', '5'))
+
+#Aggregation packs small pings into one Kinesis record, one 25 KB PUT payload unit at most.
+#Pings are bucketed by a hash of their partition key so one rider always lands on one shard.
+AGGREGATE_RECORDS = os.environ.get('AGGREGATE_RECORDS', 'false').lower() == 'true'
+AGGREGATE_MAX_BYTES = 25 * 1024
+AGGREGATION_BUCKETS = int(os.environ.get('AGGREGATION_BUCKETS', '64'))
+
+#'binary' packs rider pings in the compact ping_codec layout, the consumer reads both
+RECORD_ENCODING = os.environ.get('RECORD_ENCODING', 'json')
+
+#rider pings that barely moved since the last one sent are never put on the stream
+movement_filter = MovementFilter()
+
+#simulated fleet, kept moving between warm simulator invocations
+FLEET_SIZE = int(os.environ.get('FLEET_SIZE', '1000'))
+fleet = FleetSimulator(FLEET_SIZE)
+
 
 #lambda fn to produce message to kinesis stream
 @logger.inject_lambda_context
@@ -33,6 +59,10 @@ def lambda_handler(event: dict, context: LambdaContext) -> dict:
         
         #Check if this is from EventBridge simulator
         is_simulator = body.get('simulator', False)
+
+        #Batch ingestion: an array of pings, or a simulator request for several at once
+        if 'location_batch' in body or (is_simulator and body.get('count')):
+            return send_location_batch(body, is_simulator)
         
         #Generate sample delivery location data if not provided
         if is_simulator:
@@ -40,23 +70,32 @@ def lambda_handler(event: dict, context: LambdaContext) -> dict:
         else:
             location_data = body.get('location_data', generate_sample_location_data())
         
+        if not should_send(location_data):
+            logger.info(f"Suppressed stationary ping from {location_data['rider_id']}")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Rider has not moved, ping suppressed',
+                    'suppressed': True
+                })
+            }
+
         # Add metadata
-        kinesis_record = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'event_id': str(uuid.uuid4()),
-            'source': 'eventbridge_simulator' if is_simulator else 'food_delivery_service',
-            'data': location_data
-        }
+        kinesis_record = build_kinesis_record(location_data, is_simulator)
         
         logger.info(f"Sending record to Kinesis: {kinesis_record}")
         
         # Send record to Kinesis
-        partition_key = location_data.get('rider_id') or location_data.get('delivery_id') or str(uuid.uuid4())
-        response = kinesis_client.put_record(
-            StreamName=STREAM_NAME,
-            Data=json.dumps(kinesis_record),
-            PartitionKey=partition_key
-        )
+        partition_key = get_partition_key(location_data)
+        try:
+            response = kinesis_client.put_record(
+                StreamName=STREAM_NAME,
+                Data=serialize_record(kinesis_record),
+                PartitionKey=partition_key
+            )
+        except Exception:
+            forget_unsent([kinesis_record])
+            raise
         
         logger.info(f"Successfully sent record to Kinesis. Shard ID: {response['ShardId']}, Sequence Number: {response['SequenceNumber']}")
         
@@ -80,17 +119,168 @@ def lambda_handler(event: dict, context: LambdaContext) -> dict:
                 'details': str(e)
             })
         }
+def build_kinesis_record(location_data: dict, is_simulator: bool) -> dict:
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'event_id': str(uuid.uuid4()),
+        'source': 'eventbridge_simulator' if is_simulator else 'food_delivery_service',
+        'data': location_data
+    }
+
+
+#advance the fleet to now and sample `count` distinct riders from it
+def simulate_fleet_pings(count: int) -> list:
+    now = time.time()
+    fleet.advance_to(now)
+    riders = fleet.rng.choice(fleet.size, size=min(count, fleet.size), replace=False)
+    return fleet.pings(riders, now)
+
+
+#only rider pings are candidates for suppression
+def should_send(location_data: dict) -> bool:
+    if not SUPPRESS_STATIONARY_PINGS or 'rider_id' not in location_data:
+        return True
+    return movement_filter.accept(location_data)
+
+
+def get_partition_key(location_data: dict) -> str:
+    return location_data.get('rider_id') or location_data.get('delivery_id') or str(uuid.uuid4())
+
+
+#send many pings through PutRecords, optionally aggregated
+def send_location_batch(body: dict, is_simulator: bool) -> dict:
+    if is_simulator:
+        pings = simulate_fleet_pings(int(body['count']))
+    else:
+        pings = body['location_batch']
+
+    records = [build_kinesis_record(ping, is_simulator) for ping in pings if should_send(ping)]
+    suppressed_count = len(pings) - len(records)
+    aggregate = body.get('aggregate', AGGREGATE_RECORDS)
+    entries = aggregate_entries(records) if aggregate else [
+        {'Data': serialize_record(record), 'PartitionKey': get_partition_key(record['data'])}
+        for record in records
+    ]
+
+    try:
+        failed_entries = put_records_batched(entries)
+    except Exception:
+        #which chunks got through is unknown, so none of the pings count as sent
+        forget_unsent(records)
+        raise
+    failed_count = len(failed_entries)
+    if failed_entries:
+        failed_keys = {entry['PartitionKey'] for entry in failed_entries}
+        forget_unsent([record for record in records if entry_partition_key(record, aggregate) in failed_keys])
+    logger.info(f"Sent {len(records)} pings in {len(entries)} Kinesis records, {suppressed_count} suppressed, {failed_count} failed")
+
+    return {
+        'statusCode': 200 if failed_count == 0 else 207,
+        'body': json.dumps({
+            'message': 'Successfully sent data to Kinesis' if failed_count == 0 else 'Some records could not be sent',
+            'ping_count': len(records),
+            'suppressed_count': suppressed_count,
+            'kinesis_record_count': len(entries),
+            'failed_count': failed_count
+        })
+    }
+
+
+#The movement filter counted these pings as sent when they were accepted. Forgetting their
+#riders lets the next ping through instead of suppressing it until the keep-alive.
+def forget_unsent(records: list) -> None:
+    for record in records:
+        if 'rider_id' in record['data']:
+            movement_filter.forget(record['data']['rider_id'])
+
+
+#partition key of the entry a record was sent in; every record of a failed aggregate counts as unsent
+def entry_partition_key(record: dict, aggregate: bool) -> str:
+    if aggregate:
+        return f"agg-{aggregation_bucket(record)}"
+    return get_partition_key(record['data'])
+
+
+def aggregation_bucket(record: dict) -> int:
+    return zlib.crc32(get_partition_key(record['data']).encode('utf-8')) % AGGREGATION_BUCKETS
+
+
+#pack records into aggregate entries of at most AGGREGATE_MAX_BYTES, per hash bucket
+def aggregate_entries(records: list) -> list:
+    buckets = {}
+    for record in records:
+        bucket = aggregation_bucket(record)
+        buckets.setdefault(bucket, []).append(serialize_record(record))
+
+    entries = []
+    for bucket, encoded_records in buckets.items():
+        chunk, chunk_size = [], 0
+        for encoded in encoded_records:
+            #each record costs a separator or a length prefix on top of its bytes
+            if chunk and chunk_size + len(encoded) + 4 > AGGREGATE_MAX_BYTES:
+                entries.append(build_aggregate_entry(bucket, chunk))
+                chunk, chunk_size = [], 0
+            chunk.append(encoded)
+            chunk_size += len(encoded) + 4
+        if chunk:
+            entries.append(build_aggregate_entry(bucket, chunk))
+    return entries
+
+
+def build_aggregate_entry(bucket: int, encoded_records: list) -> dict:
+    if RECORD_ENCODING == 'binary':
+        data = encode_aggregate(encoded_records)
+    else:
+        data = b'{"aggregated": true, "records": [' + b','.join(encoded_records) + b']}'
+    return {'Data': data, 'PartitionKey': f"agg-{bucket}"}
+
+
+def serialize_record(record: dict) -> bytes:
+    if RECORD_ENCODING == 'binary':
+        return encode_record(record)
+    return json.dumps(record).encode('utf-8')
+
+
+#split entries into PutRecords calls and retry only the entries Kinesis rejected.
+#Returns the entries still failing after the last attempt.
+def put_records_batched(entries: list) -> list:
+    failed = []
+    for chunk in chunk_entries(entries):
+        pending = chunk
+        for attempt in range(MAX_PUT_ATTEMPTS):
+            response = kinesis_client.put_records(StreamName=STREAM_NAME, Records=pending)
+            if response.get('FailedRecordCount', 0) == 0:
+                pending = []
+                break
+
+            pending = [
+                entry for entry, result in zip(pending, response['Records'])
+                if 'ErrorCode' in result
+            ]
+            logger.warning(f"{len(pending)} Kinesis records rejected, retrying (attempt {attempt + 1})")
+            if attempt < MAX_PUT_ATTEMPTS - 1:
+                time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+
+        failed.extend(pending)
+    return failed
+
+
+def chunk_entries(entries: list):
+    chunk, chunk_size = [], 0
+    for entry in entries:
+        entry_size = len(entry['Data']) + len(entry['PartitionKey'].encode('utf-8'))
+        if chunk and (len(chunk) == PUT_RECORDS_MAX_ENTRIES or chunk_size + entry_size > PUT_RECORDS_MAX_BYTES):
+            yield chunk
+            chunk, chunk_size = [], 0
+        chunk.append(entry)
+        chunk_size += entry_size
+    if chunk:
+        yield chunk
+
+
 #generate sample delivery location
 def generate_sample_location_data():
-    locations = [
-        {'city': 'Amsterdam', 'lat': 51.5074, 'lng': -0.1278},
-        {'city': 'Rotterdam', 'lat': 53.4808, 'lng': -2.2426},
-        {'city': 'Den Hague', 'lat': 52.4862, 'lng': -1.8904},
-        {'city': 'Eindhoven', 'lat': 53.4084, 'lng': -2.9916},
-        {'city': 'Delft', 'lat': 53.8008, 'lng': -1.5491}
-    ]
-    
-    location = random.choice(locations)
+    city, (lat, lng) = random.choice(list(CITY_CENTERS.items()))
     
     return {
         'delivery_id': f"DEL-{uuid.uuid4().hex[:8].upper()}",
@@ -98,11 +288,15 @@ def generate_sample_location_data():
         'driver_id': f"DRV-{uuid.uuid4().hex[:6].upper()}",
         'customer_id': f"CUST-{uuid.uuid4().hex[:6].upper()}",
         'location': {
-            'latitude': round(location['lat'] + random.uniform(-0.1, 0.1), 6),
-            'longitude': round(location['lng'] + random.uniform(-0.1, 0.1), 6),
-            'city': location['city'],
+            'latitude': round(lat + random.uniform(-0.03, 0.03), 6),
+            'longitude': round(lng + random.uniform(-0.05, 0.05), 6),
+            'city': city,
             'address': f"{random.randint(1, 999)} {random.choice(['High Street', 'Main Road', 'Church Lane', 'Victoria Street'])}"
         },
+        'destination': {
+            'latitude': round(lat + random.uniform(-0.03, 0.03), 6),
+            'longitude': round(lng + random.uniform(-0.05, 0.05), 6)
+        },
         'status': random.choice(['picked_up', 'in_transit', 'delivered', 'delayed']),
         'estimated_delivery_time': (datetime.utcnow().timestamp() + random.randint(600, 3600)), 
         'restaurant': {
@@ -112,21 +306,13 @@ def generate_sample_location_data():
     }
 #generate sample vehicle location data
 def generate_vehicle_location_data():
-    locations = [
-        {'city': 'London', 'lat': 51.5074, 'lng': -0.1278},
-        {'city': 'Manchester', 'lat': 53.4808, 'lng': -2.2426},
-        {'city': 'Birmingham', 'lat': 52.4862, 'lng': -1.8904},
-        {'city': 'Liverpool', 'lat': 53.4084, 'lng': -2.9916},
-        {'city': 'Leeds', 'lat': 53.8008, 'lng': -1.5491}
-    ]
-    
-    location = random.choice(locations)
+    city, (lat, lng) = random.choice(list(CITY_CENTERS.items()))
     
     return {
         'rider_id': f"RIDER-{random.randint(1, 100):03d}",  
-        'lat': round(location['lat'] + random.uniform(-0.05, 0.05), 6),
-        'lng': round(location['lng'] + random.uniform(-0.05, 0.05), 6),
-        'city': location['city'],
+        'lat': round(lat + random.uniform(-0.03, 0.03), 6),
+        'lng': round(lng + random.uniform(-0.05, 0.05), 6),
+        'city': city,
         'speed': round(random.uniform(0, 60), 1),
         'heading': random.randint(0, 359),  
         'status': random.choice(['available', 'busy', 'offline']),
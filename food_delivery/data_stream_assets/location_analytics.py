@@ -0,0 +1,153 @@
+import os
+import numpy as np
+from geo import haversine_km
+from geofence import load_zone_index
+from eta import estimate_arrivals
+
+
+ZONES_FILE = os.environ.get('ZONES_FILE', os.path.join(os.path.dirname(__file__), 'zones.geojson'))
+zone_index = load_zone_index(ZONES_FILE)
+
+#zone by city name, for deliveries sent without coordinates
+ZONE_MAPPING = {
+    'Amsterdam': 'Zone-West',
+    'Rotterdam': 'Zone-Southwest',
+    'The Hague': 'Zone-West',
+    'Utrecht': 'Zone-Central',
+    'Eindhoven': 'Zone-Southeast'
+}
+
+LONG_DISTANCE_KM = 10
+
+
+#decode delivery records into columnar arrays
+def to_columns(deliveries: list) -> dict:
+    return {
+        'delivery_id': [d['delivery_id'] for d in deliveries],
+        'status': np.array([d['status'] for d in deliveries], dtype=object),
+        'city': np.array([d['location'].get('city', 'Unknown') for d in deliveries], dtype=object),
+        'lat': np.array([float(d['location'].get('latitude', np.nan)) for d in deliveries], dtype=np.float64),
+        'lng': np.array([float(d['location'].get('longitude', np.nan)) for d in deliveries], dtype=np.float64),
+        'dest_lat': np.array([float((d.get('destination') or {}).get('latitude', np.nan)) for d in deliveries], dtype=np.float64),
+        'dest_lng': np.array([float((d.get('destination') or {}).get('longitude', np.nan)) for d in deliveries], dtype=np.float64),
+        'estimated_delivery_time': np.array(
+            [float(d.get('estimated_delivery_time', 0)) for d in deliveries], dtype=np.float64
+        ),
+    }
+
+
+#zone polygon holding each delivery, falling back to its city where coordinates are missing
+def determine_delivery_zones(lat: np.ndarray, lng: np.ndarray, cities: np.ndarray) -> np.ndarray:
+    zones = zone_index.zones_at(lat, lng, default='Zone-Other')
+    missing = np.isnan(lat) | np.isnan(lng)
+    if missing.any():
+        zones[missing] = [ZONE_MAPPING.get(str(city), 'Zone-Other') for city in cities[missing]]
+    return zones
+
+
+#zone of a single point, with the same city fallback
+def determine_zone(lat, lng, city: str) -> str:
+    if lat is None or lng is None:
+        return ZONE_MAPPING.get(city, 'Zone-Other')
+    return zone_index.zone_at(float(lat), float(lng), default='Zone-Other')
+
+
+#remaining distance to destination, 0 where the producer did not send one
+def calculate_delivery_distances(lat, lng, dest_lat, dest_lng) -> np.ndarray:
+    distances = haversine_km(lat, lng, dest_lat, dest_lng)
+    return np.round(np.nan_to_num(distances, nan=0.0), 2)
+
+
+#priority and delay are judged against the live arrival estimate, not the promised time alone
+def calculate_priorities(status: np.ndarray, estimated_time: np.ndarray, arrival: np.ndarray) -> np.ndarray:
+    late = estimated_time < arrival
+    return np.where(
+        (status == 'delayed') | late,
+        'HIGH',
+        np.where(status == 'in_transit', 'MEDIUM', 'LOW')
+    )
+
+
+#expected lateness in whole minutes, zero when the delivery should arrive in time
+def calculate_estimated_delays(estimated_time: np.ndarray, arrival: np.ndarray) -> np.ndarray:
+    delay_seconds = np.maximum(arrival - estimated_time, 0)
+    return (delay_seconds // 60).astype(np.int64)
+
+
+def analyze_columns(columns: dict, now: float, tracks: list) -> dict:
+    arrival = estimate_arrivals(
+        columns['lat'], columns['lng'], columns['dest_lat'], columns['dest_lng'], columns['status'], tracks, now
+    )
+    return {
+        'delivery_distance_estimate': calculate_delivery_distances(
+            columns['lat'], columns['lng'], columns['dest_lat'], columns['dest_lng']
+        ),
+        'delivery_zone': determine_delivery_zones(columns['lat'], columns['lng'], columns['city']),
+        'priority_level': calculate_priorities(columns['status'], columns['estimated_delivery_time'], arrival),
+        'estimated_delay': calculate_estimated_delays(columns['estimated_delivery_time'], arrival),
+        'estimated_arrival': arrival,
+    }
+
+
+#alerts are only materialised for the rows whose masks are set
+def generate_alerts(delivery_ids: list, analytics: dict) -> list:
+    alerts = [[] for _ in delivery_ids]
+
+    high_priority = analytics['priority_level'] == 'HIGH'
+    delayed = analytics['estimated_delay'] > 0
+    long_distance = analytics['delivery_distance_estimate'] > LONG_DISTANCE_KM
+
+    for i in np.flatnonzero(high_priority | delayed | long_distance):
+        delivery_id = delivery_ids[i]
+        if high_priority[i]:
+            alerts[i].append({
+                'type': 'HIGH_PRIORITY',
+                'message': f"High priority delivery {delivery_id} requires attention"
+            })
+        if delayed[i]:
+            alerts[i].append({
+                'type': 'DELIVERY_DELAY',
+                'message': f"Delivery {delivery_id} is delayed by {int(analytics['estimated_delay'][i])} minutes"
+            })
+        if long_distance[i]:
+            alerts[i].append({
+                'type': 'LONG_DISTANCE',
+                'message': f"Long distance delivery {delivery_id} ({float(analytics['delivery_distance_estimate'][i])} km)"
+            })
+
+    return alerts
+
+
+#vectorized equivalent of kinesis_consumer.process_delivery_location for a whole batch.
+#tracks holds the recent track of each delivery's rider, see eta.RecentTracks.track_for
+def analyze_delivery_batch(record_datas: list, now: float, tracks: list = None) -> list:
+    if not record_datas:
+        return []
+
+    deliveries = [record_data['data'] for record_data in record_datas]
+    columns = to_columns(deliveries)
+    analytics = analyze_columns(columns, now, tracks or [()] * len(deliveries))
+    alerts = generate_alerts(columns['delivery_id'], analytics)
+
+    processed_records = []
+    for i, record_data in enumerate(record_datas):
+        data = deliveries[i]
+        processed_records.append({
+            'event_id': record_data['event_id'],
+            'timestamp': record_data['timestamp'],
+            'delivery_id': data['delivery_id'],
+            'order_id': data['order_id'],
+            'status': data['status'],
+            'location': data['location'],
+            'analytics': {
+                'delivery_distance_estimate': float(analytics['delivery_distance_estimate'][i]),
+                'delivery_zone': analytics['delivery_zone'][i],
+                'priority_level': str(analytics['priority_level'][i]),
+                'estimated_delay': int(analytics['estimated_delay'][i]),
+                'estimated_arrival': int(analytics['estimated_arrival'][i])
+            },
+            'alerts': alerts[i],
+            'summary': f"Delivery {data['delivery_id']} is {data['status']} in {data['location']['city']}"
+        })
+
+    return processed_records
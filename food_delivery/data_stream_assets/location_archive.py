@@ -0,0 +1,134 @@
+import io
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+RIDER_PINGS = 'rider_pings'
+DELIVERIES = 'deliveries'
+ARCHIVE_COMPRESSION = 'zstd'
+
+#explicit schemas, so every file of a dataset has the same columns whatever its rows carried
+SCHEMAS = {
+    RIDER_PINGS: pa.schema([
+        ('event_id', pa.string()),
+        ('event_time', pa.timestamp('us')),
+        ('source', pa.string()),
+        ('rider_id', pa.string()),
+        ('lat', pa.float64()),
+        ('lng', pa.float64()),
+        ('city', pa.string()),
+        ('speed', pa.float32()),
+        ('heading', pa.float32()),
+        ('status', pa.string()),
+        ('vehicle_type', pa.string()),
+        ('last_updated', pa.timestamp('ms', tz='UTC')),
+    ]),
+    DELIVERIES: pa.schema([
+        ('event_id', pa.string()),
+        ('event_time', pa.timestamp('us')),
+        ('source', pa.string()),
+        ('delivery_id', pa.string()),
+        ('order_id', pa.string()),
+        ('driver_id', pa.string()),
+        ('customer_id', pa.string()),
+        ('status', pa.string()),
+        ('lat', pa.float64()),
+        ('lng', pa.float64()),
+        ('city', pa.string()),
+        ('dest_lat', pa.float64()),
+        ('dest_lng', pa.float64()),
+        ('estimated_delivery_time', pa.timestamp('ms', tz='UTC')),
+        ('restaurant_name', pa.string()),
+        ('restaurant_cuisine', pa.string()),
+    ]),
+}
+
+
+#(dataset, row) for one decoded stream record, None for records neither dataset holds
+def to_archive_row(record_data: dict):
+    data = record_data['data']
+    envelope = {
+        'event_id': record_data.get('event_id'),
+        'event_time': datetime.fromisoformat(record_data['timestamp']),
+        'source': record_data.get('source'),
+    }
+    if 'rider_id' in data:
+        return RIDER_PINGS, dict(envelope, **{
+            'rider_id': data['rider_id'],
+            'lat': float(data['lat']),
+            'lng': float(data['lng']),
+            'city': data.get('city'),
+            'speed': data.get('speed'),
+            'heading': data.get('heading'),
+            'status': data.get('status'),
+            'vehicle_type': data.get('vehicle_type'),
+            'last_updated': epoch_millis(data.get('last_updated')),
+        })
+    if 'delivery_id' in data:
+        location = data.get('location') or {}
+        destination = data.get('destination') or {}
+        restaurant = data.get('restaurant') or {}
+        return DELIVERIES, dict(envelope, **{
+            'delivery_id': data['delivery_id'],
+            'order_id': data.get('order_id'),
+            'driver_id': data.get('driver_id'),
+            'customer_id': data.get('customer_id'),
+            'status': data.get('status'),
+            'lat': location.get('latitude'),
+            'lng': location.get('longitude'),
+            'city': location.get('city'),
+            'dest_lat': destination.get('latitude'),
+            'dest_lng': destination.get('longitude'),
+            'estimated_delivery_time': epoch_millis(data.get('estimated_delivery_time')),
+            'restaurant_name': restaurant.get('name'),
+            'restaurant_cuisine': restaurant.get('cuisine'),
+        })
+    return None
+
+
+def epoch_millis(timestamp):
+    return None if timestamp is None else round(float(timestamp) * 1000)
+
+
+#Rows waiting to be written, per (dataset, date, zone) partition.
+#A partition is due once it holds max_rows; the rest is drained when the batch ends.
+class ArchiveBuffer:
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.partitions = {}
+
+    def add(self, partition: tuple, row: dict) -> None:
+        self.partitions.setdefault(partition, []).append(row)
+
+    def due(self) -> list:
+        return [partition for partition, rows in self.partitions.items() if len(rows) >= self.max_rows]
+
+    #remove and return (partition, rows) for the given partitions, or for all of them
+    def drain(self, partitions: list = None) -> list:
+        partitions = list(self.partitions) if partitions is None else partitions
+        return [(partition, self.partitions.pop(partition)) for partition in partitions]
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.partitions.values())
+
+
+#Hive-style key, so Athena, Glue and pyarrow datasets see date and zone as columns
+def archive_key(partition: tuple, file_name: str) -> str:
+    dataset, date, zone = partition
+    return f"{dataset}/date={date}/zone={zone}/{file_name}.parquet"
+
+
+def to_parquet(dataset: str, rows: list) -> bytes:
+    table = pa.Table.from_pylist(rows, schema=SCHEMAS[dataset])
+    sink = io.BytesIO()
+    pq.write_table(table, sink, compression=ARCHIVE_COMPRESSION)
+    return sink.getvalue()
+
+
+#one Parquet object per flushed partition; the same key rewrites the same object on a retry
+def write_partition(s3_client, bucket: str, partition: tuple, file_name: str, rows: list) -> str:
+    key = archive_key(partition, file_name)
+    s3_client.put_object(Bucket=bucket, Key=key, Body=to_parquet(partition[0], rows))
+    return key
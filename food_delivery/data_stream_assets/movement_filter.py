@@ -0,0 +1,62 @@
+import os
+import time
+from geo import haversine_km
+from lru import LRUCache
+
+
+#a ping is dropped only if the rider moved less than this and barely turned
+MIN_MOVEMENT_METERS = float(os.environ.get('MIN_MOVEMENT_METERS', '25'))
+MIN_HEADING_CHANGE_DEGREES = float(os.environ.get('MIN_HEADING_CHANGE_DEGREES', '30'))
+#a stationary rider is still written this often, so the map never looks stale
+KEEPALIVE_SECONDS = float(os.environ.get('KEEPALIVE_SECONDS', '60'))
+MAX_TRACKED_RIDERS = int(os.environ.get('MAX_TRACKED_RIDERS', '10000'))
+SUPPRESS_STATIONARY_PINGS = os.environ.get('SUPPRESS_STATIONARY_PINGS', 'true').lower() == 'true'
+
+
+#smallest angle between two headings, in degrees
+def heading_change(previous: float, current: float) -> float:
+    change = abs(float(current) - float(previous)) % 360
+    return min(change, 360 - change)
+
+
+#dead reckoning against the last accepted ping of each rider.
+#Status changes, the first ping after a cold start and the keep-alive always pass,
+#pings older than the reference never do.
+class MovementFilter:
+
+    def __init__(self, min_movement_m: float = MIN_MOVEMENT_METERS,
+                 min_heading_change: float = MIN_HEADING_CHANGE_DEGREES,
+                 keepalive_seconds: float = KEEPALIVE_SECONDS,
+                 max_riders: int = MAX_TRACKED_RIDERS):
+        self.min_movement_m = min_movement_m
+        self.min_heading_change = min_heading_change
+        self.keepalive_seconds = keepalive_seconds
+        self.last_accepted = LRUCache(max_riders)
+
+    #True if the ping should be sent, in which case it becomes the new reference
+    def accept(self, ping: dict) -> bool:
+        rider_id = ping['rider_id']
+        previous = self.last_accepted.get(rider_id)
+        if previous is None or self.has_changed(previous, ping):
+            self.last_accepted.put(rider_id, (
+                float(ping['lat']), float(ping['lng']), float(ping.get('heading', 0)),
+                ping.get('status'), float(ping.get('last_updated', time.time()))
+            ))
+            return True
+        return False
+
+    def has_changed(self, previous: tuple, ping: dict) -> bool:
+        lat, lng, heading, status, last_updated = previous
+        elapsed = float(ping.get('last_updated', time.time())) - last_updated
+        if elapsed < 0:
+            return False
+        if ping.get('status') != status or elapsed >= self.keepalive_seconds:
+            return True
+        if heading_change(heading, ping.get('heading', 0)) >= self.min_heading_change:
+            return True
+        moved_m = float(haversine_km(lat, lng, float(ping['lat']), float(ping['lng']))) * 1000
+        return moved_m >= self.min_movement_m
+
+    #drop the reference after a failed write so the next ping is not suppressed against it
+    def forget(self, rider_id: str) -> None:
+        self.last_accepted.pop(rider_id)
@@ -0,0 +1,171 @@
+import json
+import uuid
+import struct
+from functools import lru_cache
+from datetime import datetime, timedelta
+
+
+#first byte of every binary payload; JSON payloads always start with '{'
+MAGIC = 0xB1
+VERSION = 1
+KIND_RIDER_PING = 1
+KIND_AGGREGATE = 2
+
+JSON_CONTENT_TYPE = 'application/json'
+BINARY_CONTENT_TYPE = 'application/x-rider-ping'
+
+#values outside these tables make the record fall back to JSON
+SOURCES = ('food_delivery_service', 'eventbridge_simulator')
+STATUSES = ('available', 'busy', 'offline')
+VEHICLE_TYPES = ('bike', 'scooter', 'car')
+RIDER_PING_FIELDS = {'rider_id', 'lat', 'lng', 'city', 'speed', 'heading', 'status', 'vehicle_type', 'last_updated'}
+
+_HEADER = struct.Struct('<BBB')
+#event id, envelope time in microseconds, source, lat/lng in microdegrees,
+#speed and heading in tenths, status, vehicle type, producer timestamp
+_RIDER_PING = struct.Struct('<16sqBiiHHBBd')
+_COUNT = struct.Struct('<H')
+_LENGTH = struct.Struct('<I')
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+#what a payload holds, told apart by its first byte
+def content_type(payload: bytes) -> str:
+    return BINARY_CONTENT_TYPE if payload[:1] == bytes([MAGIC]) else JSON_CONTENT_TYPE
+
+
+#binary for rider pings that fit the fixed layout, JSON for everything else
+def encode_record(record: dict) -> bytes:
+    binary = encode_rider_ping(record)
+    return binary if binary is not None else json.dumps(record).encode('utf-8')
+
+
+#None when the record does not fit the fixed layout exactly
+def encode_rider_ping(record: dict):
+    try:
+        return pack_rider_ping(record)
+    except (TypeError, ValueError, AttributeError, struct.error):
+        return None
+
+
+def pack_rider_ping(record: dict):
+    data = record.get('data', {})
+    if set(record) != {'timestamp', 'event_id', 'source', 'data'} or set(data) != RIDER_PING_FIELDS:
+        return None
+    if (record['source'] not in SOURCES or data['status'] not in STATUSES
+            or data['vehicle_type'] not in VEHICLE_TYPES):
+        return None
+    event_id = uuid.UUID(record['event_id'])
+    timestamp = datetime.fromisoformat(record['timestamp'])
+    if timestamp.tzinfo is not None or str(event_id) != record['event_id']:
+        return None
+
+    rider_id = data['rider_id'].encode('utf-8')
+    city = data['city'].encode('utf-8')
+    if len(rider_id) > 255 or len(city) > 255:
+        return None
+
+    #a negative speed and the like raise struct.error, the record then stays JSON
+    fixed = _RIDER_PING.pack(
+        event_id.bytes,
+        (timestamp - _EPOCH) // _MICROSECOND,
+        SOURCES.index(record['source']),
+        round(float(data['lat']) * 1_000_000),
+        round(float(data['lng']) * 1_000_000),
+        round(float(data['speed']) * 10),
+        round(float(data['heading']) * 10) % 3600,
+        STATUSES.index(data['status']),
+        VEHICLE_TYPES.index(data['vehicle_type']),
+        float(data['last_updated'])
+    )
+    return b''.join((
+        _HEADER.pack(MAGIC, VERSION, KIND_RIDER_PING), fixed,
+        bytes([len(rider_id)]), rider_id,
+        bytes([len(city)]), city
+    ))
+
+
+#several encoded records, binary or JSON, in one length-prefixed frame
+def encode_aggregate(encoded_records: list) -> bytes:
+    parts = [_HEADER.pack(MAGIC, VERSION, KIND_AGGREGATE), _COUNT.pack(len(encoded_records))]
+    for encoded in encoded_records:
+        parts.append(_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return b''.join(parts)
+
+
+#every record carried by one Kinesis payload, whichever encoding it uses
+def decode_payload(payload: bytes) -> list:
+    if content_type(payload) == JSON_CONTENT_TYPE:
+        decoded = json.loads(payload)
+        return decoded['records'] if decoded.get('aggregated') else [decoded]
+
+    _, version, kind = _HEADER.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"Unsupported payload version {version}")
+    if kind == KIND_RIDER_PING:
+        return [decode_rider_ping(payload)]
+    if kind == KIND_AGGREGATE:
+        return decode_aggregate(payload)
+    raise ValueError(f"Unknown payload kind {kind}")
+
+
+def decode_rider_ping(payload: bytes) -> dict:
+    offset = _HEADER.size
+    (event_id, timestamp_us, source, lat, lng, speed, heading,
+     status, vehicle_type, last_updated) = _RIDER_PING.unpack_from(payload, offset)
+    offset += _RIDER_PING.size
+    rider_id_length = payload[offset]
+    rider_id = payload[offset + 1:offset + 1 + rider_id_length].decode('utf-8')
+    offset += 1 + rider_id_length
+    city = payload[offset + 1:offset + 1 + payload[offset]].decode('utf-8')
+
+    return {
+        'timestamp': format_timestamp(timestamp_us),
+        'event_id': format_uuid(event_id.hex()),
+        'source': SOURCES[source],
+        'data': {
+            'rider_id': rider_id,
+            'lat': lat / 1_000_000,
+            'lng': lng / 1_000_000,
+            'city': city,
+            'speed': speed / 10,
+            'heading': heading / 10,
+            'status': STATUSES[status],
+            'vehicle_type': VEHICLE_TYPES[vehicle_type],
+            'last_updated': last_updated
+        }
+    }
+
+
+#same text as datetime.isoformat(); pings of one batch share a handful of seconds
+def format_timestamp(timestamp_us: int) -> str:
+    seconds, microseconds = divmod(timestamp_us, 1_000_000)
+    prefix = _format_second(seconds)
+    return f"{prefix}.{microseconds:06d}" if microseconds else prefix
+
+
+@lru_cache(maxsize=1024)
+def _format_second(seconds: int) -> str:
+    return (_EPOCH + timedelta(seconds=seconds)).isoformat()
+
+
+#same text as str(uuid.UUID(bytes=...)), without building the UUID object
+def format_uuid(hex_digits: str) -> str:
+    return f"{hex_digits[:8]}-{hex_digits[8:12]}-{hex_digits[12:16]}-{hex_digits[16:20]}-{hex_digits[20:]}"
+
+
+def decode_aggregate(payload: bytes) -> list:
+    offset = _HEADER.size
+    (count,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+
+    records = []
+    for _ in range(count):
+        (length,) = _LENGTH.unpack_from(payload, offset)
+        offset += _LENGTH.size
+        records.extend(decode_payload(payload[offset:offset + length]))
+        offset += length
+    return records
+
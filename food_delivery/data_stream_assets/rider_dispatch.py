@@ -0,0 +1,253 @@
+import os
+import time
+import random
+from decimal import Decimal
+from collections import defaultdict
+import boto3
+import numpy as np
+from boto3.dynamodb.types import TypeSerializer
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from geo import (
+    RIDER_FRESHNESS_SECONDS, cells_within, city_status_key, grid_cells, grid_neighbourhood, haversine_km, query_cells
+)
+
+
+logger = Logger(service="rider_dispatch")
+tracer = Tracer(service="rider_dispatch")
+
+
+dynamodb = boto3.resource('dynamodb')
+dynamodb_client = boto3.client('dynamodb')
+riders_table = dynamodb.Table(os.environ.get('RIDERS_TABLE_NAME', 'RidersPositionTable'))
+orders_table = dynamodb.Table(os.environ.get('ORDERS_TABLE_NAME', 'UserOrdersTable'))
+
+MAX_PICKUP_RADIUS_KM = float(os.environ.get('MAX_PICKUP_RADIUS_KM', '5'))
+#only the nearest few riders per order are considered by the solver
+MAX_CANDIDATES_PER_ORDER = int(os.environ.get('MAX_CANDIDATES_PER_ORDER', '10'))
+BATCH_GET_LIMIT = 100
+MAX_BATCH_GET_ATTEMPTS = 5
+
+serializer = TypeSerializer()
+
+
+#lambda to assign available riders to a batch of pending orders
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+def lambda_handler(event: dict, context: LambdaContext) -> dict:
+    try:
+        order_keys = event.get('orders', [])
+        logger.info(f"Dispatching {len(order_keys)} orders")
+
+        orders = load_pending_orders(order_keys)
+        riders = load_available_riders(orders, MAX_PICKUP_RADIUS_KM)
+        assignments, unassigned = assign_riders(orders, riders, MAX_PICKUP_RADIUS_KM)
+
+        committed, lost = [], []
+        for assignment in assignments:
+            (committed if commit_assignment(assignment) else lost).append(assignment)
+
+        logger.info(f"Assigned {len(committed)} of {len(orders)} pending orders to {len(riders)} available riders")
+
+        return {
+            'statusCode': 200,
+            'assignments': [
+                {key: assignment[key] for key in ('orderId', 'userId', 'rider_id', 'distance_km')}
+                for assignment in committed
+            ],
+            'unassigned': [order['orderId'] for order in unassigned + lost]
+        }
+
+    except Exception as e:
+        logger.exception(f"Error dispatching riders: {str(e)}")
+        return {
+            'statusCode': 500,
+            'error': str(e)
+        }
+
+
+#fetch the orders by key and keep the ones still waiting for a rider
+def load_pending_orders(order_keys: list) -> list:
+    orders = []
+    for start in range(0, len(order_keys), BATCH_GET_LIMIT):
+        keys = [{'userId': k['userId'], 'orderId': k['orderId']} for k in order_keys[start:start + BATCH_GET_LIMIT]]
+        request = {
+            orders_table.name: {
+                'Keys': keys,
+                'ProjectionExpression': 'userId, orderId, #status, restaurantLocation, riderId',
+                'ExpressionAttributeNames': {'#status': 'status'}
+            }
+        }
+        orders.extend(batch_get_orders(request))
+
+    pending = []
+    for order in orders:
+        location = order.get('restaurantLocation')
+        if order.get('status') != 'PLACED' or order.get('riderId') or not location:
+            continue
+        pending.append(dict(order, lat=float(location['lat']), lng=float(location['lng'])))
+    return pending
+
+
+#one BatchGetItem, then only the unprocessed keys again with jittered backoff
+def batch_get_orders(request: dict) -> list:
+    orders = []
+    for attempt in range(MAX_BATCH_GET_ATTEMPTS):
+        response = dynamodb.batch_get_item(RequestItems=request)
+        orders.extend(response['Responses'].get(orders_table.name, []))
+        request = response.get('UnprocessedKeys')
+        if not request:
+            return orders
+        logger.warning(f"{len(request[orders_table.name]['Keys'])} orders unprocessed, retrying (attempt {attempt + 1})")
+        if attempt < MAX_BATCH_GET_ATTEMPTS - 1:
+            time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+    raise RuntimeError(f"{len(request[orders_table.name]['Keys'])} orders still unprocessed after {MAX_BATCH_GET_ATTEMPTS} attempts")
+
+
+#query the cell index once per cell touched by any order in the batch
+def load_available_riders(orders: list, radius_km: float) -> list:
+    cells = set()
+    for order in orders:
+        cells |= cells_within(order['lat'], order['lng'], radius_km)
+
+    #riders whose last ping is older may have stopped sending without going offline
+    riders = query_cells(riders_table, cells, status='available', max_age_seconds=RIDER_FRESHNESS_SECONDS)
+    return [dict(rider, lat=float(rider['lat']), lng=float(rider['lng'])) for rider in riders]
+
+
+#candidate (distance, order, rider) edges, pruned to riders in grid cells near each order
+def build_candidate_edges(order_lat: np.ndarray, order_lng: np.ndarray, rider_lat: np.ndarray,
+                          rider_lng: np.ndarray, radius_km: float, max_candidates: int) -> tuple:
+    riders_by_cell = defaultdict(list)
+    rows, cols = grid_cells(rider_lat, rider_lng)
+    for index, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+        riders_by_cell[cell].append(index)
+
+    distances, order_indices, rider_indices = [], [], []
+    for order_index in range(order_lat.size):
+        lat, lng = float(order_lat[order_index]), float(order_lng[order_index])
+        candidates = np.array([
+            rider_index
+            for cell in grid_neighbourhood(lat, lng, radius_km)
+            for rider_index in riders_by_cell.get(cell, ())
+        ], dtype=np.int64)
+        if candidates.size == 0:
+            continue
+
+        candidate_distances = haversine_km(lat, lng, rider_lat[candidates], rider_lng[candidates])
+        in_range = candidate_distances <= radius_km
+        candidates, candidate_distances = candidates[in_range], candidate_distances[in_range]
+
+        if candidates.size > max_candidates:
+            nearest = np.argpartition(candidate_distances, max_candidates)[:max_candidates]
+            candidates, candidate_distances = candidates[nearest], candidate_distances[nearest]
+
+        distances.append(candidate_distances)
+        order_indices.append(np.full(candidates.size, order_index, dtype=np.int64))
+        rider_indices.append(candidates)
+
+    if not distances:
+        empty = np.array([], dtype=np.int64)
+        return np.array([], dtype=np.float64), empty, empty
+    return np.concatenate(distances), np.concatenate(order_indices), np.concatenate(rider_indices)
+
+
+#greedy nearest-first matching, each rider and order used at most once.
+#Orders whose nearest candidates were all taken get another round against the riders still free.
+def assign_riders(orders: list, riders: list, radius_km: float = MAX_PICKUP_RADIUS_KM,
+                  max_candidates: int = MAX_CANDIDATES_PER_ORDER) -> tuple:
+    if not orders or not riders:
+        return [], list(orders)
+
+    all_order_lat = np.array([order['lat'] for order in orders], dtype=np.float64)
+    all_order_lng = np.array([order['lng'] for order in orders], dtype=np.float64)
+    all_rider_lat = np.array([rider['lat'] for rider in riders], dtype=np.float64)
+    all_rider_lng = np.array([rider['lng'] for rider in riders], dtype=np.float64)
+
+    open_orders = np.arange(len(orders))
+    free_riders = np.arange(len(riders))
+    assignments = []
+
+    while open_orders.size and free_riders.size:
+        distances, order_indices, rider_indices = build_candidate_edges(
+            all_order_lat[open_orders], all_order_lng[open_orders],
+            all_rider_lat[free_riders], all_rider_lng[free_riders],
+            radius_km, max_candidates
+        )
+
+        order_taken = np.zeros(open_orders.size, dtype=bool)
+        rider_taken = np.zeros(free_riders.size, dtype=bool)
+        for edge in np.argsort(distances, kind='stable'):
+            order_index, rider_index = order_indices[edge], rider_indices[edge]
+            if order_taken[order_index] or rider_taken[rider_index]:
+                continue
+            order_taken[order_index] = True
+            rider_taken[rider_index] = True
+            assignments.append(dict(
+                orders[open_orders[order_index]],
+                rider_id=riders[free_riders[rider_index]]['rider_id'],
+                rider_city=riders[free_riders[rider_index]].get('city', 'Unknown'),
+                distance_km=round(float(distances[edge]), 3)
+            ))
+
+        if not order_taken.any():
+            break
+        open_orders = open_orders[~order_taken]
+        free_riders = free_riders[~rider_taken]
+
+    unassigned = [orders[index] for index in open_orders]
+    return assignments, unassigned
+
+
+#Claim the rider and the order together so a concurrent dispatch cannot double-book either.
+#The claim is assigned_order_id, which position updates keep; the consumer releases it once
+#the rider reports being free again. An assignment that fails for any reason stays unassigned.
+def commit_assignment(assignment: dict) -> bool:
+    assigned_at = Decimal(str(round(time.time(), 3)))
+    try:
+        dynamodb_client.transact_write_items(TransactItems=[
+            {
+                'Update': {
+                    'TableName': orders_table.name,
+                    'Key': serialize({'userId': assignment['userId'], 'orderId': assignment['orderId']}),
+                    'UpdateExpression': 'SET riderId = :rider, assignedAt = :assigned_at',
+                    'ConditionExpression': '#status = :placed AND attribute_not_exists(riderId)',
+                    'ExpressionAttributeNames': {'#status': 'status'},
+                    'ExpressionAttributeValues': serialize({
+                        ':rider': assignment['rider_id'],
+                        ':assigned_at': assigned_at,
+                        ':placed': 'PLACED'
+                    })
+                }
+            },
+            {
+                'Update': {
+                    'TableName': riders_table.name,
+                    'Key': serialize({'rider_id': assignment['rider_id']}),
+                    'UpdateExpression': (
+                        'SET #status = :busy, city_status = :city_status, assigned_order_id = :order, '
+                        'assigned_at = :assigned_at'
+                    ),
+                    'ConditionExpression': '#status = :available AND attribute_not_exists(assigned_order_id)',
+                    'ExpressionAttributeNames': {'#status': 'status'},
+                    'ExpressionAttributeValues': serialize({
+                        ':busy': 'busy',
+                        ':city_status': city_status_key(assignment['rider_city'], 'busy'),
+                        ':order': assignment['orderId'],
+                        ':assigned_at': assigned_at,
+                        ':available': 'available'
+                    })
+                }
+            }
+        ])
+        return True
+    except dynamodb_client.exceptions.TransactionCanceledException as e:
+        logger.warning(f"Assignment of {assignment['rider_id']} to {assignment['orderId']} lost a race: {str(e)}")
+        return False
+    except Exception as e:
+        logger.exception(f"Failed to assign {assignment['rider_id']} to {assignment['orderId']}: {str(e)}")
+        return False
+
+
+def serialize(values: dict) -> dict:
+    return {key: serializer.serialize(value) for key, value in values.items()}
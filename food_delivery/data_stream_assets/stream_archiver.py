@@ -0,0 +1,80 @@
+import os
+import base64
+import boto3
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from ping_codec import decode_payload
+from location_analytics import determine_zone
+from location_archive import ArchiveBuffer, to_archive_row, write_partition
+
+
+logger = Logger(service="stream_archiver")
+tracer = Tracer(service="stream_archiver")
+
+
+s3_client = boto3.client('s3')
+ARCHIVE_BUCKET_NAME = os.environ.get('ARCHIVE_BUCKET_NAME')
+#a partition is written once it holds this many rows, and at the end of the batch;
+#the event source batching window decides how long records wait before an invocation
+ARCHIVE_MAX_ROWS = int(os.environ.get('ARCHIVE_MAX_ROWS', '50000'))
+
+
+#Lambda to archive the location stream as Parquet, partitioned by dataset, date and zone.
+#Every buffered row is written before returning: Lambda checkpoints the shard once the
+#handler succeeds, so nothing may wait in memory for a later invocation.
+#A failed write raises and the batch is retried, rewriting the same object keys.
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+def lambda_handler(event: dict, context: LambdaContext) -> dict:
+    records = event['Records']
+    if not records:
+        return {'archived': 0, 'skipped': 0, 'files': 0}
+
+    #shard and first sequence number name the batch's files, so a retry of it overwrites them
+    batch_id = f"{records[0]['eventID'].split(':')[0]}-{records[0]['kinesis']['sequenceNumber']}"
+    buffer = ArchiveBuffer(ARCHIVE_MAX_ROWS)
+    parts = {}
+    archived = skipped = files = 0
+
+    for record in records:
+        kinesis_data = record['kinesis']
+        try:
+            record_datas = decode_payload(base64.b64decode(kinesis_data['data']))
+        except Exception as e:
+            #the consumer reports poison records, the archive only leaves them out
+            logger.warning(f"Skipping undecodable record {kinesis_data['sequenceNumber']}: {str(e)}")
+            skipped += 1
+            continue
+
+        for record_data in record_datas:
+            try:
+                archive_row = to_archive_row(record_data)
+            except Exception as e:
+                logger.warning(f"Skipping malformed record in {kinesis_data['sequenceNumber']}: {str(e)}")
+                archive_row = None
+            if archive_row is None:
+                skipped += 1
+                continue
+            dataset, row = archive_row
+            buffer.add((dataset, row['event_time'].strftime('%Y-%m-%d'), row_zone(row)), row)
+            archived += 1
+
+        files += flush(buffer.drain(buffer.due()), batch_id, parts)
+
+    files += flush(buffer.drain(), batch_id, parts)
+    logger.info(f"Archived {archived} records in {files} files, skipped {skipped}")
+    return {'archived': archived, 'skipped': skipped, 'files': files}
+
+
+def row_zone(row: dict) -> str:
+    return determine_zone(row['lat'], row['lng'], row['city'])
+
+
+#write each drained partition as its own object, numbering the parts of a partition within the batch
+def flush(drained: list, batch_id: str, parts: dict) -> int:
+    for partition, rows in drained:
+        part = parts.get(partition, 0)
+        parts[partition] = part + 1
+        key = write_partition(s3_client, ARCHIVE_BUCKET_NAME, partition, f"{batch_id}-{part:04d}", rows)
+        logger.debug(f"Wrote {len(rows)} rows to s3://{ARCHIVE_BUCKET_NAME}/{key}")
+    return len(drained)
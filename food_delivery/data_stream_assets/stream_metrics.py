@@ -0,0 +1,78 @@
+import os
+import time
+from contextlib import contextmanager
+from aws_lambda_powertools import Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+
+
+METRICS_NAMESPACE = os.environ.get('POWERTOOLS_METRICS_NAMESPACE', 'FoodDeliveryDataStream')
+
+#record types used as the record_type dimension; stages spanning both types report under ALL
+ALL = 'all'
+DELIVERY = 'delivery'
+RIDER_PING = 'rider_ping'
+
+#stage timers, in milliseconds
+DECODE = 'DecodeTime'
+ANALYTICS = 'AnalyticsTime'
+DYNAMODB_WRITE = 'DynamoDBWriteTime'
+PUBLISH = 'PublishTime'
+BATCH = 'BatchTime'
+#counters
+PUBLISH_FAILURES = 'PublishFailures'
+
+
+#Stage timings, record counts and arrival lag of one consumer batch.
+#Everything is collected in memory and published once per batch, as one EMF
+#document per record type with the shard and record type as dimensions.
+class BatchMetrics:
+
+    def __init__(self, shard: str):
+        self.shard = shard
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.counts = {}
+        self.counters = {}
+        self.arrivals = {}
+
+    @contextmanager
+    def timed(self, stage: str, record_type: str = ALL):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            key = (record_type, stage)
+            self.timings[key] = self.timings.get(key, 0.0) + (time.perf_counter() - start) * 1000
+
+    #oldest approximateArrivalTimestamp per record type, the lag is taken when the batch is published
+    def record(self, record_type: str, arrival_timestamp: float) -> None:
+        self.counts[record_type] = self.counts.get(record_type, 0) + 1
+        oldest = self.arrivals.get(record_type)
+        if oldest is None or arrival_timestamp < oldest:
+            self.arrivals[record_type] = arrival_timestamp
+
+    def count(self, name: str, record_type: str = ALL, value: int = 1) -> None:
+        key = (record_type, name)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def publish(self, metrics: Metrics, now: float = None) -> None:
+        now = time.time() if now is None else now
+        self.timings[(ALL, BATCH)] = (time.perf_counter() - self.started) * 1000
+
+        record_types = [ALL, *self.counts, *(key[0] for key in self.timings), *(key[0] for key in self.counters)]
+        for record_type in dict.fromkeys(record_types):
+            metrics.add_dimension(name='shard', value=self.shard)
+            metrics.add_dimension(name='record_type', value=record_type)
+            for (timed_type, stage), milliseconds in self.timings.items():
+                if timed_type == record_type:
+                    metrics.add_metric(name=stage, unit=MetricUnit.Milliseconds, value=milliseconds)
+            for (counted_type, name), value in self.counters.items():
+                if counted_type == record_type:
+                    metrics.add_metric(name=name, unit=MetricUnit.Count, value=value)
+            if record_type != ALL:
+                metrics.add_metric(name='Records', unit=MetricUnit.Count, value=self.counts.get(record_type, 0))
+            if record_type in self.arrivals:
+                #time from the record reaching the stream until its batch was processed
+                lag = max(now - self.arrivals[record_type], 0.0) * 1000
+                metrics.add_metric(name='ProcessingLag', unit=MetricUnit.Milliseconds, value=lag)
+            metrics.flush_metrics()
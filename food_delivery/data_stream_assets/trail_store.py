@@ -0,0 +1,123 @@
+import numpy as np
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeSerializer
+
+
+#one item per rider per hour, sort key is the hour since the epoch
+HOUR_SECONDS = 3600
+#coordinates are stored as integer microdegrees, about 0.1 m
+COORDINATE_SCALE = 1_000_000
+MAX_VARINT_BYTES = 10
+
+serializer = TypeSerializer()
+
+
+def hour_bucket(timestamp: float) -> int:
+    return int(timestamp // HOUR_SECONDS)
+
+
+def zigzag_encode(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def zigzag_decode(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.uint64)
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+#LEB128 varints for a whole array at once: 7 bits per byte, high bit set on all but the last byte
+def varint_encode(values: np.ndarray) -> bytes:
+    values = values.astype(np.uint64)
+    shifts = np.arange(MAX_VARINT_BYTES, dtype=np.uint64) * np.uint64(7)
+    groups = (values[:, None] >> shifts) & np.uint64(0x7F)
+    byte_counts = np.maximum(1, MAX_VARINT_BYTES - np.argmax((values[:, None] >> shifts)[:, ::-1] > 0, axis=1))
+    byte_counts[values == 0] = 1
+
+    positions = np.arange(MAX_VARINT_BYTES)
+    continuation = (positions < (byte_counts - 1)[:, None]).astype(np.uint64) << np.uint64(7)
+    return (groups | continuation)[positions < byte_counts[:, None]].astype(np.uint8).tobytes()
+
+
+def varint_decode(data: bytes) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+    if raw.size == 0:
+        return np.array([], dtype=np.uint64)
+
+    ends = (raw & np.uint64(0x80)) == 0
+    starts = np.concatenate(([0], np.flatnonzero(ends)[:-1] + 1))
+    value_index = np.repeat(np.arange(starts.size), np.diff(np.append(starts, raw.size)))
+    shifts = (np.arange(raw.size) - starts[value_index]).astype(np.uint64) * np.uint64(7)
+    return np.add.reduceat((raw & np.uint64(0x7F)) << shifts, starts)
+
+
+#one self-contained chunk: the first point absolute, every later point as a delta,
+#interleaved as (milliseconds, lat, lng) zigzag varints
+def encode_points(timestamps, lats, lngs) -> bytes:
+    columns = np.column_stack([
+        np.round(np.asarray(timestamps, dtype=np.float64) * 1000),
+        np.round(np.asarray(lats, dtype=np.float64) * COORDINATE_SCALE),
+        np.round(np.asarray(lngs, dtype=np.float64) * COORDINATE_SCALE),
+    ]).astype(np.int64)
+    deltas = np.diff(columns, axis=0, prepend=np.zeros((1, 3), dtype=np.int64))
+    return varint_encode(zigzag_encode(deltas.ravel()))
+
+
+def decode_points(chunk: bytes) -> tuple:
+    columns = np.cumsum(zigzag_decode(varint_decode(chunk)).reshape(-1, 3), axis=0)
+    return columns[:, 0] / 1000, columns[:, 1] / COORDINATE_SCALE, columns[:, 2] / COORDINATE_SCALE
+
+
+#append one chunk per hour touched by the pings, without reading the items first.
+#Takes the low-level client so writers can run on threads.
+def append_trail_points(client, table_name: str, rider_id: str, pings: list) -> None:
+    pings = sorted(pings, key=lambda ping: float(ping['last_updated']))
+    by_hour = {}
+    for ping in pings:
+        by_hour.setdefault(hour_bucket(float(ping['last_updated'])), []).append(ping)
+
+    for hour, hour_pings in by_hour.items():
+        chunk = encode_points(
+            [float(ping['last_updated']) for ping in hour_pings],
+            [float(ping['lat']) for ping in hour_pings],
+            [float(ping['lng']) for ping in hour_pings],
+        )
+        client.update_item(
+            TableName=table_name,
+            Key={'rider_id': serializer.serialize(rider_id), 'hour': serializer.serialize(hour)},
+            UpdateExpression='SET chunks = list_append(if_not_exists(chunks, :empty), :chunk) ADD point_count :count',
+            ExpressionAttributeValues={
+                ':empty': serializer.serialize([]),
+                ':chunk': serializer.serialize([chunk]),
+                ':count': serializer.serialize(len(hour_pings))
+            }
+        )
+
+
+#a rider's route between two timestamps as time-ordered NumPy arrays
+def get_trail(table, rider_id: str, start: float, end: float) -> dict:
+    query_kwargs = {
+        'KeyConditionExpression': Key('rider_id').eq(rider_id) & Key('hour').between(hour_bucket(start), hour_bucket(end))
+    }
+    chunks = []
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            chunks.extend(bytes(chunk) for chunk in item.get('chunks', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    decoded = [decode_points(chunk) for chunk in chunks]
+    timestamps = np.concatenate([d[0] for d in decoded]) if decoded else np.array([])
+    lats = np.concatenate([d[1] for d in decoded]) if decoded else np.array([])
+    lngs = np.concatenate([d[2] for d in decoded]) if decoded else np.array([])
+
+    #chunks from retried or reordered batches can overlap, keep each timestamp once
+    timestamps, first = np.unique(timestamps, return_index=True)
+    in_range = (timestamps >= start) & (timestamps <= end)
+    return {
+        'timestamp': timestamps[in_range],
+        'lat': lats[first][in_range],
+        'lng': lngs[first][in_range],
+    }
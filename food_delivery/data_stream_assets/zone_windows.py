@@ -0,0 +1,127 @@
+import math
+import time
+import hashlib
+from boto3.dynamodb.conditions import Key
+
+
+#window aggregates are only read by dashboards for a few days
+WINDOW_RETENTION_SECONDS = 7 * 24 * 3600
+
+#Distinct deliveries are counted with a HyperLogLog sketch of 2**SKETCH_PRECISION registers,
+#about 6.5% standard error and close to exact for the few dozen deliveries of a quiet zone.
+#Every other figure is an exact counter, so a zone's state stays the same size however many
+#deliveries it sees. Fields derived from the sketch end in _estimate.
+SKETCH_PRECISION = 8
+SKETCH_REGISTERS = 1 << SKETCH_PRECISION
+HASH_BITS = 64
+
+#per-zone figures of a window, as stored in ZoneWindowsTable
+WINDOW_FIELDS = (
+    'deliveries_estimate', 'active_deliveries_estimate', 'delivered_deliveries', 'delayed_readings', 'total_delay_minutes'
+)
+
+
+def sketch_add(registers: list, key: str) -> None:
+    hashed = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=HASH_BITS // 8).digest(), 'big')
+    index = hashed >> (HASH_BITS - SKETCH_PRECISION)
+    remainder = hashed & ((1 << (HASH_BITS - SKETCH_PRECISION)) - 1)
+    rank = HASH_BITS - SKETCH_PRECISION - remainder.bit_length() + 1
+    if rank > registers[index]:
+        registers[index] = rank
+
+
+#linear counting while registers are still empty, the HyperLogLog estimate beyond that
+def sketch_count(registers: list) -> int:
+    size = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -rank for rank in registers)
+    empty = registers.count(0)
+    if estimate <= 2.5 * size and empty:
+        estimate = size * math.log(size / empty)
+    return int(round(estimate))
+
+
+def new_zone_state() -> dict:
+    return {
+        'seen': [0] * SKETCH_REGISTERS,
+        'delivered': 0,
+        'delayed_readings': 0,
+        'delay_minutes': 0.0,
+    }
+
+
+#Fold a batch of processed deliveries into the tumbling-window state. A retried batch is handed
+#the state from before it, so the counters do not count its readings twice.
+def update_window_state(state: dict, processed_records: list) -> dict:
+    zones = state.setdefault('zones', {})
+    for record in processed_records:
+        analytics = record['analytics']
+        zone = zones.get(analytics['delivery_zone'])
+        if zone is None:
+            zone = zones[analytics['delivery_zone']] = new_zone_state()
+        sketch_add(zone['seen'], record['delivery_id'])
+        if record['status'] == 'delivered':
+            zone['delivered'] += 1
+        if record['status'] == 'delayed' or analytics['estimated_delay'] > 0:
+            zone['delay_minutes'] += analytics['estimated_delay']
+            zone['delayed_readings'] += 1
+    return state
+
+
+#active deliveries are the ones seen in the window that were not delivered by its end
+def summarize_window(state: dict) -> list:
+    summaries = []
+    for zone_name, zone in sorted(state.get('zones', {}).items()):
+        deliveries = sketch_count(zone['seen'])
+        summaries.append({
+            'zone': zone_name,
+            'deliveries_estimate': deliveries,
+            'active_deliveries_estimate': max(deliveries - zone['delivered'], 0),
+            'delivered_deliveries': zone['delivered'],
+            'delayed_readings': zone['delayed_readings'],
+            'total_delay_minutes': int(round(zone['delay_minutes'])),
+        })
+    return summaries
+
+
+#one item per zone, window and shard; rewriting it on a retried final invoke is harmless
+def flush_window(table, window: dict, shard_id: str, summaries: list) -> None:
+    expires_at = int(time.time()) + WINDOW_RETENTION_SECONDS
+    with table.batch_writer() as batch:
+        for summary in summaries:
+            batch.put_item(Item={
+                'zone': summary['zone'],
+                'window_shard': f"{window['start']}#{shard_id}",
+                'window_start': window['start'],
+                'window_end': window['end'],
+                **{field: summary[field] for field in WINDOW_FIELDS},
+                'expires_at': expires_at,
+            })
+
+
+#per-window totals for one zone, summed over shards, with the mean delay of delayed readings.
+#The estimates of different shards add up as well, a delivery is read from one shard only.
+#start and end are ISO timestamps in the format Lambda uses for window boundaries.
+def read_zone_windows(table, zone: str, start: str, end: str) -> list:
+    query_kwargs = {
+        'KeyConditionExpression': Key('zone').eq(zone) & Key('window_shard').between(start, end + '~')
+    }
+    windows = {}
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            window = windows.setdefault(item['window_start'], {
+                'zone': zone,
+                'window_start': item['window_start'],
+                'window_end': item['window_end'],
+                **{field: 0 for field in WINDOW_FIELDS},
+            })
+            for field in WINDOW_FIELDS:
+                window[field] += int(item[field])
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    for window in windows.values():
+        delayed = window['delayed_readings']
+        window['mean_delay_minutes'] = round(window['total_delay_minutes'] / delayed, 2) if delayed else 0.0
+    return [windows[start] for start in sorted(windows)]
@@ -6,11 +6,15 @@ from aws_cdk import (
     aws_lambda_event_sources as lambda_event_sources,
     aws_events as events,
     aws_events_targets as targets,
-    aws_dynamodb as dynamodb
+    aws_dynamodb as dynamodb,
+    aws_sqs as sqs,
+    aws_iam as iam,
+    aws_cloudwatch as cloudwatch
 )
 from constructs import Construct
 from constructs.ddb import DynamoTable
 from constructs.lmbda_construct import Lambda
+from constructs.bucket import S3BucketConstruct
 from cdk_nag import NagSuppressions
 from cdk_nag import NagSuppressions
 
@@ -28,16 +32,76 @@ class FoodDeliveryDataStream(Stack):
             stream_mode=kinesis.StreamMode.ON_DEMAND  
         )
 
-        #DynamoDB table for rider positions
+        #DynamoDB table for rider positions, offline riders expire through TTL
         riders_position_table = DynamoTable(
             self,
             "RidersPositionTable",
             table_name="RidersPositionTable",
-            partition_key="rider_id"
+            partition_key="rider_id",
+            ttl_attribute="expires_at"
+        )
+
+        #geohash cell index so nearby-rider lookups query a few cells instead of scanning
+        riders_position_table.add_index(
+            "RiderCellIndex",
+            partition_key="geo_cell",
+            sort_key="rider_id"
+        )
+
+        #"<city>#<status>" index sorted by last contact, so fresh riders of a city are one key range
+        riders_position_table.add_index(
+            "RiderCityStatusIndex",
+            partition_key="city_status",
+            sort_key="last_updated_timestamp",
+            sort_key_type=dynamodb.AttributeType.NUMBER
         )
         
         
 
+        #AWS SDK for pandas managed layer, provides NumPy for the batch analytics and movement filter
+        sdk_pandas_layer = lmbda.LayerVersion.from_layer_version_arn(
+            self,
+            "SdkPandasLayer",
+            "arn:aws:lambda:eu-west-1:336392948345:layer:AWSSDKPandas-Python313:4"
+        )
+        #The layer is published for Python 3.13, so the functions using it stay on that runtime
+        sdk_pandas_runtime_suppressions = [
+            {
+                "id": "AwsSolutions-L1",
+                "reason": "Pinned to Python 3.13, the newest runtime the AWS SDK for pandas layer is built for."
+            },
+            {
+                "id": "Serverless-LambdaLatestVersion",
+                "reason": "Pinned to Python 3.13, the newest runtime the AWS SDK for pandas layer is built for."
+            }
+        ]
+
+        #Route history, one item per rider and hour holding delta-encoded point chunks
+        rider_trails_table = DynamoTable(
+            self,
+            "RiderTrailsTable",
+            table_name="RiderTrailsTable",
+            partition_key="rider_id",
+            sort_key="hour",
+            sort_key_type=dynamodb.AttributeType.NUMBER
+        )
+
+        #Per-zone delivery aggregates, one item per zone, tumbling window and shard
+        zone_windows_table = DynamoTable(
+            self,
+            "ZoneWindowsTable",
+            table_name="ZoneWindowsTable",
+            partition_key="zone",
+            sort_key="window_shard",
+            ttl_attribute="expires_at"
+        )
+
+        #Delivery alerts raised by the consumer, for downstream rules to route
+        alerts_bus = events.EventBus(
+            self, "DeliveryAlertsBus",
+            event_bus_name="DeliveryAlertsBus"
+        )
+
         #Kinesis Producer Lambda
         kinesis_producer_construct = Lambda(
             self, "KinesisProducer",
@@ -45,12 +109,22 @@ class FoodDeliveryDataStream(Stack):
             handler="kinesis_producer.lambda_handler",
             code_path="food_delivery/data_stream_assets",
             env={
-                "KINESIS_STREAM_NAME": kinesis_stream.stream_name
+                "KINESIS_STREAM_NAME": kinesis_stream.stream_name,
+                "AGGREGATE_RECORDS": "false",
+                "RECORD_ENCODING": "binary",
+                "MIN_MOVEMENT_METERS": "25",
+                "MIN_HEADING_CHANGE_DEGREES": "30",
+                "KEEPALIVE_SECONDS": "60",
+                "FLEET_SIZE": "1000"
             },
+            layers=[sdk_pandas_layer],
+            runtime=lmbda.Runtime.PYTHON_3_13,
             timeout=30
         )
         kinesis_producer = kinesis_producer_construct.lambda_fn
 
+        NagSuppressions.add_resource_suppressions(kinesis_producer, sdk_pandas_runtime_suppressions)
+
         #Kinesis Consumer Lambda (UpdateRiderLocation)
         kinesis_consumer_construct = Lambda(
             self, "UpdateRiderLocation",
@@ -59,12 +133,98 @@ class FoodDeliveryDataStream(Stack):
             code_path="food_delivery/data_stream_assets",
             env={
                 "KINESIS_STREAM_NAME": kinesis_stream.stream_name,
-                "TABLE_NAME": riders_position_table.table_name
+                "TABLE_NAME": riders_position_table.table_name,
+                "MIN_MOVEMENT_METERS": "25",
+                "MIN_HEADING_CHANGE_DEGREES": "30",
+                "KEEPALIVE_SECONDS": "60",
+                "WRITE_CONCURRENCY": "16",
+                "TRAIL_TABLE_NAME": rider_trails_table.table_name,
+                "ZONE_WINDOWS_TABLE_NAME": zone_windows_table.table_name,
+                "EVENT_BUS_NAME": alerts_bus.event_bus_name,
+                "ALERT_COOLDOWN_SECONDS": "300",
+                "OFFLINE_POSITION_TTL_SECONDS": "3600",
+                "POWERTOOLS_METRICS_NAMESPACE": "FoodDeliveryDataStream"
             },
+            layers=[sdk_pandas_layer],
+            runtime=lmbda.Runtime.PYTHON_3_13,
             timeout=30
         )
         kinesis_consumer = kinesis_consumer_construct.lambda_fn
 
+        NagSuppressions.add_resource_suppressions(kinesis_consumer, sdk_pandas_runtime_suppressions)
+
+        #Columnar archive of the stream, Parquet partitioned by dataset, date and zone
+        archive_bucket = S3BucketConstruct(
+            self,
+            "LocationArchiveBucket",
+            bucket_name=f"location-stream-archive-{self.account}"
+        ).bucket
+
+        #Stream archiver Lambda, a second reader of the stream next to the consumer.
+        #The SDK for pandas layer also provides pyarrow for the Parquet files.
+        stream_archiver_construct = Lambda(
+            self, "ArchiveLocationStream",
+            function_name="ArchiveLocationStream",
+            handler="stream_archiver.lambda_handler",
+            code_path="food_delivery/data_stream_assets",
+            env={
+                "ARCHIVE_BUCKET_NAME": archive_bucket.bucket_name,
+                "ARCHIVE_MAX_ROWS": "50000"
+            },
+            layers=[sdk_pandas_layer],
+            runtime=lmbda.Runtime.PYTHON_3_13,
+            timeout=120,
+            memory=1024
+        )
+        stream_archiver = stream_archiver_construct.lambda_fn
+
+        NagSuppressions.add_resource_suppressions(
+            archive_bucket,
+            suppressions=[{
+                "id": "AwsSolutions-S1",
+                "reason": "Only the archiver Lambda writes here, derived copies of the stream; access logs would add no audit value."
+            }],
+            apply_to_children=True
+        )
+        NagSuppressions.add_resource_suppressions(
+            stream_archiver,
+            suppressions=[
+                {
+                    "id": "AwsSolutions-IAM5",
+                    "reason": "grant_put scopes s3:PutObject and s3:Abort* (multipart uploads) to objects of the archive bucket only."
+                },
+                *sdk_pandas_runtime_suppressions
+            ],
+            apply_to_children=True
+        )
+
+        #Orders live in the main food delivery stack
+        orders_table = dynamodb.Table.from_table_name(
+            self, "ImportedOrdersTable",
+            table_name="UserOrdersTable"
+        )
+
+        #Rider dispatch Lambda, assigns available riders to batches of pending orders
+        rider_dispatch_construct = Lambda(
+            self, "RiderDispatch",
+            function_name="rider_dispatch",
+            handler="rider_dispatch.lambda_handler",
+            code_path="food_delivery/data_stream_assets",
+            env={
+                "RIDERS_TABLE_NAME": riders_position_table.table_name,
+                "ORDERS_TABLE_NAME": orders_table.table_name,
+                "MAX_PICKUP_RADIUS_KM": "5",
+                "RIDER_FRESHNESS_SECONDS": "300"
+            },
+            layers=[sdk_pandas_layer],
+            runtime=lmbda.Runtime.PYTHON_3_13,
+            timeout=60,
+            memory=1024
+        )
+        rider_dispatch = rider_dispatch_construct.lambda_fn
+
+        NagSuppressions.add_resource_suppressions(rider_dispatch, sdk_pandas_runtime_suppressions)
+
         #EventBridge Simulator 
         simulator_rule = events.Rule(
             self,
@@ -80,6 +240,8 @@ class FoodDeliveryDataStream(Stack):
                 kinesis_producer,
                 event=events.RuleTargetInput.from_object({
                     "simulator": True,
+                    "count": 100,
+                    "aggregate": True,
                     "location_data": {
                         "source": "eventbridge_simulator"
                     }
@@ -90,32 +252,157 @@ class FoodDeliveryDataStream(Stack):
         #Grant permissions
         kinesis_stream.grant_write(kinesis_producer)
         kinesis_stream.grant_read(kinesis_consumer)
-        riders_position_table.grant_write_data(kinesis_consumer)
+        #the write grant of grant_write_data, without index/*: the consumer never queries the riders indexes
+        kinesis_consumer.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=[
+                    "dynamodb:BatchWriteItem",
+                    "dynamodb:PutItem",
+                    "dynamodb:UpdateItem",
+                    "dynamodb:DeleteItem",
+                    "dynamodb:DescribeTable",
+                ],
+                resources=[riders_position_table.table_arn],
+            )
+        )
+        rider_trails_table.grant_write_data(kinesis_consumer)
+        zone_windows_table.grant_write_data(kinesis_consumer)
+        alerts_bus.grant_put_events_to(kinesis_consumer)
+        kinesis_stream.grant_read(stream_archiver)
+        archive_bucket.grant_put(stream_archiver)
+        riders_position_table.grant_read_write_data(rider_dispatch)
+        orders_table.grant_read_write_data(rider_dispatch)
+
+        #the read grant covers RiderCellIndex and RiderCityStatusIndex as index/*
+        NagSuppressions.add_resource_suppressions(
+            rider_dispatch,
+            suppressions=[{
+                "id": "AwsSolutions-IAM5",
+                "reason": "index/* only covers the GSIs of the riders position table, which dispatch queries for nearby riders."
+            }],
+            apply_to_children=True
+        )
+
+        #Records that exhaust their retry budget are parked here instead of blocking the shard
+        stream_failure_dlq = sqs.Queue(
+            self, "LocationStreamFailureDLQ",
+            queue_name="location-stream-failure-dlq",
+            retention_period=Duration.days(14),
+            enforce_ssl=True
+        )
+
+        # Suppress DLQ warnings for this queue since it IS a DLQ
+        NagSuppressions.add_resource_suppressions(
+            stream_failure_dlq,
+            suppressions=[
+                {
+                    "id": "AwsSolutions-SQS3",
+                    "reason": "This queue IS the on-failure destination for the location stream. It doesn't need its own DLQ."
+                },
+                {
+                    "id": "Serverless-SQSRedrivePolicy",
+                    "reason": "This is a DLQ itself. Adding another DLQ would create unnecessary complexity."
+                }
+            ]
+        )
 
-        #Add Kinesis as event source for consumer Lambda
+        #Add Kinesis as event source for consumer Lambda.
+        #The handler reports the first failed sequence number, Lambda resumes from it,
+        #and bisecting isolates poison records before the retry budget runs out.
+        #Zone aggregates are carried in the one-minute tumbling window state.
+        #Riders of a batch are written concurrently, so larger batches cost little extra latency.
         kinesis_consumer.add_event_source(
             lambda_event_sources.KinesisEventSource(
                 kinesis_stream,
-                batch_size=10,
-                starting_position=lmbda.StartingPosition.LATEST
+                batch_size=100,
+                starting_position=lmbda.StartingPosition.LATEST,
+                report_batch_item_failures=True,
+                bisect_batch_on_error=True,
+                retry_attempts=3,
+                max_record_age=Duration.hours(1),
+                tumbling_window=Duration.minutes(1),
+                on_failure=lambda_event_sources.SqsDlq(stream_failure_dlq)
             )
         )
 
-        # Suppress Kinesis event source mapping destination warning
-        NagSuppressions.add_resource_suppressions_by_path(
-            self,
-            path="/FoodDeliveryDataStream/UpdateRiderLocation/Lambda",
-            suppressions=[
-                {
-                    "id": "Serverless-LambdaEventSourceMappingDestination",
-                    "reason": (
-                        "Kinesis has built-in retry mechanisms and the Lambda has its own DLQ. "
-                        "Failed records are automatically retried by Kinesis. "
-                        "Adding an event source mapping destination would be redundant."
+        #The archiver writes whole batches, so it waits for large ones: the batch size and
+        #batching window are the archive's size and time flush thresholds across invocations.
+        #A failed S3 write fails the batch, and its retry rewrites the same objects.
+        stream_archiver.add_event_source(
+            lambda_event_sources.KinesisEventSource(
+                kinesis_stream,
+                batch_size=10000,
+                max_batching_window=Duration.minutes(5),
+                starting_position=lmbda.StartingPosition.LATEST,
+                bisect_batch_on_error=True,
+                retry_attempts=5,
+                max_record_age=Duration.hours(12),
+                on_failure=lambda_event_sources.SqsDlq(stream_failure_dlq)
+            )
+        )
+
+        #The consumer falling behind the stream, oldest record age of its last batch
+        consumer_iterator_age = kinesis_consumer.metric(
+            "IteratorAge",
+            statistic="Maximum",
+            period=Duration.minutes(1)
+        )
+        cloudwatch.Alarm(
+            self, "ConsumerIteratorAgeAlarm",
+            alarm_name="UpdateRiderLocation-IteratorAge",
+            metric=consumer_iterator_age,
+            threshold=60000,
+            evaluation_periods=3,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        )
+
+        #Per-stage timings the consumer publishes once per batch as EMF, by shard and record type.
+        #Shards come and go in on-demand mode, so each line combines a search over all of them.
+        def stage_metric(metric_name: str, statistic: str = "Average") -> cloudwatch.MathExpression:
+            combine = {"Average": "AVG", "Maximum": "MAX", "Sum": "SUM"}[statistic]
+            return cloudwatch.MathExpression(
+                expression=(
+                    f"{combine}(SEARCH('{{FoodDeliveryDataStream,shard,record_type}} "
+                    f"MetricName=\"{metric_name}\"', '{statistic}', 60))"
+                ),
+                label=metric_name,
+                period=Duration.minutes(1)
+            )
+
+        cloudwatch.Dashboard(
+            self, "LocationStreamDashboard",
+            dashboard_name="LocationStreamConsumer",
+            widgets=[
+                [
+                    cloudwatch.GraphWidget(
+                        title="Consumer iterator age (ms)",
+                        left=[consumer_iterator_age],
+                        width=12
+                    ),
+                    cloudwatch.GraphWidget(
+                        title="Arrival to processed lag (ms)",
+                        left=[stage_metric("ProcessingLag", "Maximum")],
+                        width=12
                     )
-                }
-            ],
-            apply_to_children=True
+                ],
+                [
+                    cloudwatch.GraphWidget(
+                        title="Batch time per stage (ms)",
+                        left=[
+                            stage_metric(stage)
+                            for stage in ("DecodeTime", "AnalyticsTime", "DynamoDBWriteTime", "PublishTime", "BatchTime")
+                        ],
+                        width=12
+                    ),
+                    cloudwatch.GraphWidget(
+                        title="Records per batch",
+                        left=[stage_metric("Records", "Sum")],
+                        right=[kinesis_consumer.metric_duration(statistic="Maximum", period=Duration.minutes(1))],
+                        width=12
+                    )
+                ]
+            ]
         )
 
         # Suppress EventBridge DLQ for simulator
@@ -138,5 +425,7 @@ class FoodDeliveryDataStream(Stack):
         CfnOutput(self, "KinesisStreamArn", value=kinesis_stream.stream_arn)
         CfnOutput(self, "ProducerFunctionName", value=kinesis_producer.function_name)
         CfnOutput(self, "ConsumerFunctionName", value=kinesis_consumer.function_name)
+        CfnOutput(self, "ArchiveBucketName", value=archive_bucket.bucket_name)
+        CfnOutput(self, "DispatchFunctionName", value=rider_dispatch.function_name)
         CfnOutput(self, "DynamoDBTableName", value=riders_position_table.table_name)
         CfnOutput(self, "SimulatorRuleName", value=simulator_rule.rule_name)
\ No newline at end of file
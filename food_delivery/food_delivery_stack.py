@@ -9,6 +9,7 @@ from aws_cdk import (
     aws_sqs as sqs,
     aws_iam as iam,
     aws_ssm as ssm,
+    aws_secretsmanager as secretsmanager,
     aws_sns_subscriptions as sns_subscriptions,
     aws_cloudwatch as cloudwatch,
     aws_cloudwatch_actions as cloudwatch_actions
@@ -33,6 +34,44 @@ class FoodDeliveryStack(Stack):
             sort_key="orderId"
         )
 
+        #a user's orders newest first, and per status newest first ("<status>#<orderTime>").
+        #Both carry the list summary attributes, orderItems stays in the table.
+        order_summary_attributes = ["restaurantId", "totalAmount", "status", "timestamp"]
+        #a restaurant's incoming orders of one day, oldest first, write-sharded so a busy
+        #restaurant does not concentrate on one partition ("<restaurantId>#<day>#<shard>")
+        restaurant_feed_shards = "4"
+        order_indexes = [
+            dict(
+                index_name="OrderTimeIndex",
+                partition_key="userId",
+                sort_key="orderTime",
+                projection_type=dynamodb.ProjectionType.INCLUDE,
+                non_key_attributes=order_summary_attributes
+            ),
+            dict(
+                index_name="StatusOrderTimeIndex",
+                partition_key="userId",
+                sort_key="statusOrderTime",
+                projection_type=dynamodb.ProjectionType.INCLUDE,
+                non_key_attributes=order_summary_attributes + ["orderTime"]
+            ),
+            dict(
+                index_name="RestaurantDayIndex",
+                partition_key="restaurantShardDay",
+                sort_key="feedKey",
+                projection_type=dynamodb.ProjectionType.INCLUDE,
+                non_key_attributes=["restaurantId", "status", "totalAmount", "orderItems", "orderTime"]
+            )
+        ]
+        #DynamoDB creates one GSI per table update, so a deployed table gets these over successive
+        #deploys with -c orderTableIndexes=1, then 2, then 3. A new table takes all of them at once.
+        order_table_indexes = self.node.try_get_context("orderTableIndexes")
+        order_table_indexes = len(order_indexes) if order_table_indexes is None else int(order_table_indexes)
+        if not 0 <= order_table_indexes <= len(order_indexes):
+            raise ValueError(f"orderTableIndexes must be between 0 and {len(order_indexes)}")
+        for index in order_indexes[:order_table_indexes]:
+            table.add_index(**index)
+
         #cognito user pool
         user_pool = cognito.UserPool(self, "UserPool",
             user_pool_name="food-order-userpool",
@@ -133,7 +172,8 @@ class FoodDeliveryStack(Stack):
             handler="create_order.lambda_handler",
             code_path="food_delivery/assets",
             env={
-                "TABLE_NAME": table.table_name
+                "TABLE_NAME": table.table_name,
+                "RESTAURANT_FEED_SHARDS": restaurant_feed_shards
             }
         )
         create_order_lambda = create_order_construct.lambda_fn
@@ -153,6 +193,24 @@ class FoodDeliveryStack(Stack):
         edit_order_lambda = edit_order_construct.lambda_fn
         table.grant_read_write_data(edit_order_lambda)
 
+        #HMAC key for the order list pagination cursors
+        cursor_secret = secretsmanager.Secret(
+            self, "OrderCursorSecret",
+            secret_name="food-delivery/order-cursor-key",
+            description="Signs the opaque pagination cursors returned by GET /orders",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                password_length=64,
+                exclude_punctuation=True
+            )
+        )
+        NagSuppressions.add_resource_suppressions(
+            cursor_secret,
+            suppressions=[{
+                "id": "AwsSolutions-SMG4",
+                "reason": "Rotating the key would invalidate cursors already handed out; a leaked key only lets a user forge cursors into their own orders."
+            }]
+        )
+
         #list_order Lambda
         list_order_construct = Lambda(
             self, "ListOrderFunction",
@@ -160,11 +218,13 @@ class FoodDeliveryStack(Stack):
             handler="list_order.lambda_handler",
             code_path="food_delivery/assets",
             env={
-                "TABLE_NAME": table.table_name
+                "TABLE_NAME": table.table_name,
+                "CURSOR_SECRET_ARN": cursor_secret.secret_arn
             }
         )
         list_order_lambda = list_order_construct.lambda_fn
         table.grant_read_data(list_order_lambda)
+        cursor_secret.grant_read(list_order_lambda)
 
         #get_order Lambda
         get_order_construct = Lambda(
@@ -192,6 +252,29 @@ class FoodDeliveryStack(Stack):
         cancel_order_lambda = cancel_order_construct.lambda_fn
         table.grant_read_write_data(cancel_order_lambda)
 
+        #the table grants cover OrderTimeIndex, StatusOrderTimeIndex and RestaurantDayIndex as index/*
+        order_index_suppressions = [{
+            "id": "AwsSolutions-IAM5",
+            "reason": "index/* only covers the GSIs of the user orders table, which the order listings query."
+        }]
+        for order_lambda in [create_order_lambda, edit_order_lambda, list_order_lambda, get_order_lambda, cancel_order_lambda]:
+            NagSuppressions.add_resource_suppressions(order_lambda, order_index_suppressions, apply_to_children=True)
+
+        #restaurant_feed Lambda, incoming orders of a restaurant for kitchen tablets to poll
+        restaurant_feed_construct = Lambda(
+            self, "RestaurantFeedFunction",
+            function_name="restaurant_feed",
+            handler="restaurant_feed.lambda_handler",
+            code_path="food_delivery/assets",
+            env={
+                "TABLE_NAME": table.table_name,
+                "RESTAURANT_FEED_SHARDS": restaurant_feed_shards
+            }
+        )
+        restaurant_feed_lambda = restaurant_feed_construct.lambda_fn
+        table.grant_read_data(restaurant_feed_lambda)
+        NagSuppressions.add_resource_suppressions(restaurant_feed_lambda, order_index_suppressions, apply_to_children=True)
+
         
 
         #API Gateway
@@ -257,6 +340,15 @@ class FoodDeliveryStack(Stack):
         )
 
         
+        restaurant_orders = api.root.add_resource("restaurants").add_resource("{restaurantId}").add_resource("orders")
+        restaurant_orders.add_method(
+            "GET",
+            apigw.LambdaIntegration(restaurant_feed_lambda),
+            authorization_type=apigw.AuthorizationType.CUSTOM,
+            authorizer=authorizer,
+        )
+
+        
         deployment = apigw.Deployment(self, "Deployment", api=api)
         stage = apigw.Stage(
             self, "DevStage",
@@ -408,6 +500,7 @@ class FoodDeliveryStack(Stack):
             ("ListOrder", list_order_lambda),
             ("GetOrder", get_order_lambda),
             ("CancelOrder", cancel_order_lambda),
+            ("RestaurantFeed", restaurant_feed_lambda),
             ("Authorizer", authorizer_lambda)
         ]
 
@@ -37,3 +37,148 @@ def test_autherize_lambda_runs(monkeypatch):
     assert result["principalId"] == "user-123"
     assert "policyDocument" in result
     assert result["policyDocument"]["Statement"][0]["Effect"] == "Allow"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_key_store(monkeypatch, jwks, **kwargs):
+    from assets import autherize
+
+    constructed = []
+    monkeypatch.setattr(autherize.jwk, "construct", lambda key: constructed.append(key["kid"]) or f"public-{key['kid']}")
+    fetches = []
+
+    def fetch(region):
+        fetches.append(region)
+        result = jwks[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    clock = FakeClock()
+    kwargs.setdefault("spawn", lambda refresh: refresh())
+    store = autherize.KeyStore(fetch, ttl=3600, min_refresh_interval=60, clock=clock, sleep=lambda s: None, **kwargs)
+    return store, clock, fetches, constructed
+
+
+def test_key_store_constructs_each_key_once_and_indexes_by_kid(monkeypatch):
+    jwks = [[{"kid": "a"}, {"kid": "b"}]]
+    store, clock, fetches, constructed = make_key_store(monkeypatch, jwks)
+
+    for _ in range(5):
+        assert store.get("b", "eu-west-1") == "public-b"
+        assert store.get("a", "eu-west-1") == "public-a"
+
+    assert fetches == ["eu-west-1"]
+    assert constructed == ["a", "b"]
+
+
+def test_key_store_refreshes_on_unknown_kid_at_most_once_per_interval(monkeypatch):
+    jwks = [[{"kid": "a"}]]
+    store, clock, fetches, _ = make_key_store(monkeypatch, jwks)
+    store.get("a", "eu-west-1")
+
+    jwks[0] = [{"kid": "a"}, {"kid": "rotated"}]
+    clock.now += 10
+    assert store.get("rotated", "eu-west-1") is None
+    assert store.get("forged", "eu-west-1") is None
+    assert len(fetches) == 1
+
+    clock.now += 60
+    assert store.get("rotated", "eu-west-1") == "public-rotated"
+    assert store.get("forged", "eu-west-1") is None
+    assert len(fetches) == 2
+
+
+def test_key_store_serves_expired_keys_while_refreshing_in_the_background(monkeypatch):
+    jwks = [[{"kid": "a"}]]
+    background = []
+    store, clock, fetches, _ = make_key_store(monkeypatch, jwks, spawn=background.append)
+    store.get("a", "eu-west-1")
+
+    jwks[0] = [{"kid": "a"}, {"kid": "b"}]
+    clock.now += 3601
+    for _ in range(5):
+        assert store.get("a", "eu-west-1") == "public-a"
+    assert (len(background), len(fetches)) == (1, 1)
+
+    background[0]()
+    assert store.get("b", "eu-west-1") == "public-b"
+    assert len(fetches) == 2
+
+
+def test_key_store_retries_the_first_fetch(monkeypatch):
+    from assets import autherize
+
+    monkeypatch.setattr(autherize.jwk, "construct", lambda key: f"public-{key['kid']}")
+    responses = [OSError("connection reset"), OSError("connection reset"), [{"kid": "a"}]]
+
+    def fetch(region):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    sleeps = []
+    store = autherize.KeyStore(fetch, bootstrap_attempts=3, clock=FakeClock(), sleep=sleeps.append)
+
+    assert store.get("a", "eu-west-1") == "public-a"
+    assert len(sleeps) == 2
+
+
+def test_key_store_serves_cached_keys_through_a_jwks_outage(monkeypatch):
+    jwks = [[{"kid": "a"}]]
+    store, clock, fetches, _ = make_key_store(monkeypatch, jwks)
+    store.get("a", "eu-west-1")
+
+    #long past the TTL, every failed refresh keeps the cached keys and is retried once per interval
+    jwks[0] = OSError("JWKS endpoint unavailable")
+    clock.now += 86401
+    for _ in range(5):
+        assert store.get("a", "eu-west-1") == "public-a"
+    assert len(fetches) == 2
+
+    clock.now += 60
+    assert store.get("a", "eu-west-1") == "public-a"
+    assert len(fetches) == 3
+
+
+def test_verified_claims_skips_validation_for_cached_token(monkeypatch):
+    from assets import autherize
+
+    clock = FakeClock()
+    monkeypatch.setattr(autherize, "token_cache", autherize.VerifiedTokenCache(max_size=10, clock=clock))
+    validations = []
+    monkeypatch.setattr(
+        autherize, "validate_token",
+        lambda token, region: validations.append(token) or {"sub": "user-123", "exp": clock.now + 60}
+    )
+
+    for _ in range(3):
+        assert autherize.verified_claims("header.payload.sig", "eu-west-1")["sub"] == "user-123"
+    assert validations == ["header.payload.sig"]
+
+    #past the token's exp it is validated again, and rejected there
+    clock.now += 61
+    autherize.verified_claims("header.payload.sig", "eu-west-1")
+    assert len(validations) == 2
+
+
+def test_verified_token_cache_evicts_least_recently_used():
+    from assets import autherize
+
+    cache = autherize.VerifiedTokenCache(max_size=2, clock=FakeClock())
+    for name in ("a", "b"):
+        cache.put(autherize.token_hash(name), {"sub": name, "exp": 2000})
+    cache.get(autherize.token_hash("a"))
+    cache.put(autherize.token_hash("c"), {"sub": "c", "exp": 2000})
+
+    assert cache.get(autherize.token_hash("b")) is None
+    assert [cache.get(autherize.token_hash(name))["sub"] for name in ("a", "c")] == ["a", "c"]
+    assert all(len(key) == 32 for key in cache.entries)
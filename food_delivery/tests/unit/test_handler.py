@@ -7,7 +7,7 @@ from moto import mock_aws
 from contextlib import contextmanager
 from decimal import Decimal
 from unittest.mock import patch
-from datetime import datetime
+from datetime import datetime, timedelta
 
 TABLE_NAME = "Orders"
 USER_ID = "user-123"
@@ -497,5 +497,321 @@ def test_get_order_not_found():
             assert result["statusCode"] == 404
 
 
+CURSOR_SECRET_NAME = "order-cursor-key"
+
+
+def order_time(minutes_ago):
+    return (datetime.utcnow() - timedelta(minutes=minutes_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@contextmanager
+def mock_order_history(count, status="DELIVERED"):
+    with mock_aws():
+        summary = {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["restaurantId", "totalAmount", "status", "timestamp"]}
+        table = boto3.resource("dynamodb").create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {"AttributeName": "userId", "KeyType": "HASH"},
+                {"AttributeName": "orderId", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "userId", "AttributeType": "S"},
+                {"AttributeName": "orderId", "AttributeType": "S"},
+                {"AttributeName": "orderTime", "AttributeType": "S"},
+                {"AttributeName": "statusOrderTime", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "OrderTimeIndex",
+                    "KeySchema": [
+                        {"AttributeName": "userId", "KeyType": "HASH"},
+                        {"AttributeName": "orderTime", "KeyType": "RANGE"},
+                    ],
+                    "Projection": summary,
+                },
+                {
+                    "IndexName": "StatusOrderTimeIndex",
+                    "KeySchema": [
+                        {"AttributeName": "userId", "KeyType": "HASH"},
+                        {"AttributeName": "statusOrderTime", "KeyType": "RANGE"},
+                    ],
+                    "Projection": dict(summary, NonKeyAttributes=summary["NonKeyAttributes"] + ["orderTime"]),
+                },
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        boto3.client("secretsmanager").create_secret(Name=CURSOR_SECRET_NAME, SecretString="test-cursor-key")
+        #order-000 is the oldest
+        for i in range(count):
+            placed_at = order_time(10 * (count - i))
+            table.put_item(
+                Item={
+                    "userId": USER_ID,
+                    "orderId": f"order-{i:03d}",
+                    "status": status,
+                    "restaurantId": "rest-123",
+                    "totalAmount": Decimal("10.50"),
+                    "orderItems": [{"name": "Soup", "price": Decimal("10.50"), "quantity": 1}],
+                    "orderTime": placed_at,
+                    "statusOrderTime": f"{status}#{placed_at}",
+                }
+            )
+        from assets import list_order
+
+        with patch.object(list_order, "CURSOR_SECRET_ARN", CURSOR_SECRET_NAME):
+            yield list_order
+
+
+def list_orders_event(claims=None, **query_params):
+    event = create_powertools_event("GET", "/orders", claims=claims)
+    event["queryStringParameters"] = {key: str(value) for key, value in query_params.items()} or None
+    return event
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_list_orders_pages_through_history_with_cursor():
+    with mock_order_history(5) as list_order:
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2, "cursor": cursor} if cursor else {"limit": 2}
+            result = list_order.lambda_handler(list_orders_event(**params), {})
+            assert result["statusCode"] == 200
+            body = json.loads(result["body"])
+            assert len(body["orders"]) <= 2
+            seen.extend(order["orderId"] for order in body["orders"])
+            cursor = body["nextCursor"]
+            if not cursor:
+                break
+
+        assert seen == [f"order-{i:03d}" for i in reversed(range(5))]
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_list_orders_projects_summary_unless_items_included():
+    with mock_order_history(1) as list_order:
+        summary = json.loads(list_order.lambda_handler(list_orders_event(), {})["body"])["orders"]
+        expanded = json.loads(list_order.lambda_handler(list_orders_event(include="items"), {})["body"])["orders"]
+
+        assert all("orderItems" not in order for order in summary)
+        assert {"orderId", "status", "totalAmount"} <= summary[0].keys()
+        assert all(order["orderItems"] for order in expanded)
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_list_orders_fails_when_items_stay_unprocessed():
+    with mock_order_history(1) as list_order:
+        sleeps = []
+        throttled = lambda RequestItems: {"Responses": {}, "UnprocessedKeys": RequestItems}
+        with patch.object(list_order.dynamodb, "batch_get_item", side_effect=throttled) as batch_get_item, \
+                patch.object(list_order.time, "sleep", sleeps.append):
+            response = list_order.lambda_handler(list_orders_event(include="items"), {})
+
+        assert response["statusCode"] == 500
+        assert batch_get_item.call_count == list_order.MAX_BATCH_GET_ATTEMPTS
+        assert len(sleeps) == list_order.MAX_BATCH_GET_ATTEMPTS - 1
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_list_orders_by_status_reads_only_that_status_newest_first():
+    with mock_order_history(4) as list_order:
+        from assets.create_order import status_order_time
+
+        for minutes_ago, order_id in [(45, "placed-old"), (5, "placed-new")]:
+            placed_at = order_time(minutes_ago)
+            list_order.table.put_item(Item={
+                "userId": USER_ID, "orderId": order_id, "status": "PLACED", "orderTime": placed_at,
+                "statusOrderTime": status_order_time("PLACED", placed_at),
+            })
+        recent = json.loads(list_order.lambda_handler(list_orders_event(limit=3), {})["body"])
+        active = json.loads(list_order.lambda_handler(list_orders_event(status="placed"), {})["body"])
+
+        assert [order["orderId"] for order in recent["orders"]] == ["placed-new", "order-003", "order-002"]
+        assert [order["orderId"] for order in active["orders"]] == ["placed-new", "placed-old"]
+        assert active["nextCursor"] is None
+
+        #a cursor only continues the listing it came from
+        other = list_order.lambda_handler(list_orders_event(status="PLACED", cursor=recent["nextCursor"]), {})
+        assert other["statusCode"] == 400
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_cancel_order_moves_order_to_canceled_in_status_index():
+    with mock_order_history(0) as list_order:
+        placed_at = order_time(2)
+        list_order.table.put_item(Item={
+            "userId": USER_ID, "orderId": ORDER_ID, "status": "PLACED", "orderTime": placed_at,
+            "statusOrderTime": f"PLACED#{placed_at}",
+        })
+        from assets import cancel_order
+
+        event = create_powertools_event("DELETE", f"/orders/{ORDER_ID}", path_params={"orderId": ORDER_ID})
+        cancel_order.lambda_handler(event, {})
+
+        item = list_order.table.get_item(Key={"userId": USER_ID, "orderId": ORDER_ID})["Item"]
+        assert item["status"] == "CANCELED"
+        assert item["statusOrderTime"] == f"CANCELED#{placed_at}"
+        placed = json.loads(list_order.lambda_handler(list_orders_event(status="PLACED"), {})["body"])
+        assert placed["orders"] == []
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_list_orders_rejects_tampered_or_foreign_cursor():
+    with mock_order_history(3) as list_order:
+        cursor = json.loads(list_order.lambda_handler(list_orders_event(limit=1), {})["body"])["nextCursor"]
+        payload, signature = cursor.split(".")
+        forged = list_order.b64encode(list_order.b64decode(payload).replace(USER_ID.encode(), b"user-999"))
+
+        tampered = list_order.lambda_handler(list_orders_event(cursor=f"{forged}.{signature}"), {})
+        foreign = list_order.lambda_handler(list_orders_event(claims={"sub": "user-999"}, cursor=cursor), {})
+        garbage = list_order.lambda_handler(list_orders_event(cursor="not-a-cursor"), {})
+
+        assert [tampered["statusCode"], foreign["statusCode"], garbage["statusCode"]] == [400, 400, 400]
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_list_orders_rejects_bad_limit_and_include():
+    with mock_order_history(0) as list_order:
+        assert list_order.lambda_handler(list_orders_event(limit=0), {})["statusCode"] == 400
+        assert list_order.lambda_handler(list_orders_event(limit="ten"), {})["statusCode"] == 400
+        assert list_order.lambda_handler(list_orders_event(include="payments"), {})["statusCode"] == 400
+
+
+RESTAURANT_ID = "rest-456"
+
+
+@contextmanager
+def mock_restaurant_orders():
+    with mock_aws():
+        boto3.resource("dynamodb").create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {"AttributeName": "userId", "KeyType": "HASH"},
+                {"AttributeName": "orderId", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "userId", "AttributeType": "S"},
+                {"AttributeName": "orderId", "AttributeType": "S"},
+                {"AttributeName": "restaurantShardDay", "AttributeType": "S"},
+                {"AttributeName": "feedKey", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "RestaurantDayIndex",
+                    "KeySchema": [
+                        {"AttributeName": "restaurantShardDay", "KeyType": "HASH"},
+                        {"AttributeName": "feedKey", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        from assets import create_order, restaurant_feed
+
+        yield create_order, restaurant_feed
+
+
+def place_order(create_order, order_id, restaurant_id=RESTAURANT_ID):
+    with patch.object(create_order.uuid, "uuid4", return_value=order_id):
+        event = create_powertools_event("POST", "/orders", body={
+            "restaurantId": restaurant_id, "totalAmount": 12.5, "orderItems": [{"name": "Ramen", "quantity": 1}],
+        })
+        assert create_order.lambda_handler(event, {})["statusCode"] == 200
+
+
+def feed_event(restaurant_id=RESTAURANT_ID, groups=("restaurant-rest-456",), etag=None, **query_params):
+    event = create_powertools_event(
+        "GET", f"/restaurants/{restaurant_id}/orders", path_params={"restaurantId": restaurant_id}
+    )
+    event["requestContext"]["authorizer"] = {"userId": "staff-1", "groups": json.dumps(list(groups)), "isAdmin": "false"}
+    event["queryStringParameters"] = {key: str(value) for key, value in query_params.items()} or None
+    if etag:
+        event["headers"]["If-None-Match"] = etag
+    return event
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_restaurant_feed_returns_only_orders_after_the_watermark():
+    with mock_restaurant_orders() as (create_order, restaurant_feed):
+        for i in range(6):
+            place_order(create_order, f"order-{i}")
+        place_order(create_order, "other-restaurant", restaurant_id="rest-999")
+
+        first = restaurant_feed.lambda_handler(feed_event(limit=4), {})
+        first_body = json.loads(first["body"])
+        second = json.loads(restaurant_feed.lambda_handler(feed_event(since=first_body["watermark"]), {})["body"])
+
+        assert first["statusCode"] == 200
+        assert first["multiValueHeaders"]["ETag"] == [f'"{first_body["watermark"]}"']
+        seen = [order["orderId"] for order in first_body["orders"] + second["orders"]]
+        assert len(first_body["orders"]) == 4
+        assert sorted(seen) == [f"order-{i}" for i in range(6)]
+        assert all("feedKey" not in order and order["orderItems"] for order in first_body["orders"])
+
+        #polling with the last ETag costs a 304 until a new order comes in
+        idle = restaurant_feed.lambda_handler(feed_event(etag=f'"{second["watermark"]}"'), {})
+        assert idle["statusCode"] == 304
+        assert idle["body"] == ""
+
+        place_order(create_order, "order-new")
+        fresh = restaurant_feed.lambda_handler(feed_event(etag=f'"{second["watermark"]}"'), {})
+        assert [order["orderId"] for order in json.loads(fresh["body"])["orders"]] == ["order-new"]
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_restaurant_feed_hands_out_orders_that_show_up_behind_the_watermark():
+    placed_at = datetime.utcnow().replace(microsecond=0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return placed_at
+
+    with mock_restaurant_orders() as (create_order, restaurant_feed), patch.object(create_order, "datetime", FrozenDatetime):
+        place_order(create_order, "order-z")
+        first = json.loads(restaurant_feed.lambda_handler(feed_event(), {})["body"])
+
+        #same second, smaller orderId: its feedKey sorts below the watermark
+        place_order(create_order, "order-a")
+        second = restaurant_feed.lambda_handler(feed_event(since=first["watermark"]), {})
+        second_body = json.loads(second["body"])
+        idle = restaurant_feed.lambda_handler(feed_event(since=second_body["watermark"]), {})
+
+        assert [order["orderId"] for order in first["orders"]] == ["order-z"]
+        assert second["statusCode"] == 200
+        assert [order["orderId"] for order in second_body["orders"]] == ["order-a"]
+        assert idle["statusCode"] == 304
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_restaurant_feed_spreads_orders_over_shards():
+    with mock_restaurant_orders() as (create_order, _):
+        keys = [create_order.restaurant_feed_keys(RESTAURANT_ID, f"order-{i}", "2026-10-17T12:00:00Z") for i in range(40)]
+
+        assert {key["restaurantShardDay"] for key in keys} == {
+            f"{RESTAURANT_ID}#2026-10-17#{shard}" for shard in range(create_order.RESTAURANT_FEED_SHARDS)
+        }
+        assert keys[0]["feedKey"] == "2026-10-17T12:00:00Z#order-0"
+
+
+@patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME})
+def test_restaurant_feed_rejects_other_restaurants_staff_and_bad_watermark():
+    with mock_restaurant_orders() as (_, restaurant_feed):
+        assert restaurant_feed.lambda_handler(feed_event(groups=["restaurant-rest-999"]), {})["statusCode"] == 403
+        assert restaurant_feed.lambda_handler(feed_event(since="!!"), {})["statusCode"] == 400
+        assert restaurant_feed.lambda_handler(feed_event(groups=[]), {})["statusCode"] == 403
+
+
+def test_restaurant_feed_reads_back_to_yesterday_at_most():
+    with patch.dict(os.environ, {"TABLE_NAME": TABLE_NAME}):
+        from assets import restaurant_feed
+
+    now = datetime(2026, 10, 17, 8, 0)
+    assert restaurant_feed.feed_days(None, now) == ["2026-10-17"]
+    assert restaurant_feed.feed_days("2026-10-16T23:59:00Z#o", now) == ["2026-10-16", "2026-10-17"]
+    assert restaurant_feed.feed_days("2026-10-01T10:00:00Z#o", now) == ["2026-10-16", "2026-10-17"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import base64
+import pytest
+import boto3
+from moto import mock_aws
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "data_stream_assets"))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("TABLE_NAME", "RidersPositionTable")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+
+SHARD_ARN = "arn:aws:kinesis:eu-west-1:123456789012:stream/LocationStream/shardId-000000000000"
+
+
+def make_kinesis_record(payload: dict, sequence_number: int, partition_key: str = None) -> dict:
+    data = payload.get("data", {})
+    return {
+        "eventID": f"shardId-000000000000:{sequence_number}",
+        "kinesis": {
+            "data": base64.b64encode(json.dumps(payload).encode("utf-8")).decode("utf-8"),
+            "sequenceNumber": str(sequence_number),
+            "partitionKey": partition_key or data.get("rider_id") or data.get("delivery_id", "pk"),
+            "approximateArrivalTimestamp": 1700000000.0,
+        },
+        "eventSourceARN": SHARD_ARN,
+    }
+
+
+def make_rider_ping(rider_id: str, lat: float, lng: float, last_updated: float, **overrides) -> dict:
+    data = {
+        "rider_id": rider_id,
+        "lat": lat,
+        "lng": lng,
+        "city": "Amsterdam",
+        "speed": 20.0,
+        "heading": 90,
+        "status": "available",
+        "vehicle_type": "bike",
+        "last_updated": last_updated,
+    }
+    data.update(overrides)
+    return {
+        "timestamp": "2026-01-01T12:00:00",
+        "event_id": f"evt-{rider_id}-{last_updated}",
+        "source": "test",
+        "data": data,
+    }
+
+
+@pytest.fixture
+def riders_table():
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb")
+        table = dynamodb.create_table(
+            TableName=os.environ["TABLE_NAME"],
+            KeySchema=[{"AttributeName": "rider_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "rider_id", "AttributeType": "S"},
+                {"AttributeName": "geo_cell", "AttributeType": "S"},
+                {"AttributeName": "city_status", "AttributeType": "S"},
+                {"AttributeName": "last_updated_timestamp", "AttributeType": "N"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "RiderCellIndex",
+                    "KeySchema": [
+                        {"AttributeName": "geo_cell", "KeyType": "HASH"},
+                        {"AttributeName": "rider_id", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
+                {
+                    "IndexName": "RiderCityStatusIndex",
+                    "KeySchema": [
+                        {"AttributeName": "city_status", "KeyType": "HASH"},
+                        {"AttributeName": "last_updated_timestamp", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield table
+
+
+@pytest.fixture
+def trails_table():
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb")
+        table = dynamodb.create_table(
+            TableName="RiderTrailsTable",
+            KeySchema=[
+                {"AttributeName": "rider_id", "KeyType": "HASH"},
+                {"AttributeName": "hour", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "rider_id", "AttributeType": "S"},
+                {"AttributeName": "hour", "AttributeType": "N"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield table
+
+
+@pytest.fixture
+def zone_windows_table():
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb")
+        table = dynamodb.create_table(
+            TableName="ZoneWindowsTable",
+            KeySchema=[
+                {"AttributeName": "zone", "KeyType": "HASH"},
+                {"AttributeName": "window_shard", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "zone", "AttributeType": "S"},
+                {"AttributeName": "window_shard", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield table
+
+
+@pytest.fixture
+def archive_bucket():
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="location-archive", CreateBucketConfiguration={"LocationConstraint": "eu-west-1"})
+        yield s3
+
+
+@pytest.fixture
+def lambda_context():
+    class MockContext:
+        function_name = "UpdateRiderLocation"
+        memory_limit_in_mb = 256
+        invoked_function_arn = "arn:aws:lambda:eu-west-1:123456789012:function:UpdateRiderLocation"
+        aws_request_id = "test-request-id"
+
+    return MockContext()
+
+
+#the movement filters, stale-write and alert caches are module-level, start every test from cold ones
+@pytest.fixture(autouse=True)
+def reset_movement_filters():
+    for module_name in ("kinesis_consumer", "kinesis_producer"):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            module.movement_filter.last_accepted.clear()
+    if "kinesis_consumer" in sys.modules:
+        sys.modules["kinesis_consumer"].newest_positions.clear()
+        sys.modules["kinesis_consumer"].zone_tracker.clear()
+        sys.modules["kinesis_consumer"].recent_tracks.clear()
+    if "alert_publisher" in sys.modules:
+        sys.modules["alert_publisher"].published_alerts.clear()
+    yield
@@ -0,0 +1,73 @@
+import json
+from unittest.mock import MagicMock
+
+import alert_publisher
+
+
+def processed(delivery_id: str, alert_types=("DELIVERY_DELAY",)) -> dict:
+    return {
+        "event_id": f"evt-{delivery_id}",
+        "timestamp": "2026-01-01T12:00:00",
+        "delivery_id": delivery_id,
+        "order_id": f"ORD-{delivery_id}",
+        "status": "delayed",
+        "analytics": {"delivery_zone": "Zone-West", "priority_level": "HIGH", "estimated_delay": 12},
+        "alerts": [{"type": alert_type, "message": f"{alert_type} {delivery_id}"} for alert_type in alert_types],
+    }
+
+
+def accept_all(Entries):
+    return {"FailedEntryCount": 0, "Entries": [{"EventId": "id"} for _ in Entries]}
+
+
+def test_alerts_are_sent_ten_entries_per_call(monkeypatch):
+    client = MagicMock()
+    client.put_events.side_effect = accept_all
+    monkeypatch.setattr(alert_publisher, "events_client", client)
+
+    failed = alert_publisher.publish_alerts([processed(f"DEL-{i}") for i in range(23)], now=1000.0)
+
+    assert failed == 0
+    assert [len(call.kwargs["Entries"]) for call in client.put_events.call_args_list] == [10, 10, 3]
+    detail = json.loads(client.put_events.call_args_list[0].kwargs["Entries"][0]["Detail"])
+    assert detail["delivery_id"] == "DEL-0"
+
+
+def test_repeated_alerts_wait_out_the_cooldown(monkeypatch):
+    client = MagicMock()
+    client.put_events.side_effect = accept_all
+    monkeypatch.setattr(alert_publisher, "events_client", client)
+    monkeypatch.setattr(alert_publisher, "ALERT_COOLDOWN_SECONDS", 300)
+
+    alert_publisher.publish_alerts([processed("DEL-1"), processed("DEL-1")], now=1000.0)
+    alert_publisher.publish_alerts([processed("DEL-1", ("DELIVERY_DELAY", "HIGH_PRIORITY"))], now=1100.0)
+    alert_publisher.publish_alerts([processed("DEL-1")], now=1300.0)
+
+    sent = [[entry["DetailType"] for entry in call.kwargs["Entries"]] for call in client.put_events.call_args_list]
+    assert sent == [["DELIVERY_DELAY"], ["HIGH_PRIORITY"], ["DELIVERY_DELAY"]]
+
+
+def test_only_rejected_entries_are_retried(monkeypatch):
+    client = MagicMock()
+    client.put_events.side_effect = [
+        {"FailedEntryCount": 1, "Entries": [{"EventId": "a"}, {"ErrorCode": "InternalFailure"}, {"EventId": "c"}]},
+        {"FailedEntryCount": 0, "Entries": [{"EventId": "b"}]},
+    ]
+    monkeypatch.setattr(alert_publisher, "events_client", client)
+    monkeypatch.setattr(alert_publisher.time, "sleep", lambda s: None)
+
+    failed = alert_publisher.publish_alerts([processed(f"DEL-{i}") for i in range(3)], now=1000.0)
+
+    assert failed == 0
+    retried = client.put_events.call_args_list[1].kwargs["Entries"]
+    assert [json.loads(entry["Detail"])["delivery_id"] for entry in retried] == ["DEL-1"]
+
+
+def test_alerts_that_never_went_out_are_not_cooled_down(monkeypatch):
+    client = MagicMock()
+    client.put_events.side_effect = RuntimeError("unavailable")
+    monkeypatch.setattr(alert_publisher, "events_client", client)
+    monkeypatch.setattr(alert_publisher.time, "sleep", lambda s: None)
+
+    assert alert_publisher.publish_alerts([processed("DEL-1")], now=1000.0) == 1
+    assert ("DEL-1", "DELIVERY_DELAY") not in alert_publisher.published_alerts
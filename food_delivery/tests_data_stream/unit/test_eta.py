@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import eta
+import geo
+
+
+NOW = 1_767_225_600.0
+
+
+def arrival(tracks, status="in_transit", dest=(52.40, 4.90)):
+    return float(eta.estimate_arrivals(
+        np.array([52.37]), np.array([4.90]), np.array([dest[0]]), np.array([dest[1]]),
+        np.array([status], dtype=object), tracks, NOW
+    )[0])
+
+
+def straight_track(speed_kmh: float, heading: float, points: int = 5, interval: float = 15.0) -> tuple:
+    #points along a meridian, ending at the delivery position
+    step_deg = speed_kmh * interval / 3600 / 111.195
+    direction = 1 if heading == 0 else -1
+    return tuple(
+        (NOW - (points - 1 - i) * interval, 52.37 - direction * (points - 1 - i) * step_deg, 4.90, speed_kmh, heading)
+        for i in range(points)
+    )
+
+
+def remaining_km():
+    return float(geo.haversine_km(52.37, 4.90, 52.40, 4.90)) * eta.ROAD_FACTOR
+
+
+def test_without_track_the_default_speed_applies():
+    assert arrival([()]) == pytest.approx(NOW + remaining_km() / eta.DEFAULT_SPEED_KMH * 3600)
+
+
+def test_track_ground_speed_drives_the_estimate():
+    assert arrival([straight_track(30.0, 0)]) == pytest.approx(NOW + remaining_km() / 30.0 * 3600, rel=1e-3)
+
+
+def test_heading_away_from_destination_slows_progress():
+    towards = arrival([straight_track(30.0, 0)])
+    away = arrival([straight_track(30.0, 180)])
+
+    assert away - NOW == pytest.approx((towards - NOW) / eta.MIN_HEADING_PROGRESS, rel=1e-3)
+
+
+def test_stale_points_and_finished_deliveries_are_ignored():
+    stale = tuple((t - 2 * eta.TRACK_MAX_AGE_SECONDS, *rest) for t, *rest in straight_track(30.0, 0))
+
+    assert arrival([stale]) == arrival([()])
+    assert arrival([straight_track(30.0, 0)], status="delivered") == NOW
+    assert arrival([()], dest=(np.nan, np.nan)) == NOW
+
+
+def test_estimates_are_vectorized_over_deliveries():
+    tracks = [(), straight_track(30.0, 0), straight_track(30.0, 180)]
+    batch = eta.estimate_arrivals(
+        np.full(3, 52.37), np.full(3, 4.90), np.full(3, 52.40), np.full(3, 4.90),
+        np.array(["in_transit"] * 3, dtype=object), tracks, NOW
+    )
+
+    assert batch.tolist() == pytest.approx([arrival([track]) for track in tracks])
+
+
+def test_recent_tracks_keep_the_newest_points_in_order():
+    tracks = eta.RecentTracks(max_tracks=10, points=3)
+    for t in (1.0, 2.0, 3.0, 2.5, 4.0):
+        tracks.add("RIDER-001", t, 52.37, 4.90)
+
+    assert [point[eta.TIME] for point in tracks.track_for({"rider_id": "RIDER-001"})] == [2.0, 3.0, 4.0]
+
+
+def test_delivery_uses_its_riders_track_when_known():
+    tracks = eta.RecentTracks()
+    tracks.add("RIDER-001", 1.0, 52.37, 4.90)
+    tracks.add("DEL-1", 1.0, 52.00, 4.00)
+
+    assert tracks.track_for({"delivery_id": "DEL-1", "rider_id": "RIDER-001"})[0][eta.LAT] == 52.37
+    assert tracks.track_for({"delivery_id": "DEL-1", "rider_id": "RIDER-404"})[0][eta.LAT] == 52.00
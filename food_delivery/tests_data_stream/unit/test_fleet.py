@@ -0,0 +1,42 @@
+import numpy as np
+
+from fleet import CITY_RADIUS_KM, FleetSimulator
+from geo import haversine_km
+
+
+def test_riders_move_at_vehicle_speed_and_stay_in_their_city():
+    fleet = FleetSimulator(500, seed=7)
+    lat, lng = fleet.lat.copy(), fleet.lng.copy()
+
+    fleet.step(10.0)
+
+    moved_km = haversine_km(lat, lng, fleet.lat, fleet.lng)
+    assert np.all(moved_km <= fleet.speed_kmh * 10 / 3600 + 1e-6)
+    assert np.all(moved_km[fleet.speed_kmh == 0] == 0)
+
+    for _ in range(200):
+        fleet.step(30.0)
+    assert haversine_km(fleet.lat, fleet.lng, fleet.center_lat, fleet.center_lng).max() <= CITY_RADIUS_KM + 0.01
+
+
+def test_pings_match_the_producer_rider_schema():
+    fleet = FleetSimulator(3, seed=1)
+    fleet.step(1.0)
+
+    pings = fleet.pings([0, 2], now=1000.0)
+
+    assert [ping["rider_id"] for ping in pings] == ["RIDER-00000", "RIDER-00002"]
+    assert set(pings[0]) == {"rider_id", "lat", "lng", "city", "speed", "heading", "status", "vehicle_type", "last_updated"}
+    assert pings[0]["last_updated"] == 1000.0
+
+
+def test_advance_to_steps_by_elapsed_wall_clock():
+    fleet = FleetSimulator(50, seed=3)
+    fleet.advance_to(1000.0)
+    lat = fleet.lat.copy()
+
+    fleet.advance_to(1000.0)
+    assert np.array_equal(lat, fleet.lat)
+
+    fleet.advance_to(1060.0)
+    assert not np.array_equal(lat, fleet.lat)
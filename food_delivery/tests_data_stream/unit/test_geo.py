@@ -0,0 +1,77 @@
+import time
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import geo
+
+
+def test_haversine_known_distance():
+    #Amsterdam Centraal to Rotterdam Centraal
+    assert geo.haversine_km(52.3791, 4.9003, 51.9244, 4.4690) == pytest.approx(58.5, abs=0.1)
+
+
+def test_haversine_broadcasts_over_arrays():
+    lats = np.array([52.0, 52.1, 52.2])
+    distances = geo.haversine_km(52.0, 4.9, lats, np.full(3, 4.9))
+
+    assert distances.shape == (3,)
+    assert distances[0] == 0
+    assert distances[2] == pytest.approx(2 * distances[1])
+
+
+def test_geohash_encode_matches_reference_value():
+    assert geo.geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_cells_within_covers_neighbouring_cells():
+    cells = geo.cells_within(52.37, 4.90, 1.0)
+
+    assert geo.geohash_encode(52.37, 4.90) in cells
+    assert len(cells) == 9
+    assert len(geo.cells_within(52.37, 4.90, 10.0)) > 9
+
+
+def test_riders_within_queries_cell_index(riders_table):
+    def put_rider(rider_id, lat, lng, status, age_seconds=10):
+        riders_table.put_item(Item={
+            "rider_id": rider_id,
+            "lat": Decimal(str(lat)),
+            "lng": Decimal(str(lng)),
+            "status": status,
+            "geo_cell": geo.geohash_encode(lat, lng),
+            "last_updated_timestamp": int(time.time()) - age_seconds,
+        })
+
+    put_rider("NEAR", 52.371, 4.901, "available")
+    put_rider("NEAR-BUSY", 52.372, 4.902, "busy")
+    put_rider("NEAR-SILENT", 52.371, 4.902, "available", age_seconds=geo.RIDER_FRESHNESS_SECONDS + 60)
+    put_rider("EDGE", 52.39, 4.90, "available")
+    put_rider("FAR", 51.92, 4.47, "available")
+
+    riders = geo.riders_within(riders_table, 52.37, 4.90, 3.0, status="available")
+
+    assert [rider["rider_id"] for rider in riders] == ["NEAR", "EDGE"]
+    assert riders[0]["distance_km"] < riders[1]["distance_km"] <= 3.0
+
+
+def test_riders_by_city_status_returns_fresh_riders_newest_first(riders_table):
+    now = int(time.time())
+    for rider_id, city, status, age_seconds in [
+        ("AMS-1", "Amsterdam", "available", 30),
+        ("AMS-2", "Amsterdam", "available", 5),
+        ("AMS-STALE", "Amsterdam", "available", 3600),
+        ("AMS-BUSY", "Amsterdam", "busy", 5),
+        ("RTM-1", "Rotterdam", "available", 5),
+    ]:
+        riders_table.put_item(Item={
+            "rider_id": rider_id,
+            "city_status": geo.city_status_key(city, status),
+            "last_updated_timestamp": now - age_seconds,
+        })
+
+    riders = geo.riders_by_city_status(riders_table, "Amsterdam", "available", max_age_seconds=300)
+
+    assert [rider["rider_id"] for rider in riders] == ["AMS-2", "AMS-1"]
+    assert [r["rider_id"] for r in geo.riders_by_city_status(riders_table, "Amsterdam", "available", limit=1)] == ["AMS-2"]
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+import geofence
+import location_analytics
+from fleet import CITY_CENTERS
+
+
+SQUARE = [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]
+HOLE = [[0.4, 0.4], [0.4, 0.6], [0.6, 0.6], [0.6, 0.4], [0.4, 0.4]]
+
+
+@pytest.fixture
+def zones_file(tmp_path):
+    path = tmp_path / "zones.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"zone": "Zone-A"},
+         "geometry": {"type": "Polygon", "coordinates": [SQUARE, HOLE]}},
+        {"type": "Feature", "properties": {"zone": "Zone-B"},
+         "geometry": {"type": "MultiPolygon", "coordinates": [
+             [[[1.0, 0.0], [2.0, 0.0], [2.0, 1.0], [1.0, 1.0]]],
+             [[[3.0, 0.0], [3.5, 0.0], [3.5, 0.5], [3.0, 0.0]]],
+         ]}},
+    ]}))
+    return str(path)
+
+
+def test_zone_at_handles_holes_multipolygons_and_outside_points(zones_file):
+    index = geofence.load_zone_index(zones_file, cell_degrees=0.1)
+
+    #(lat, lng) of a point in the interior, the hole, the second zone's parts and outside
+    assert index.zone_at(0.2, 0.2) == "Zone-A"
+    assert index.zone_at(0.5, 0.5) is None
+    assert index.zone_at(0.5, 1.5) == "Zone-B"
+    assert index.zone_at(0.1, 3.3) == "Zone-B"
+    assert index.zone_at(0.4, 3.1, default="Zone-Other") == "Zone-Other"
+    assert index.zone_at(5.0, 5.0) is None
+    assert index.zone_at(float("nan"), 0.5) is None
+
+
+def test_grid_lookup_matches_exact_polygon_test(zones_file):
+    index = geofence.load_zone_index(zones_file, cell_degrees=0.07)
+    rng = np.random.default_rng(3)
+    lats, lngs = rng.uniform(-0.5, 1.5, 5000), rng.uniform(-0.5, 4.0, 5000)
+
+    exact = np.full(lats.size, None, dtype=object)
+    for zone_index, name in enumerate(index.names):
+        inside = geofence.rings_contain(index.rings[zone_index], lngs, lats) & (exact == None)
+        exact[inside] = name
+
+    assert index.zones_at(lats, lngs).tolist() == exact.tolist()
+    assert [index.zone_at(lat, lng) for lat, lng in zip(lats.tolist(), lngs.tolist())] == exact.tolist()
+
+
+def test_bundled_zones_cover_every_city_centre():
+    zones = location_analytics.zone_index
+    assert [zones.zone_at(lat, lng) for lat, lng in CITY_CENTERS.values()] == [
+        location_analytics.ZONE_MAPPING[city] for city in CITY_CENTERS
+    ]
+
+
+def test_tracker_raises_exit_and_entry_between_consecutive_pings():
+    tracker = geofence.ZoneTracker(10)
+
+    assert tracker.update("R1", "Zone-A", 100.0) == []
+    assert tracker.update("R1", "Zone-A", 110.0) == []
+    assert tracker.update("R1", "Zone-B", 120.0) == [
+        {"type": "ZONE_EXIT", "rider_id": "R1", "zone": "Zone-A", "timestamp": 120.0},
+        {"type": "ZONE_ENTER", "rider_id": "R1", "zone": "Zone-B", "timestamp": 120.0},
+    ]
+    assert tracker.update("R1", None, 130.0) == [
+        {"type": "ZONE_EXIT", "rider_id": "R1", "zone": "Zone-B", "timestamp": 130.0},
+    ]
+
+
+def test_tracker_ignores_replayed_pings():
+    tracker = geofence.ZoneTracker(10)
+    tracker.update("R1", "Zone-A", 100.0)
+    tracker.update("R1", "Zone-B", 120.0)
+
+    assert tracker.update("R1", "Zone-A", 100.0) == []
+    assert tracker.update("R1", "Zone-B", 120.0) == []
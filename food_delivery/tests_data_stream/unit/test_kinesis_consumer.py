@@ -0,0 +1,337 @@
+import json
+from decimal import Decimal
+
+import alert_publisher
+import kinesis_consumer
+import trail_store
+from conftest import make_kinesis_record, make_rider_ping
+
+
+def test_batch_coalesces_to_latest_position_per_rider(riders_table, lambda_context, monkeypatch):
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.32, 4.92, 1002.0), 2),
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.31, 4.91, 1001.0), 3),
+        make_kinesis_record(make_rider_ping("RIDER-002", 51.92, 4.47, 1000.0), 4),
+    ]}
+
+    calls = []
+    original = kinesis_consumer.dynamodb_client.update_item
+    monkeypatch.setattr(kinesis_consumer.dynamodb_client, "update_item", lambda **kw: calls.append(kw) or original(**kw))
+
+    kinesis_consumer.lambda_handler(event, lambda_context)
+
+    assert sorted(call["Key"]["rider_id"]["S"] for call in calls) == ["RIDER-001", "RIDER-002"]
+    item = riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]
+    assert item["lat"] == Decimal("52.32")
+    assert item["last_updated"] == Decimal("1002.0")
+
+
+def test_stage_rider_position_breaks_timestamp_ties_on_sequence_number():
+    updates = {}
+    kinesis_consumer.stage_rider_position(updates, {"rider_id": "R", "lat": 1, "last_updated": 5.0}, "20")
+    kinesis_consumer.stage_rider_position(updates, {"rider_id": "R", "lat": 2, "last_updated": 5.0}, "10")
+    kinesis_consumer.stage_rider_position(updates, {"rider_id": "R", "lat": 3, "last_updated": 5.0}, "30")
+
+    assert updates["R"][1]["lat"] == 3
+
+
+def test_rider_item_is_indexed_by_city_status_and_expires_only_when_offline():
+    available = kinesis_consumer.build_rider_item(make_rider_ping("RIDER-001", 52.37, 4.90, 1000.0)["data"])
+    offline = kinesis_consumer.build_rider_item(make_rider_ping("RIDER-001", 52.37, 4.90, 1000.0, status="offline")["data"])
+
+    assert available["city_status"] == "Amsterdam#available"
+    assert "expires_at" not in available
+    assert offline["city_status"] == "Amsterdam#offline"
+    assert offline["expires_at"] == offline["last_updated_timestamp"] + kinesis_consumer.OFFLINE_POSITION_TTL_SECONDS
+
+
+def test_older_position_does_not_overwrite_newer_one(riders_table):
+    newer = kinesis_consumer.build_rider_item(make_rider_ping("RIDER-001", 52.32, 4.92, 2000.0)["data"])
+    older = kinesis_consumer.build_rider_item(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0)["data"])
+
+    assert kinesis_consumer.write_rider_position(newer) == "written"
+    kinesis_consumer.newest_positions.clear()
+    assert kinesis_consumer.write_rider_position(older) == "stale"
+
+    item = riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]
+    assert item["lat"] == Decimal("52.32")
+    assert kinesis_consumer.newest_positions.get("RIDER-001") == 2000.0
+
+
+def test_position_replaces_a_row_written_without_last_updated(riders_table):
+    riders_table.put_item(Item={"rider_id": "RIDER-001", "lat": Decimal("52.30"), "lng": Decimal("4.90"), "status": "available"})
+    ping = kinesis_consumer.build_rider_item(make_rider_ping("RIDER-001", 52.32, 4.92, 1000.0)["data"])
+
+    assert kinesis_consumer.write_rider_position(ping) == "written"
+    item = riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]
+    assert (item["lat"], item["last_updated"]) == (Decimal("52.32"), Decimal("1000.0"))
+
+
+def test_position_updates_keep_the_dispatch_claim_until_the_hold_has_passed(riders_table):
+    write = lambda last_updated, **overrides: kinesis_consumer.write_rider_position(
+        kinesis_consumer.build_rider_item(make_rider_ping("RIDER-001", 52.30, 4.90, last_updated, **overrides)["data"])
+    )
+    write(1000.0, status="offline")
+    riders_table.update_item(
+        Key={"rider_id": "RIDER-001"},
+        UpdateExpression="SET #s = :busy, city_status = :cs, assigned_order_id = :o, assigned_at = :at",
+        ExpressionAttributeNames={"#s": "status"},
+        ExpressionAttributeValues={":busy": "busy", ":cs": "Amsterdam#busy", ":o": "ORD-1", ":at": Decimal("1001")},
+    )
+
+    #sent before the app heard of the assignment: the rider moves but stays claimed
+    assert write(1010.0) == "written"
+    held = riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]
+    assert (held["status"], held["assigned_order_id"], held["lat"]) == ("busy", "ORD-1", Decimal("52.3"))
+
+    assert write(1001.0 + kinesis_consumer.ASSIGNMENT_HOLD_SECONDS + 1) == "written"
+    released = riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]
+    assert released["city_status"] == "Amsterdam#available"
+    assert not {"assigned_order_id", "assigned_at", "expires_at"} & set(released)
+
+
+def test_handler_skips_write_when_cache_holds_newer_position(riders_table, lambda_context, monkeypatch):
+    kinesis_consumer.newest_positions.put("RIDER-001", 2000.0)
+    calls = []
+    monkeypatch.setattr(kinesis_consumer.dynamodb_client, "update_item", lambda **kw: calls.append(kw))
+
+    result = kinesis_consumer.lambda_handler({"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1500.0), 1),
+    ]}, lambda_context)
+
+    assert result == {"batchItemFailures": []}
+    assert calls == []
+
+
+def test_process_rider_groups_reports_riders_whose_put_failed(riders_table, monkeypatch):
+    original = kinesis_consumer.dynamodb_client.update_item
+
+    def update_item(**kwargs):
+        if kwargs["Key"]["rider_id"] == {"S": "RIDER-002"}:
+            raise RuntimeError("throttled")
+        return original(**kwargs)
+
+    monkeypatch.setattr(kinesis_consumer.dynamodb_client, "update_item", update_item)
+    positions = [make_rider_ping(rider_id, 52.30, 4.90, 1000.0)["data"] for rider_id in ("RIDER-001", "RIDER-002")]
+
+    assert kinesis_consumer.process_rider_groups(positions, {}) == [
+        ("RIDER-001", "written", None),
+        ("RIDER-002", "failed", None),
+    ]
+
+
+def test_process_rider_groups_writes_position_before_trail_per_rider(monkeypatch):
+    calls = []
+    monkeypatch.setattr(kinesis_consumer, "write_rider_position",
+                        lambda item: calls.append(("position", item["rider_id"])) or "written")
+    monkeypatch.setattr(kinesis_consumer, "append_rider_trail",
+                        lambda rider_id, trail: calls.append(("trail", rider_id)) or True)
+    positions = [make_rider_ping(rider_id, 52.30, 4.90, 1000.0)["data"] for rider_id in ("RIDER-001", "RIDER-002")]
+    trails = {rider_id: [("1", positions[0])] for rider_id in ("RIDER-002", "RIDER-003")}
+
+    results = kinesis_consumer.process_rider_groups(positions, trails)
+
+    assert results == [
+        ("RIDER-001", "written", None),
+        ("RIDER-002", "written", True),
+        ("RIDER-003", None, True),
+    ]
+    assert calls.index(("position", "RIDER-002")) < calls.index(("trail", "RIDER-002"))
+
+
+def test_handler_reports_first_poison_record(riders_table, lambda_context):
+    poison = make_kinesis_record({"event_id": "broken"}, 2)
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1),
+        poison,
+        make_kinesis_record(make_rider_ping("RIDER-002", 51.92, 4.47, 1000.0), 3),
+    ]}
+
+    result = kinesis_consumer.lambda_handler(event, lambda_context)
+
+    assert result == {"batchItemFailures": [{"itemIdentifier": "2"}]}
+    assert "Item" in riders_table.get_item(Key={"rider_id": "RIDER-001"})
+    assert "Item" not in riders_table.get_item(Key={"rider_id": "RIDER-002"})
+
+
+def test_handler_reports_earliest_rider_whose_write_failed(lambda_context, monkeypatch):
+    monkeypatch.setattr(kinesis_consumer, "write_rider_position",
+                        lambda item: "failed" if item["rider_id"] in ("RIDER-002", "RIDER-003") else "written")
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-002", 52.31, 4.91, 1000.0), 2),
+        make_kinesis_record(make_rider_ping("RIDER-003", 52.32, 4.92, 1000.0), 3),
+    ]}
+
+    result = kinesis_consumer.lambda_handler(event, lambda_context)
+
+    assert result == {"batchItemFailures": [{"itemIdentifier": "2"}]}
+
+
+def test_handler_reports_no_failures_for_clean_batch(riders_table, lambda_context):
+    event = {"Records": [make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1)]}
+
+    assert kinesis_consumer.lambda_handler(event, lambda_context) == {"batchItemFailures": []}
+
+
+def test_handler_rejects_delivery_missing_fields(riders_table, lambda_context):
+    incomplete = {"event_id": "evt-1", "timestamp": "t", "data": {"delivery_id": "DEL-1", "status": "in_transit"}}
+    event = {"Records": [make_kinesis_record(incomplete, 7)]}
+
+    assert kinesis_consumer.lambda_handler(event, lambda_context) == {"batchItemFailures": [{"itemIdentifier": "7"}]}
+
+
+def test_handler_unpacks_aggregated_record(riders_table, lambda_context):
+    aggregate = {"aggregated": True, "records": [
+        make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0),
+        make_rider_ping("RIDER-001", 52.31, 4.91, 1000.0),
+        make_rider_ping("RIDER-002", 51.92, 4.47, 1000.0),
+    ]}
+
+    result = kinesis_consumer.lambda_handler({"Records": [make_kinesis_record(aggregate, 1)]}, lambda_context)
+
+    assert result == {"batchItemFailures": []}
+    assert riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]["lat"] == Decimal("52.31")
+    assert "Item" in riders_table.get_item(Key={"rider_id": "RIDER-002"})
+
+
+def test_handler_skips_write_for_stationary_rider(riders_table, lambda_context, monkeypatch):
+    kinesis_consumer.lambda_handler({"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1),
+    ]}, lambda_context)
+
+    calls = []
+    monkeypatch.setattr(kinesis_consumer.dynamodb_client, "update_item", lambda **kw: calls.append(kw))
+    result = kinesis_consumer.lambda_handler({"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30001, 4.90, 1005.0), 2),
+    ]}, lambda_context)
+
+    assert result == {"batchItemFailures": []}
+    assert calls == []
+
+
+def test_handler_appends_every_ping_to_the_trail(riders_table, trails_table, lambda_context, monkeypatch):
+    monkeypatch.setattr(kinesis_consumer, "TRAIL_TABLE_NAME", trails_table.name)
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.31, 4.91, 1010.0), 2),
+    ]}
+
+    assert kinesis_consumer.lambda_handler(event, lambda_context) == {"batchItemFailures": []}
+
+    trail = trail_store.get_trail(trails_table, "RIDER-001", 0, 2000)
+    assert trail["timestamp"].tolist() == [1000.0, 1010.0]
+
+
+def test_handler_carries_window_state_and_flushes_on_final_invoke(zone_windows_table, lambda_context, monkeypatch):
+    monkeypatch.setattr(kinesis_consumer, "ZONE_WINDOWS_TABLE_NAME", zone_windows_table.name)
+    window = {"start": "2026-01-01T12:00:00Z", "end": "2026-01-01T12:01:00Z"}
+    delivery = {"event_id": "evt-1", "timestamp": "t", "data": {
+        "delivery_id": "DEL-1", "order_id": "ORD-1", "status": "delayed",
+        "location": {"latitude": 52.37, "longitude": 4.90, "city": "Amsterdam"},
+        "estimated_delivery_time": 0,
+    }}
+
+    result = kinesis_consumer.lambda_handler({
+        "Records": [make_kinesis_record(delivery, 1)], "window": window, "state": {}, "shardId": "shardId-000",
+        "isFinalInvokeForWindow": False,
+    }, lambda_context)
+
+    assert result["batchItemFailures"] == []
+    assert kinesis_consumer.summarize_window(result["state"])[0]["active_deliveries_estimate"] == 1
+    assert zone_windows_table.scan()["Items"] == []
+
+    result = kinesis_consumer.lambda_handler({
+        "Records": [], "window": window, "state": result["state"], "shardId": "shardId-000",
+        "isFinalInvokeForWindow": True,
+    }, lambda_context)
+
+    assert result == {"batchItemFailures": [], "state": {}}
+    item = zone_windows_table.get_item(Key={"zone": "Zone-West", "window_shard": "2026-01-01T12:00:00Z#shardId-000"})["Item"]
+    assert item["active_deliveries_estimate"] == 1
+    assert item["delayed_readings"] == 1
+
+
+def test_handler_publishes_zone_transitions_between_pings(riders_table, lambda_context, monkeypatch):
+    published = []
+    monkeypatch.setattr(kinesis_consumer, "EVENT_BUS_NAME", "DeliveryAlertsBus")
+    monkeypatch.setattr(kinesis_consumer, "publish_zone_transitions", lambda transitions: published.extend(transitions))
+    #Amsterdam, then Utrecht
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.37, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.09, 5.12, 1900.0), 2),
+    ]}
+
+    assert kinesis_consumer.lambda_handler(event, lambda_context) == {"batchItemFailures": []}
+    assert [(transition["type"], transition["zone"]) for transition in published] == [
+        ("ZONE_EXIT", "Zone-West"), ("ZONE_ENTER", "Zone-Central"),
+    ]
+
+
+def test_handler_succeeds_when_eventbridge_rejects_the_publish(riders_table, lambda_context, capsys, monkeypatch):
+    def put_events(**kwargs):
+        raise RuntimeError("EventBridge unavailable")
+    monkeypatch.setattr(kinesis_consumer, "EVENT_BUS_NAME", "DeliveryAlertsBus")
+    monkeypatch.setattr(alert_publisher.events_client, "put_events", put_events)
+    monkeypatch.setattr(alert_publisher.time, "sleep", lambda seconds: None)
+    #Amsterdam, then Utrecht
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.37, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.09, 5.12, 1900.0), 2),
+    ]}
+
+    assert kinesis_consumer.lambda_handler(event, lambda_context) == {"batchItemFailures": []}
+    assert riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]["last_updated"] == Decimal("1900.0")
+    assert metric_documents(capsys)["rider_ping"]["PublishFailures"] == [2.0]
+
+
+def test_handler_succeeds_when_a_publish_raises(riders_table, lambda_context, capsys, monkeypatch):
+    def publish_zone_transitions(transitions):
+        raise ValueError("malformed transition")
+    monkeypatch.setattr(kinesis_consumer, "EVENT_BUS_NAME", "DeliveryAlertsBus")
+    monkeypatch.setattr(kinesis_consumer, "publish_zone_transitions", publish_zone_transitions)
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.37, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.09, 5.12, 1900.0), 2),
+    ]}
+
+    assert kinesis_consumer.lambda_handler(event, lambda_context) == {"batchItemFailures": []}
+    assert metric_documents(capsys)["rider_ping"]["PublishFailures"] == [2.0]
+
+
+def metric_documents(capsys) -> dict:
+    documents = {}
+    for line in capsys.readouterr().out.splitlines():
+        document = json.loads(line) if line.startswith("{") else {}
+        if "_aws" in document:
+            documents[document["record_type"]] = document
+    return documents
+
+
+def test_handler_emits_stage_metrics_once_per_record_type(riders_table, lambda_context, capsys, monkeypatch):
+    monkeypatch.setattr(kinesis_consumer.time, "time", lambda: 1700000002.5)
+    delivery = {"event_id": "evt-1", "timestamp": "t", "data": {
+        "delivery_id": "DEL-1", "order_id": "ORD-1", "status": "in_transit",
+        "location": {"latitude": 52.37, "longitude": 4.90, "city": "Amsterdam"},
+    }}
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.30, 4.90, 1000.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-002", 52.31, 4.91, 1000.0), 2),
+        make_kinesis_record(delivery, 3),
+    ]}
+
+    kinesis_consumer.lambda_handler(event, lambda_context)
+
+    documents = metric_documents(capsys)
+    assert sorted(documents) == ["all", "delivery", "rider_ping"]
+    for record_type, document in documents.items():
+        assert document["shard"] == "shardId-000000000000"
+        assert document["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["shard", "record_type"]]
+
+    assert {"DecodeTime", "BatchTime"} <= documents["all"].keys()
+    assert documents["rider_ping"]["Records"] == [2.0]
+    assert documents["rider_ping"]["DynamoDBWriteTime"][0] > 0
+    assert documents["delivery"]["Records"] == [1.0]
+    assert "AnalyticsTime" in documents["delivery"]
+    assert documents["delivery"]["ProcessingLag"] == [2500.0]
@@ -0,0 +1,129 @@
+import json
+import base64
+from unittest.mock import MagicMock
+
+import kinesis_consumer
+import kinesis_producer
+from location_analytics import ZONE_MAPPING, zone_index
+from conftest import make_rider_ping
+
+
+def test_put_records_batched_retries_only_rejected_entries(monkeypatch):
+    client = MagicMock()
+    client.put_records.side_effect = [
+        {"FailedRecordCount": 1, "Records": [{"SequenceNumber": "1"}, {"ErrorCode": "ProvisionedThroughputExceededException"}]},
+        {"FailedRecordCount": 0, "Records": [{"SequenceNumber": "2"}]},
+    ]
+    monkeypatch.setattr(kinesis_producer, "kinesis_client", client)
+    monkeypatch.setattr(kinesis_producer.time, "sleep", lambda s: None)
+    entries = [{"Data": b"a", "PartitionKey": "R1"}, {"Data": b"b", "PartitionKey": "R2"}]
+
+    assert kinesis_producer.put_records_batched(entries) == []
+    assert client.put_records.call_args_list[1].kwargs["Records"] == [entries[1]]
+
+
+def test_riders_whose_pings_failed_to_send_are_not_suppressed_next_time(monkeypatch, lambda_context):
+    client = MagicMock()
+    client.put_records.side_effect = lambda StreamName, Records: {
+        "FailedRecordCount": sum(entry["PartitionKey"] == "RIDER-2" for entry in Records),
+        "Records": [{"ErrorCode": "InternalFailure"} if entry["PartitionKey"] == "RIDER-2" else {} for entry in Records],
+    }
+    monkeypatch.setattr(kinesis_producer, "kinesis_client", client)
+    monkeypatch.setattr(kinesis_producer.time, "sleep", lambda s: None)
+    body = json.dumps({"location_batch": [make_rider_ping(f"RIDER-{i}", 52.37, 4.90, 1000.0)["data"] for i in (1, 2)]})
+
+    first = json.loads(kinesis_producer.lambda_handler({"body": body}, lambda_context)["body"])
+    second = json.loads(kinesis_producer.lambda_handler({"body": body}, lambda_context)["body"])
+
+    assert first["failed_count"] == 1
+    #RIDER-1 got through and has not moved, RIDER-2 is sent again
+    assert (second["ping_count"], second["suppressed_count"]) == (1, 1)
+    assert client.put_records.call_args.kwargs["Records"][0]["PartitionKey"] == "RIDER-2"
+
+
+def test_riders_are_not_suppressed_after_put_records_raises(monkeypatch, lambda_context):
+    client = MagicMock()
+    client.put_records.side_effect = [RuntimeError("Kinesis unavailable"), {"FailedRecordCount": 0, "Records": [{}, {}]}]
+    monkeypatch.setattr(kinesis_producer, "kinesis_client", client)
+    body = json.dumps({"location_batch": [make_rider_ping(f"RIDER-{i}", 52.37, 4.90, 1000.0)["data"] for i in (1, 2)]})
+
+    assert kinesis_producer.lambda_handler({"body": body}, lambda_context)["statusCode"] == 500
+    second = json.loads(kinesis_producer.lambda_handler({"body": body}, lambda_context)["body"])
+
+    assert (second["ping_count"], second["suppressed_count"]) == (2, 0)
+
+
+def test_chunk_entries_respects_put_records_limits(monkeypatch):
+    entries = [{"Data": b"x", "PartitionKey": "p"} for _ in range(1201)]
+    assert [len(chunk) for chunk in kinesis_producer.chunk_entries(entries)] == [500, 500, 201]
+
+    monkeypatch.setattr(kinesis_producer, "PUT_RECORDS_MAX_BYTES", 10)
+    big = [{"Data": b"12345678", "PartitionKey": "p"} for _ in range(3)]
+    assert [len(chunk) for chunk in kinesis_producer.chunk_entries(big)] == [1, 1, 1]
+
+
+def test_aggregated_records_round_trip_through_consumer(monkeypatch):
+    monkeypatch.setattr(kinesis_producer, "AGGREGATE_MAX_BYTES", 1024)
+    monkeypatch.setattr(kinesis_producer, "AGGREGATION_BUCKETS", 4)
+    pings = [make_rider_ping(f"RIDER-{i:03d}", 52.37, 4.90, 1000.0 + i)["data"] for i in range(40)]
+    records = [kinesis_producer.build_kinesis_record(ping, False) for ping in pings]
+
+    entries = kinesis_producer.aggregate_entries(records)
+
+    assert len(entries) < len(records)
+    assert {entry["PartitionKey"] for entry in entries} <= {f"agg-{bucket}" for bucket in range(4)}
+    assert all(len(entry["Data"]) <= 1024 for entry in entries)
+
+    decoded = []
+    for entry in entries:
+        kinesis_data = {"data": base64.b64encode(entry["Data"]).decode("utf-8")}
+        decoded.extend(kinesis_consumer.decode_records(kinesis_data))
+
+    assert sorted(r["event_id"] for r in decoded) == sorted(r["event_id"] for r in records)
+
+
+def test_handler_sends_location_batch(monkeypatch, lambda_context):
+    client = MagicMock()
+    client.put_records.return_value = {"FailedRecordCount": 0, "Records": []}
+    monkeypatch.setattr(kinesis_producer, "kinesis_client", client)
+    pings = [make_rider_ping(f"RIDER-{i}", 52.37, 4.90, 1000.0)["data"] for i in range(3)]
+
+    result = kinesis_producer.lambda_handler({"body": json.dumps({"location_batch": pings})}, lambda_context)
+
+    assert result["statusCode"] == 200
+    assert json.loads(result["body"])["kinesis_record_count"] == 3
+    assert client.put_records.call_count == 1
+
+
+def test_simulator_batch_samples_distinct_fleet_riders(monkeypatch, lambda_context):
+    client = MagicMock()
+    client.put_records.return_value = {"FailedRecordCount": 0, "Records": []}
+    monkeypatch.setattr(kinesis_producer, "kinesis_client", client)
+
+    result = kinesis_producer.lambda_handler({"simulator": True, "count": 25}, lambda_context)
+
+    assert json.loads(result["body"])["ping_count"] == 25
+    sent = client.put_records.call_args.kwargs["Records"]
+    assert len({entry["PartitionKey"] for entry in sent}) == 25
+
+
+def test_binary_encoding_round_trips_through_consumer(monkeypatch):
+    monkeypatch.setattr(kinesis_producer, "RECORD_ENCODING", "binary")
+    pings = [make_rider_ping(f"RIDER-{i:03d}", 52.37, 4.90, 1000.0 + i)["data"] for i in range(10)]
+    records = [kinesis_producer.build_kinesis_record(ping, False) for ping in pings]
+
+    entries = kinesis_producer.aggregate_entries(records)
+
+    decoded = []
+    for entry in entries:
+        assert entry["Data"][:1] == b"\xb1"
+        decoded.extend(kinesis_consumer.decode_records({"data": base64.b64encode(entry["Data"]).decode("utf-8")}))
+    assert sorted(decoded, key=lambda r: r["event_id"]) == sorted(records, key=lambda r: r["event_id"])
+
+
+def test_generated_locations_fall_in_their_city_zone():
+    for _ in range(200):
+        ping = kinesis_producer.generate_vehicle_location_data()
+        delivery = kinesis_producer.generate_sample_location_data()["location"]
+        assert zone_index.zone_at(ping["lat"], ping["lng"]) == ZONE_MAPPING[ping["city"]]
+        assert zone_index.zone_at(delivery["latitude"], delivery["longitude"]) == ZONE_MAPPING[delivery["city"]]
@@ -0,0 +1,61 @@
+import time
+import pytest
+
+import kinesis_consumer
+import location_analytics
+
+
+def make_delivery(i: int, status: str, estimated_delivery_time: float, city: str) -> dict:
+    return {
+        "timestamp": "2026-01-01T12:00:00",
+        "event_id": f"evt-{i}",
+        "data": {
+            "delivery_id": f"DEL-{i}",
+            "order_id": f"ORD-{i}",
+            "status": status,
+            "location": {"latitude": 52.37, "longitude": 4.90, "city": city},
+            "destination": {"latitude": 52.37 + 0.02 * (i % 7), "longitude": 4.90},
+            "estimated_delivery_time": estimated_delivery_time,
+        },
+    }
+
+
+@pytest.mark.freeze_time("2026-01-01 12:00:00")
+def test_batch_analytics_matches_reference_implementation():
+    now = time.time()
+    statuses = ["picked_up", "in_transit", "delivered", "delayed"]
+    cities = ["Amsterdam", "Rotterdam", "The Hague", "Utrecht", "Eindhoven", "Delft"]
+    offsets = [-3600, -61, -59, 0, 59, 600]
+    #cycle lengths are coprime so every status/city/offset/destination combination appears
+    records = [
+        make_delivery(i, statuses[i % 4], now + offsets[i % 6], cities[i % 6])
+        for i in range(4 * 6 * 7)
+    ]
+
+    batch = location_analytics.analyze_delivery_batch(records, now)
+    reference = [kinesis_consumer.process_delivery_location(record) for record in records]
+
+    assert batch == reference
+
+
+def test_empty_batch_returns_no_records():
+    assert location_analytics.analyze_delivery_batch([], time.time()) == []
+
+
+@pytest.mark.freeze_time("2026-01-01 12:00:00")
+def test_batch_analytics_matches_reference_with_rider_tracks():
+    now = time.time()
+    records = [make_delivery(i, "in_transit", now + 900, "Amsterdam") for i in range(12)]
+    for i, record in enumerate(records):
+        record["data"]["rider_id"] = f"RIDER-{i % 4}"
+    #riders 0 and 1 ride north at different speeds, 2 rides south, 3 has no track
+    for rider, (step, heading) in enumerate([(0.001, 0), (0.004, 0), (-0.002, 180)]):
+        for k in range(4):
+            kinesis_consumer.recent_tracks.add(f"RIDER-{rider}", now - 45 + 15 * k, 52.37 + step * (k - 3), 4.90, 20.0, heading)
+
+    tracks = [kinesis_consumer.recent_tracks.track_for(record["data"]) for record in records]
+    batch = location_analytics.analyze_delivery_batch(records, now, tracks)
+    reference = [kinesis_consumer.process_delivery_location(record) for record in records]
+
+    assert batch == reference
+    assert len({record["analytics"]["estimated_arrival"] for record in batch}) > 4
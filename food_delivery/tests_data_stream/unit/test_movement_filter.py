@@ -0,0 +1,50 @@
+from lru import LRUCache
+from movement_filter import MovementFilter, heading_change
+
+
+def ping(lat, lng, last_updated, heading=90, status="available"):
+    return {"rider_id": "RIDER-001", "lat": lat, "lng": lng, "heading": heading,
+            "status": status, "last_updated": last_updated}
+
+
+def test_stationary_pings_are_suppressed_until_keepalive():
+    movement_filter = MovementFilter(min_movement_m=25, min_heading_change=30, keepalive_seconds=60)
+
+    assert movement_filter.accept(ping(52.37, 4.90, 1000.0))
+    assert not movement_filter.accept(ping(52.37001, 4.90, 1010.0))
+    assert not movement_filter.accept(ping(52.37, 4.90001, 1059.0))
+    assert movement_filter.accept(ping(52.37, 4.90, 1060.0))
+
+
+def test_movement_heading_and_status_changes_pass():
+    movement_filter = MovementFilter(min_movement_m=25, min_heading_change=30, keepalive_seconds=60)
+    movement_filter.accept(ping(52.37, 4.90, 1000.0))
+
+    assert movement_filter.accept(ping(52.3705, 4.90, 1001.0))
+    assert movement_filter.accept(ping(52.3705, 4.90, 1002.0, heading=130))
+    assert movement_filter.accept(ping(52.3705, 4.90, 1003.0, heading=130, status="busy"))
+    assert not movement_filter.accept(ping(52.3705, 4.90, 1004.0, heading=140, status="busy"))
+
+
+def test_older_pings_never_replace_the_reference():
+    movement_filter = MovementFilter()
+    movement_filter.accept(ping(52.37, 4.90, 1000.0))
+
+    assert not movement_filter.accept(ping(52.40, 4.95, 900.0))
+
+
+def test_heading_change_wraps_around_north():
+    assert heading_change(350, 10) == 20
+    assert heading_change(10, 350) == 20
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
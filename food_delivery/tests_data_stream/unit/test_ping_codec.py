@@ -0,0 +1,54 @@
+import json
+import uuid
+
+import ping_codec
+from conftest import make_rider_ping
+
+
+def make_record(**overrides) -> dict:
+    record = make_rider_ping("RIDER-00042", 52.370123, 4.901234, 1767225600.125, speed=18.4, heading=271)
+    record.update(event_id=str(uuid.uuid4()), timestamp="2026-01-01T12:00:00.123456", source="eventbridge_simulator")
+    record["data"].update(overrides)
+    return record
+
+
+def test_rider_ping_round_trips_in_a_fraction_of_the_json_size():
+    record = make_record()
+
+    encoded = ping_codec.encode_record(record)
+
+    assert ping_codec.content_type(encoded) == ping_codec.BINARY_CONTENT_TYPE
+    assert len(encoded) < len(json.dumps(record)) / 3
+    assert ping_codec.decode_payload(encoded) == [record]
+
+
+def test_records_outside_the_fixed_layout_stay_json():
+    delivery = {"event_id": "evt-1", "timestamp": "t", "source": "food_delivery_service",
+                "data": {"delivery_id": "DEL-1"}}
+
+    for record in (delivery, make_record(status="on_break"), make_record(speed=-1.0)):
+        encoded = ping_codec.encode_record(record)
+        assert ping_codec.content_type(encoded) == ping_codec.JSON_CONTENT_TYPE
+        assert ping_codec.decode_payload(encoded) == [record]
+
+
+def test_aggregate_carries_binary_and_json_records():
+    records = [make_record(), make_record(status="on_break"), make_record(rider_id="RIDER-7")]
+
+    encoded = ping_codec.encode_aggregate([ping_codec.encode_record(record) for record in records])
+
+    assert ping_codec.decode_payload(encoded) == records
+
+
+def test_legacy_json_aggregate_is_still_accepted():
+    records = [make_record(), make_record()]
+    payload = json.dumps({"aggregated": True, "records": records}).encode("utf-8")
+
+    assert ping_codec.decode_payload(payload) == records
+
+
+def test_timestamps_without_microseconds_keep_isoformat_text():
+    record = make_record()
+    record["timestamp"] = "2026-01-01T12:00:00"
+
+    assert ping_codec.decode_payload(ping_codec.encode_record(record)) == [record]
@@ -0,0 +1,130 @@
+import time
+from decimal import Decimal
+
+import boto3
+import pytest
+
+import geo
+import rider_dispatch
+
+
+def test_assign_riders_prefers_nearest_and_uses_each_rider_once():
+    orders = [
+        {"orderId": "A", "lat": 52.3700, "lng": 4.9000},
+        {"orderId": "B", "lat": 52.3710, "lng": 4.9000},
+    ]
+    riders = [
+        {"rider_id": "R1", "lat": 52.3705, "lng": 4.9000},
+        {"rider_id": "R2", "lat": 52.3800, "lng": 4.9000},
+        {"rider_id": "R3", "lat": 52.9000, "lng": 4.9000},
+    ]
+
+    assignments, unassigned = rider_dispatch.assign_riders(orders, riders, radius_km=3.0)
+
+    assert {a["orderId"]: a["rider_id"] for a in assignments} == {"A": "R1", "B": "R2"}
+    assert unassigned == []
+
+
+def test_assign_riders_leaves_orders_without_riders_in_range():
+    orders = [{"orderId": "A", "lat": 52.37, "lng": 4.90}]
+    riders = [{"rider_id": "R1", "lat": 51.92, "lng": 4.47}]
+
+    assignments, unassigned = rider_dispatch.assign_riders(orders, riders, radius_km=5.0)
+
+    assert assignments == []
+    assert unassigned == orders
+
+
+def test_assign_riders_retries_orders_whose_candidates_were_taken():
+    orders = [{"orderId": f"O{i}", "lat": 52.37, "lng": 4.90 + i * 1e-5} for i in range(3)]
+    riders = [{"rider_id": f"R{i}", "lat": 52.37 + i * 0.001, "lng": 4.90} for i in range(3)]
+
+    assignments, unassigned = rider_dispatch.assign_riders(orders, riders, radius_km=3.0, max_candidates=1)
+
+    assert len(assignments) == 3
+    assert len({a["rider_id"] for a in assignments}) == 3
+
+
+@pytest.fixture
+def orders_table(riders_table):
+    table = boto3.resource("dynamodb").create_table(
+        TableName="UserOrdersTable",
+        KeySchema=[
+            {"AttributeName": "userId", "KeyType": "HASH"},
+            {"AttributeName": "orderId", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "userId", "AttributeType": "S"},
+            {"AttributeName": "orderId", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    yield table
+
+
+def test_handler_commits_assignments(riders_table, orders_table, lambda_context):
+    orders_table.put_item(Item={
+        "userId": "user-1", "orderId": "ORD-1", "status": "PLACED",
+        "restaurantLocation": {"lat": Decimal("52.37"), "lng": Decimal("4.90")},
+    })
+    orders_table.put_item(Item={
+        "userId": "user-1", "orderId": "ORD-2", "status": "CANCELED",
+        "restaurantLocation": {"lat": Decimal("52.37"), "lng": Decimal("4.90")},
+    })
+    riders_table.put_item(Item={
+        "rider_id": "RIDER-001", "lat": Decimal("52.371"), "lng": Decimal("4.901"),
+        "status": "available", "geo_cell": geo.geohash_encode(52.371, 4.901), "city": "Amsterdam",
+        "city_status": "Amsterdam#available", "last_updated_timestamp": int(time.time()),
+    })
+
+    event = {"orders": [{"userId": "user-1", "orderId": "ORD-1"}, {"userId": "user-1", "orderId": "ORD-2"}]}
+    result = rider_dispatch.lambda_handler(event, lambda_context)
+
+    assert result["statusCode"] == 200
+    assert [a["rider_id"] for a in result["assignments"]] == ["RIDER-001"]
+    assert orders_table.get_item(Key={"userId": "user-1", "orderId": "ORD-1"})["Item"]["riderId"] == "RIDER-001"
+    rider = riders_table.get_item(Key={"rider_id": "RIDER-001"})["Item"]
+    assert (rider["status"], rider["city_status"]) == ("busy", "Amsterdam#busy")
+
+
+def test_load_pending_orders_backs_off_on_unprocessed_keys(orders_table, monkeypatch):
+    orders_table.put_item(Item={
+        "userId": "user-1", "orderId": "ORD-1", "status": "PLACED",
+        "restaurantLocation": {"lat": Decimal("52.37"), "lng": Decimal("4.90")},
+    })
+    original = rider_dispatch.dynamodb.batch_get_item
+    responses = []
+
+    def batch_get_item(RequestItems):
+        if not responses:
+            responses.append(RequestItems)
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+        return original(RequestItems=RequestItems)
+
+    sleeps = []
+    monkeypatch.setattr(rider_dispatch.dynamodb, "batch_get_item", batch_get_item)
+    monkeypatch.setattr(rider_dispatch.time, "sleep", sleeps.append)
+
+    orders = rider_dispatch.load_pending_orders([{"userId": "user-1", "orderId": "ORD-1"}])
+
+    assert [order["orderId"] for order in orders] == ["ORD-1"]
+    assert len(sleeps) == 1
+
+
+def test_handler_reports_assignments_committed_before_a_failed_one(lambda_context, monkeypatch):
+    orders = [{"orderId": f"ORD-{i}", "userId": "user-1", "lat": 52.37, "lng": 4.90} for i in range(2)]
+    riders = [{"rider_id": f"RIDER-{i}", "lat": 52.37, "lng": 4.90} for i in range(2)]
+    monkeypatch.setattr(rider_dispatch, "load_pending_orders", lambda keys: orders)
+    monkeypatch.setattr(rider_dispatch, "load_available_riders", lambda orders, radius_km: riders)
+
+    def transact_write_items(TransactItems):
+        if TransactItems[0]["Update"]["Key"]["orderId"] == {"S": "ORD-1"}:
+            raise RuntimeError("throttled")
+
+    monkeypatch.setattr(rider_dispatch.dynamodb_client, "transact_write_items", transact_write_items)
+
+    result = rider_dispatch.lambda_handler({"orders": []}, lambda_context)
+
+    assert result["statusCode"] == 200
+    assert [a["orderId"] for a in result["assignments"]] == ["ORD-0"]
+    assert result["unassigned"] == ["ORD-1"]
@@ -0,0 +1,92 @@
+import io
+
+import pyarrow.parquet as pq
+
+import archive_reader
+import location_archive
+import stream_archiver
+from conftest import make_kinesis_record, make_rider_ping
+
+
+def make_delivery(delivery_id: str, lat: float, lng: float, city: str) -> dict:
+    return {"event_id": f"evt-{delivery_id}", "timestamp": "2026-01-02T08:30:00", "source": "test", "data": {
+        "delivery_id": delivery_id, "order_id": "ORD-1", "status": "in_transit",
+        "location": {"latitude": lat, "longitude": lng, "city": city},
+        "estimated_delivery_time": 1767342600.0,
+    }}
+
+
+def download(s3, root) -> list:
+    keys = sorted(item["Key"] for item in s3.list_objects_v2(Bucket="location-archive")["Contents"])
+    for key in keys:
+        path = root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(s3.get_object(Bucket="location-archive", Key=key)["Body"].read())
+    return keys
+
+
+def test_archiver_writes_parquet_partitioned_by_dataset_date_and_zone(archive_bucket, lambda_context, monkeypatch, tmp_path):
+    monkeypatch.setattr(stream_archiver, "ARCHIVE_BUCKET_NAME", "location-archive")
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping("RIDER-001", 52.37, 4.90, 1767256200.0), 1),
+        make_kinesis_record(make_rider_ping("RIDER-002", 52.09, 5.12, 1767256201.0), 2),
+        make_kinesis_record(make_delivery("DEL-1", 51.92, 4.48, "Rotterdam"), 3),
+        make_kinesis_record({"event_id": "broken"}, 4),
+    ]}
+
+    result = stream_archiver.lambda_handler(event, lambda_context)
+
+    assert result == {"archived": 3, "skipped": 1, "files": 3}
+    assert download(archive_bucket, tmp_path) == [
+        "deliveries/date=2026-01-02/zone=Zone-Southwest/shardId-000000000000-1-0000.parquet",
+        "rider_pings/date=2026-01-01/zone=Zone-Central/shardId-000000000000-1-0000.parquet",
+        "rider_pings/date=2026-01-01/zone=Zone-West/shardId-000000000000-1-0000.parquet",
+    ]
+    pings = archive_reader.read_archive(str(tmp_path), "rider_pings", zones=["Zone-West"], columns=["rider_id", "lat"])
+    assert pings.to_dict("records") == [{"rider_id": "RIDER-001", "lat": 52.37}]
+    deliveries = archive_reader.read_archive(str(tmp_path), "deliveries", start_date="2026-01-02")
+    assert deliveries["delivery_id"].tolist() == ["DEL-1"]
+    assert str(deliveries["estimated_delivery_time"][0]) == "2026-01-02 08:30:00+00:00"
+
+
+def test_full_partitions_are_written_as_separate_parts(archive_bucket, lambda_context, monkeypatch, tmp_path):
+    monkeypatch.setattr(stream_archiver, "ARCHIVE_BUCKET_NAME", "location-archive")
+    monkeypatch.setattr(stream_archiver, "ARCHIVE_MAX_ROWS", 2)
+    event = {"Records": [
+        make_kinesis_record(make_rider_ping(f"RIDER-{i:03d}", 52.37, 4.90, 1767256200.0 + i), i) for i in range(1, 6)
+    ]}
+
+    assert stream_archiver.lambda_handler(event, lambda_context)["files"] == 3
+    keys = download(archive_bucket, tmp_path)
+    assert [pq.read_metadata(tmp_path / key).num_rows for key in keys] == [2, 2, 1]
+
+
+def test_reader_drops_records_archived_twice(archive_bucket, lambda_context, monkeypatch, tmp_path):
+    monkeypatch.setattr(stream_archiver, "ARCHIVE_BUCKET_NAME", "location-archive")
+    ping = make_kinesis_record(make_rider_ping("RIDER-001", 52.37, 4.90, 1767256200.0), 5)
+    #a bisected retry starts its batch at another sequence number, so writes other files
+    stream_archiver.lambda_handler({"Records": [make_kinesis_record(make_rider_ping("RIDER-002", 52.37, 4.90, 1767256100.0), 4), ping]}, lambda_context)
+    stream_archiver.lambda_handler({"Records": [ping]}, lambda_context)
+    download(archive_bucket, tmp_path)
+
+    assert sorted(archive_reader.read_archive(str(tmp_path), "rider_pings")["rider_id"]) == ["RIDER-001", "RIDER-002"]
+
+
+def test_buffer_flushes_partitions_by_size():
+    buffer = location_archive.ArchiveBuffer(max_rows=2)
+    buffer.add(("rider_pings", "2026-01-01", "Zone-West"), {"n": 1})
+    buffer.add(("rider_pings", "2026-01-01", "Zone-East"), {"n": 2})
+    buffer.add(("rider_pings", "2026-01-01", "Zone-East"), {"n": 3})
+
+    assert buffer.due() == [("rider_pings", "2026-01-01", "Zone-East")]
+    assert buffer.drain(buffer.due()) == [(("rider_pings", "2026-01-01", "Zone-East"), [{"n": 2}, {"n": 3}])]
+    assert buffer.due() == []
+    assert len(buffer) == 1
+    assert buffer.drain() == [(("rider_pings", "2026-01-01", "Zone-West"), [{"n": 1}])]
+
+
+def test_parquet_files_use_the_dataset_schema():
+    _, row = location_archive.to_archive_row(make_rider_ping("RIDER-001", 52.37, 4.90, 1767256200.0))
+    table = pq.read_table(io.BytesIO(location_archive.to_parquet("rider_pings", [row])))
+
+    assert table.schema == location_archive.SCHEMAS["rider_pings"]
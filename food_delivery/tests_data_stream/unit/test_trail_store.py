@@ -0,0 +1,47 @@
+import boto3
+import numpy as np
+
+import trail_store
+from conftest import make_rider_ping
+
+
+def test_varint_round_trips_edge_values():
+    values = np.array([0, 1, 127, 128, 300, 16384, 2 ** 64 - 1], dtype=np.uint64)
+
+    encoded = trail_store.varint_encode(values)
+
+    assert encoded[:5] == bytes([0x00, 0x01, 0x7F, 0x80, 0x01])
+    assert np.array_equal(trail_store.varint_decode(encoded), values)
+
+
+def test_points_round_trip_within_a_few_bytes_each():
+    rng = np.random.default_rng(0)
+    timestamps = 1_767_225_600 + np.cumsum(rng.uniform(1, 5, 600))
+    lats = 52.37 + np.cumsum(rng.normal(0, 1e-4, 600))
+    lngs = 4.90 + np.cumsum(rng.normal(0, 1e-4, 600))
+
+    chunk = trail_store.encode_points(timestamps, lats, lngs)
+    decoded_timestamps, decoded_lats, decoded_lngs = trail_store.decode_points(chunk)
+
+    assert len(chunk) / 600 < 8
+    assert np.allclose(decoded_timestamps, timestamps, atol=5e-4)
+    assert np.allclose(decoded_lats, lats, atol=5e-7)
+    assert np.allclose(decoded_lngs, lngs, atol=5e-7)
+
+
+def test_appended_chunks_read_back_as_one_trail(trails_table):
+    client = boto3.client("dynamodb")
+    hour_start = 1_767_225_600
+    first = [make_rider_ping("RIDER-001", 52.30 + i * 1e-3, 4.90, hour_start + 3500 + i * 30)["data"] for i in range(4)]
+    second = [make_rider_ping("RIDER-001", 52.31 + i * 1e-3, 4.91, hour_start + 3620 + i * 30)["data"] for i in range(3)]
+
+    trail_store.append_trail_points(client, trails_table.name, "RIDER-001", first)
+    trail_store.append_trail_points(client, trails_table.name, "RIDER-001", second)
+    trail_store.append_trail_points(client, trails_table.name, "RIDER-001", second[:1])
+
+    items = trails_table.scan()["Items"]
+    assert sorted(int(item["point_count"]) for item in items) == [4, 4]
+
+    trail = trail_store.get_trail(trails_table, "RIDER-001", hour_start, hour_start + 7200)
+    assert trail["timestamp"].tolist() == [float(p["last_updated"]) for p in first + second]
+    assert np.allclose(trail["lat"], [p["lat"] for p in first + second])
@@ -0,0 +1,66 @@
+import json
+
+import zone_windows
+
+WINDOW = {"start": "2026-01-01T12:00:00Z", "end": "2026-01-01T12:01:00Z"}
+
+
+def processed(delivery_id, zone, status, delay):
+    return {
+        "delivery_id": delivery_id,
+        "status": status,
+        "analytics": {"delivery_zone": zone, "estimated_delay": delay},
+    }
+
+
+def test_state_counts_readings_exactly_and_estimates_distinct_deliveries():
+    state = zone_windows.update_window_state({}, [
+        processed("DEL-1", "Zone-West", "in_transit", 0),
+        processed("DEL-2", "Zone-West", "delayed", 4),
+    ])
+    state = zone_windows.update_window_state(state, [
+        processed("DEL-1", "Zone-West", "in_transit", 6),
+        processed("DEL-2", "Zone-West", "delayed", 4),
+        processed("DEL-3", "Zone-Central", "delivered", 0),
+    ])
+
+    #three delayed readings, 4 + 6 + 4 minutes, from two distinct deliveries
+    assert zone_windows.summarize_window(state) == [
+        {"zone": "Zone-Central", "deliveries_estimate": 1, "active_deliveries_estimate": 0,
+         "delivered_deliveries": 1, "delayed_readings": 0, "total_delay_minutes": 0},
+        {"zone": "Zone-West", "deliveries_estimate": 2, "active_deliveries_estimate": 2,
+         "delivered_deliveries": 0, "delayed_readings": 3, "total_delay_minutes": 14},
+    ]
+
+
+def test_state_size_does_not_grow_with_deliveries():
+    readings = [processed(f"DEL-{i}", "Zone-West", "delayed" if i % 4 == 0 else "in_transit", 1) for i in range(20000)]
+    small = zone_windows.update_window_state({}, readings[:100])
+    small_size = len(json.dumps(small))
+    state = zone_windows.update_window_state(small, readings[100:])
+
+    assert len(json.dumps(state)) <= small_size + 100
+    summary = zone_windows.summarize_window(state)[0]
+    assert abs(summary["deliveries_estimate"] - 20000) < 20000 * 0.15
+    assert (summary["delayed_readings"], summary["total_delay_minutes"]) == (20000, 20000)
+
+
+def test_windows_are_summed_over_shards(zone_windows_table):
+    zone_windows.flush_window(zone_windows_table, WINDOW, "shardId-000", [
+        {"zone": "Zone-West", "deliveries_estimate": 4, "active_deliveries_estimate": 3,
+         "delivered_deliveries": 1, "delayed_readings": 1, "total_delay_minutes": 5},
+    ])
+    zone_windows.flush_window(zone_windows_table, WINDOW, "shardId-001", [
+        {"zone": "Zone-West", "deliveries_estimate": 2, "active_deliveries_estimate": 2,
+         "delivered_deliveries": 0, "delayed_readings": 2, "total_delay_minutes": 7},
+    ])
+
+    windows = zone_windows.read_zone_windows(
+        zone_windows_table, "Zone-West", "2026-01-01T12:00:00Z", "2026-01-01T12:00:00Z"
+    )
+
+    assert len(windows) == 1
+    assert windows[0]["active_deliveries_estimate"] == 5
+    assert windows[0]["delivered_deliveries"] == 1
+    assert windows[0]["delayed_readings"] == 3
+    assert windows[0]["mean_delay_minutes"] == 4.0